@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'assets.routers.ReplicaPinningMiddleware',  # Route request reads to replicas
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,6 +85,9 @@ DATABASES = {
         'PASSWORD': 'password',
         'HOST': 'localhost',
         'PORT': '5432',
+        # Seconds to keep connections open; worth raising under ASGI, where
+        # async views use one connection per worker thread.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
     }
 }
 
@@ -95,6 +99,23 @@ if 'test' in sys.argv:
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
     }
+    # A second SQLite database standing in for a replica; only created for
+    # tests that ask for it, and not routed to unless DATABASE_REPLICAS names it.
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+
+# Read replicas: comma-separated hosts, each a copy of the default database
+# (aliases replica_1, replica_2, ...). Request reads go to a replica unless the
+# client wrote something in the last REPLICA_PIN_SECONDS (see assets.routers).
+DATABASE_REPLICAS = []
+if 'test' not in sys.argv:
+    for number, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+        DATABASES[f'replica_{number}'] = dict(DATABASES['default'], HOST=host.strip())
+        DATABASE_REPLICAS.append(f'replica_{number}')
+DATABASE_ROUTERS = ['assets.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
 
 # Caching configuration: prefer Redis (django-redis) when REDIS_URL is set,
 # otherwise fall back to local memory cache. Set REDIS_URL in the environment
@@ -116,6 +137,75 @@ else:
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
         }
     }
+# Seconds a dashboard cache entry may live. Writes invalidate it immediately
+# by bumping the dashboard cache generation (see assets/caching.py).
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 60))
+# Seconds an expired or invalidated entry may still be served to other workers
+# while one worker rebuilds it, and the early-refresh factor (0 disables).
+DASHBOARD_CACHE_GRACE = int(os.environ.get('DASHBOARD_CACHE_GRACE', 30))
+DASHBOARD_CACHE_BETA = float(os.environ.get('DASHBOARD_CACHE_BETA', 1.0))
+
+# Directory shared by all worker processes of one server for multi-process
+# metrics (each worker writes a memory-mapped file, /metrics/ merges them).
+# Empty it before starting the server. Unset: metrics are per process.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+
+# SQL instrumentation: per-route query counts and database time on /metrics/,
+# the K query fingerprints with most total time per route (per process), and
+# a Server-Timing header (db/app/total) on every response.
+METRICS_SQL = os.environ.get('METRICS_SQL', '1') == '1'
+METRICS_SQL_TOP_K = int(os.environ.get('METRICS_SQL_TOP_K', 20))
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1') == '1'
+
+# Seconds the route graph (built from the transit analytics) stays cached;
+# analytics updates invalidate it immediately by bumping its generation.
+ROUTE_GRAPH_CACHE_TIMEOUT = int(os.environ.get('ROUTE_GRAPH_CACHE_TIMEOUT', 3600))
+
+# Seconds a user's roles (group names) stay in the shared cache, and in each
+# process's local layer in front of it. Membership and group changes clear
+# the shared entry at once; other processes notice within the local TTL.
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', 300))
+ROLE_CACHE_LOCAL_TTL = int(os.environ.get('ROLE_CACHE_LOCAL_TTL', 5))
+
+# ASGI deployment: ASYNC_VIEWS=1 serves the dashboard, asset list/detail and
+# movement list with async views whose independent queries run concurrently,
+# one database connection per worker thread (see assets/async_queries.py).
+# ASYNC_CONCURRENT_QUERIES=0 keeps them on the request's connection instead.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+ASYNC_CONCURRENT_QUERIES = os.environ.get('ASYNC_CONCURRENT_QUERIES', '1') == '1'
+
+# Asset autocomplete: suggestions per request, and the in-process LRU that
+# serves hot prefixes (entries, seconds before a cached prefix is re-queried).
+AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', 10))
+AUTOCOMPLETE_CACHE_SIZE = int(os.environ.get('AUTOCOMPLETE_CACHE_SIZE', 1024))
+AUTOCOMPLETE_CACHE_TTL = int(os.environ.get('AUTOCOMPLETE_CACHE_TTL', 30))
+
+# Movements prefetched per location: on the detail page (older history loads
+# page by page) and on each row of the location list.
+LOCATION_RECENT_MOVEMENTS = int(os.environ.get('LOCATION_RECENT_MOVEMENTS', 20))
+LOCATION_LIST_RECENT_MOVEMENTS = int(os.environ.get('LOCATION_LIST_RECENT_MOVEMENTS', 3))
+
+# Seconds the cached list rows and pages live (see assets/fragments.py); edits
+# change the keys, so this only bounds how long unused fragments linger.
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 3600))
+
+# Scans per page of an asset's history; a page of collapsed stays reads this
+# many scans (plus one) and lists the stays that end within them.
+ASSET_HISTORY_PAGE_SIZE = int(os.environ.get('ASSET_HISTORY_PAGE_SIZE', 25))
+
+# Assets per page of /snapshot/; each page replays only its assets' movements.
+SNAPSHOT_PAGE_SIZE = int(os.environ.get('SNAPSHOT_PAGE_SIZE', 500))
+
+# Default p95 latency budget per view for `manage.py bench --assert`.
+BENCH_P95_BUDGET_MS = float(os.environ.get('BENCH_P95_BUDGET_MS', 500))
+
+# Maximum number of movements accepted by one POST to /movements/bulk/.
+BULK_MOVEMENT_MAX_BATCH = int(os.environ.get('BULK_MOVEMENT_MAX_BATCH', 5000))
+
+# Movement retention: archive_movements moves whole months older than this
+# many months into gzip NDJSON files under MOVEMENT_ARCHIVE_DIR.
+MOVEMENT_RETENTION_MONTHS = int(os.environ.get('MOVEMENT_RETENTION_MONTHS', 24))
+MOVEMENT_ARCHIVE_DIR = os.environ.get('MOVEMENT_ARCHIVE_DIR', str(BASE_DIR / 'archive'))
 
 
 # Password validation
@@ -0,0 +1,165 @@
+"""Dwell-time and transit-time analytics.
+
+A DwellRecord per movement holds how long the asset stayed (until its next
+movement) and where it went next; TransitStat accumulates trips and total
+seconds per (from, to) location pair. Both come from
+``LEAD(...) OVER (PARTITION BY asset_id ORDER BY timestamp, id)`` evaluated
+in the database (PostgreSQL, and SQLite 3.25+).
+
+``process_new_movements`` (the ``refresh_analytics`` command) only looks at
+movements added since its last run: for each asset concerned it recomputes
+the stays from the one before its earliest new movement onwards and applies
+the difference to TransitStat. Edits and deletes are applied right away by
+the signal handlers through ``refresh_assets``. Every change moves the route
+graph cache (``assets.routes``) to a new generation.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Max, Q, Window
+from django.db.models.functions import Lead
+from django.utils import timezone
+from .caching import bump_generation
+from .models import AnalyticsWatermark, Asset, AssetLocation, DwellRecord, TransitStat
+from .routes import ROUTES_CACHE_NAMESPACE
+
+ASSET_CHUNK_SIZE = 200  # keeps the per-asset OR below SQLite's expression depth limit
+BATCH_SIZE = 2000
+# Ids are assigned before commit, so a slow transaction can commit an id just
+# below the watermark after a run; each run looks at these again (idempotent).
+WATERMARK_OVERLAP = 1000
+
+
+def _with_next(queryset):
+    window = {'partition_by': [F('asset_id')], 'order_by': [F('timestamp').asc(), F('id').asc()]}
+    return queryset.annotate(
+        next_timestamp=Window(Lead('timestamp'), **window),
+        next_location=Window(Lead('location_id'), **window),
+    ).values_list('id', 'asset_id', 'location_id', 'timestamp', 'next_timestamp', 'next_location')
+
+
+def _record(row):
+    movement_id, asset_id, location_id, arrived_at, departed_at, next_location_id = row
+    return DwellRecord(
+        movement_id=movement_id,
+        asset_id=asset_id,
+        location_id=location_id,
+        arrived_at=arrived_at,
+        departed_at=departed_at,
+        next_location_id=next_location_id,
+        seconds=None if departed_at is None else int((departed_at - arrived_at).total_seconds()),
+    )
+
+
+def _contribute(totals, records, sign=1):
+    for record in records:
+        if record.departed_at is not None:
+            pair = totals[(record.location_id, record.next_location_id)]
+            pair[0] += sign
+            pair[1] += sign * record.seconds
+    return totals
+
+
+def refresh_assets(since_by_asset):
+    """Recompute each asset's stays from the one before ``since`` onwards."""
+    items = [(asset_id, since) for asset_id, since in since_by_asset.items() if asset_id is not None]
+    with transaction.atomic():
+        for i in range(0, len(items), ASSET_CHUNK_SIZE):
+            _refresh_chunk(dict(items[i:i + ASSET_CHUNK_SIZE]))
+    if items:
+        bump_generation(ROUTES_CACHE_NAMESPACE)
+
+
+def _refresh_chunk(since):
+    # Same lock as CurrentLocation.refresh: one writer per asset at a time.
+    list(Asset.objects.select_for_update().filter(pk__in=list(since)).order_by('pk').values_list('pk', flat=True))
+    bounds = dict(
+        DwellRecord.objects.filter(reduce(or_, (Q(asset_id=a, arrived_at__lt=s) for a, s in since.items())))
+        .values('asset_id').annotate(bound=Max('arrived_at')).values_list('asset_id', 'bound').order_by()
+    )
+    start = {asset_id: bounds.get(asset_id, s) for asset_id, s in since.items()}
+    rows = list(_with_next(
+        AssetLocation.objects.filter(reduce(or_, (Q(asset_id=a, timestamp__gte=t) for a, t in start.items())))
+    ).order_by('asset_id', 'timestamp', 'id'))
+    stale = DwellRecord.objects.filter(reduce(or_, (Q(asset_id=a, arrived_at__gte=t) for a, t in start.items())))
+    old = list(stale)
+
+    present = {row[0] for row in rows}
+    patched = []
+    for record in old:
+        if record.movement_id not in present and bounds.get(record.asset_id) == record.arrived_at:
+            # The stay's movement has been archived; only its departure can change.
+            after = next((r for r in rows if r[1] == record.asset_id and (r[3], r[0]) > (record.arrived_at, record.movement_id)), None)
+            patched.append((record, _record((
+                record.movement_id, record.asset_id, record.location_id, record.arrived_at,
+                after[3] if after else None, after[2] if after else None,
+            ))))
+
+    new = [_record(row) for row in rows]
+    totals = _contribute(defaultdict(lambda: [0, 0]), old, sign=-1)
+    _contribute(totals, new)
+    _contribute(totals, [updated for _, updated in patched])
+
+    stale.exclude(pk__in=[record.pk for record, _ in patched]).delete()
+    DwellRecord.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    for _, updated in patched:
+        updated.save(update_fields=['departed_at', 'next_location', 'seconds'])
+    TransitStat.objects.adjust(totals)
+
+
+def process_new_movements():
+    """Fold movements added since the last run into the analytics; returns how many were seen.
+
+    The first run (no watermark yet) does a full ``rebuild``.
+    """
+    watermark = AnalyticsWatermark.objects.filter(pk=1).first()
+    if watermark is None:
+        return rebuild()
+    last_id = AssetLocation.objects.aggregate(last=Max('id'))['last'] or 0
+    since = {}
+    seen = 0
+    for asset_id, timestamp in AssetLocation.objects.filter(
+        id__gt=watermark.last_movement_id - WATERMARK_OVERLAP, id__lte=last_id,
+    ).values_list('asset_id', 'timestamp').iterator(chunk_size=BATCH_SIZE):
+        seen += 1
+        if asset_id not in since or timestamp < since[asset_id]:
+            since[asset_id] = timestamp
+    with transaction.atomic():
+        refresh_assets(since)
+        AnalyticsWatermark.objects.filter(pk=1).update(last_movement_id=max(last_id, watermark.last_movement_id), updated_at=timezone.now())
+    return seen
+
+
+def rebuild():
+    """Recompute all stays and transit stats from the movement history in one pass.
+
+    Stays of archived movements are dropped.
+    """
+    with transaction.atomic():
+        last_id = AssetLocation.objects.aggregate(last=Max('id'))['last'] or 0
+        DwellRecord.objects.all().delete()
+        TransitStat.objects.all().delete()
+        totals = defaultdict(lambda: [0, 0])
+        batch = []
+        seen = 0
+        for row in _with_next(AssetLocation.objects.filter(id__lte=last_id)).order_by().iterator(chunk_size=BATCH_SIZE):
+            batch.append(_record(row))
+            seen += 1
+            if len(batch) >= BATCH_SIZE:
+                _contribute(totals, batch)
+                DwellRecord.objects.bulk_create(batch)
+                batch = []
+        _contribute(totals, batch)
+        DwellRecord.objects.bulk_create(batch)
+        TransitStat.objects.bulk_create(
+            [
+                TransitStat(from_location_id=from_id, to_location_id=to_id, trips=trips, total_seconds=seconds)
+                for (from_id, to_id), (trips, seconds) in totals.items()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        AnalyticsWatermark.objects.update_or_create(pk=1, defaults={'last_movement_id': last_id, 'updated_at': timezone.now()})
+    bump_generation(ROUTES_CACHE_NAMESPACE)
+    return seen
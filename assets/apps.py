@@ -8,3 +8,6 @@ class AssetsConfig(AppConfig):
     def ready(self):
         """Import signals when Django loads the app."""
         import assets.signals  # noqa
+        from django.db.backends.signals import connection_created
+        from .metrics import install_sql_wrapper
+        connection_created.connect(install_sql_wrapper, dispatch_uid='assets.metrics.sql')
@@ -0,0 +1,43 @@
+"""Running independent ORM queries concurrently from async views.
+
+Django's async ORM methods run every query on the one thread-sensitive
+executor thread, so ``asyncio.gather`` over them still executes serially.
+``gather_queries`` instead runs each callable with
+``sync_to_async(thread_sensitive=False)``: every worker thread has its own
+database connection, so the queries really overlap and the total wait is
+close to the slowest one.
+
+Inside a transaction (tests, ``transaction.atomic``) other connections cannot
+see uncommitted rows, so the callables then run one after another on the
+request's connection. ``ASYNC_CONCURRENT_QUERIES = False`` forces that mode.
+Give the database a connection budget of at least one connection per worker
+thread; ``CONN_MAX_AGE`` keeps them open between requests.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+def _pooled(func):
+    def run():
+        # Pool threads live outside the request cycle, so apply
+        # CONN_MAX_AGE / broken-connection handling here.
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*funcs):
+    """Call the zero-argument ORM callables ``funcs`` concurrently; return their results in order."""
+    if not getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True) or await sync_to_async(_in_transaction)():
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(sync_to_async(_pooled(func), thread_sensitive=False)() for func in funcs))
@@ -0,0 +1,279 @@
+"""Synthetic dataset and per-view benchmark behind the ``bench`` command.
+
+``seed`` fills an empty database with assets, locations and movements using
+batched inserts (``COPY`` on PostgreSQL) and then rebuilds the derived state
+(current locations, rollups, analytics, a checkpoint) once. ``run_cases``
+drives every named URL in ``assets.urls`` through the test client and records
+latency percentiles, the number of SQL queries and the peak Python memory
+allocated per request. ``check_budgets`` compares the results with per-view
+query and p95 latency budgets.
+"""
+import json
+import math
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .analytics import rebuild as rebuild_analytics
+from .ingest import copy_movements
+from .models import Asset, AssetLocation, CurrentLocation, DashboardRollup, Location, LocationRollup
+from .snapshots import create_checkpoint
+
+SEED_BATCH_SIZE = 10000
+
+
+def seed(assets, locations, movements, days=365, seed=0, log=None):
+    """Insert a synthetic dataset; movements favour a few busy hubs, like real sites."""
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    Location.objects.bulk_create(
+        (Location(name=f'Location {i:05d}', address=f'{i} Bench Road') for i in range(locations)),
+        batch_size=SEED_BATCH_SIZE,
+    )
+    Asset.objects.bulk_create(
+        (
+            Asset(name=f'Asset {i:07d}', description=f'Synthetic asset {i}', value=Decimal(rng.randint(100, 1000000)) / 100)
+            for i in range(assets)
+        ),
+        batch_size=SEED_BATCH_SIZE,
+    )
+    location_ids = list(Location.objects.order_by('pk').values_list('pk', flat=True))
+    asset_ids = list(Asset.objects.order_by('pk').values_list('pk', flat=True))
+    log(f'Seeded {len(asset_ids)} assets and {len(location_ids)} locations.')
+
+    # Location i gets a share proportional to 1 / (i + 1).
+    cum_weights = []
+    total = 0.0
+    for i in range(len(location_ids)):
+        total += 1 / (i + 1)
+        cum_weights.append(total)
+    start = timezone.now() - timedelta(days=days)
+    step = timedelta(days=days) / max(movements, 1)
+    for offset in range(0, movements, SEED_BATCH_SIZE):
+        size = min(SEED_BATCH_SIZE, movements - offset)
+        batch = [
+            AssetLocation(asset_id=asset_id, location_id=location_id, timestamp=start + step * (offset + i))
+            for i, (asset_id, location_id) in enumerate(zip(
+                rng.choices(asset_ids, k=size), rng.choices(location_ids, cum_weights=cum_weights, k=size)
+            ))
+        ]
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                copy_movements(batch)
+            else:
+                AssetLocation.objects.bulk_create(batch, batch_size=1000)
+        log(f'Seeded {offset + size} movements.')
+
+    for i in range(0, len(asset_ids), CurrentLocation.objects.REFRESH_CHUNK_SIZE):
+        CurrentLocation.objects.refresh(asset_ids[i:i + CurrentLocation.objects.REFRESH_CHUNK_SIZE])
+    DashboardRollup.objects.reconcile()
+    LocationRollup.objects.reconcile()
+    rebuild_analytics()
+    create_checkpoint()
+    log('Rebuilt derived state.')
+
+
+@dataclass
+class BenchCase:
+    """One request to time. ``url`` and ``data`` get the fixture dict from ``fixtures()``.
+
+    ``prepare`` runs untimed before every request and returns extra fixtures,
+    e.g. a fresh row for a delete view to remove.
+    """
+    name: str
+    url: Callable[[dict], str]
+    method: str = 'get'
+    data: Optional[Callable[[dict], object]] = None
+    content_type: Optional[str] = None
+    prepare: Optional[Callable[[], dict]] = None
+    max_queries: int = 10
+    url_name: str = field(default='')
+
+    def __post_init__(self):
+        self.url_name = self.url_name or self.name.split(':')[0]
+
+
+def _fresh_asset():
+    return {'asset': Asset.objects.create(name='Bench throwaway', value=1).pk}
+
+
+def _fresh_location():
+    return {'location': Location.objects.create(name='Bench throwaway', address='-').pk}
+
+
+def _fresh_movement():
+    movement = AssetLocation.objects.order_by('-pk').only('asset_id', 'location_id').first()
+    return {'movement': AssetLocation.objects.create(
+        asset_id=movement.asset_id, location_id=movement.location_id, timestamp=timezone.now()
+    ).pk}
+
+
+# Session and user lookups account for two queries on every logged-in request.
+CASES = [
+    BenchCase('metrics', lambda f: reverse('metrics'), max_queries=0),
+    BenchCase('dashboard', lambda f: reverse('dashboard'), max_queries=2),
+    BenchCase('asset_list', lambda f: reverse('asset_list'), max_queries=3),
+    BenchCase('asset_list:search', lambda f: reverse('asset_list') + '?q=Asset 00001', max_queries=3),
+    BenchCase('asset_list:json', lambda f: reverse('asset_list') + '?format=json', max_queries=3),
+    BenchCase('asset_detail', lambda f: reverse('asset_detail', args=[f['asset']]), max_queries=4),
+    BenchCase('asset_detail:stays', lambda f: reverse('asset_detail', args=[f['asset']]) + '?view=stays', max_queries=5),
+    BenchCase('asset_history', lambda f: reverse('asset_history', args=[f['asset']]), max_queries=3),
+    BenchCase('asset_autocomplete', lambda f: reverse('asset_autocomplete') + '?q=Asset 000', max_queries=2),
+    BenchCase('asset_lookup', lambda f: reverse('asset_lookup') + '?q=Asset 001', max_queries=3),
+    BenchCase(
+        'asset_create', lambda f: reverse('asset_create'), method='post',
+        data=lambda f: {'name': 'Bench asset', 'description': '', 'value': '1.00'}, max_queries=6,
+    ),
+    BenchCase('asset_update', lambda f: reverse('asset_update', args=[f['asset']]), max_queries=3),
+    BenchCase('asset_delete', lambda f: reverse('asset_delete', args=[f['asset']]), method='post', prepare=_fresh_asset, max_queries=16),
+    BenchCase('location_list', lambda f: reverse('location_list'), max_queries=5),
+    BenchCase('location_detail', lambda f: reverse('location_detail', args=[f['location']]), max_queries=4),
+    BenchCase('location_history', lambda f: reverse('location_history', args=[f['location']]), max_queries=3),
+    BenchCase('location_snapshot', lambda f: reverse('location_snapshot', args=[f['location']]), max_queries=8),
+    BenchCase('location_lookup', lambda f: reverse('location_lookup') + '?q=Location', max_queries=3),
+    BenchCase(
+        'location_create', lambda f: reverse('location_create'), method='post',
+        data=lambda f: {'name': 'Bench location', 'address': 'Bench Road'}, max_queries=10,
+    ),
+    BenchCase(
+        'location_update', lambda f: reverse('location_update', args=[f['location']]), method='post',
+        data=lambda f: {'name': 'Location 00000', 'address': '0 Bench Road'}, max_queries=6,
+    ),
+    BenchCase('location_delete', lambda f: reverse('location_delete', args=[f['location']]), method='post', prepare=_fresh_location, max_queries=12),
+    BenchCase('analytics', lambda f: reverse('analytics'), max_queries=5),
+    BenchCase('route_next', lambda f: reverse('route_next', args=[f['location']]), max_queries=2),
+    BenchCase('route_common', lambda f: reverse('route_common'), max_queries=2),
+    BenchCase('route_bottlenecks', lambda f: reverse('route_bottlenecks'), max_queries=2),
+    BenchCase('inventory_snapshot', lambda f: reverse('inventory_snapshot') + f'?location={f["location"]}', max_queries=7),
+    BenchCase('assetlocation_list', lambda f: reverse('assetlocation_list'), max_queries=3),
+    BenchCase(
+        'assetlocation_create', lambda f: reverse('assetlocation_create'), method='post',
+        data=lambda f: {'asset': f['asset'], 'location': f['location']}, max_queries=16,
+    ),
+    BenchCase(
+        'assetlocation_export',
+        lambda f: reverse('assetlocation_export') + '?start=' + (timezone.now() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S'),
+        max_queries=3,
+    ),
+    BenchCase(
+        'assetlocation_bulk', lambda f: reverse('assetlocation_bulk'), method='post',
+        data=lambda f: json.dumps([{'asset': f['asset'], 'location': f['location']}] * 100),
+        content_type='application/json', max_queries=16,
+    ),
+    BenchCase('assetlocation_update', lambda f: reverse('assetlocation_update', args=[f['movement']]), max_queries=5),
+    BenchCase(
+        'assetlocation_delete', lambda f: reverse('assetlocation_delete', args=[f['movement']]), method='post',
+        prepare=_fresh_movement, max_queries=22,
+    ),
+]
+
+
+def uncovered_url_names():
+    """Named routes in ``assets.urls`` that no case exercises."""
+    from . import urls
+    return sorted({p.name for p in urls.urlpatterns if p.name} - {case.url_name for case in CASES})
+
+
+def fixtures():
+    """Representative rows: the busiest location, the most recently moved asset and the latest movement."""
+    location = LocationRollup.objects.order_by('-asset_count', 'pk').values_list('location_id', flat=True).first()
+    asset = CurrentLocation.objects.order_by('-timestamp').values_list('asset_id', flat=True).first()
+    movement = AssetLocation.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True).first()
+    return {'asset': asset, 'location': location, 'movement': movement}
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def _request(client, case, context):
+    kwargs = {}
+    if case.data is not None:
+        kwargs['data'] = case.data(context)
+    if case.content_type:
+        kwargs['content_type'] = case.content_type
+    response = getattr(client, case.method)(case.url(context), **kwargs)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def run_case(client, case, base_fixtures, iterations=20, warmup=2):
+    timings = []
+    queries = 0
+    status = None
+    for i in range(warmup + iterations + 1):
+        context = dict(base_fixtures, **(case.prepare() if case.prepare else {}))
+        if i == warmup + iterations:
+            # Separate, untimed pass: tracing allocations slows requests down.
+            tracemalloc.start()
+            _request(client, case, context)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            break
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = _request(client, case, context)
+            elapsed = time.perf_counter() - started
+        status = response.status_code
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries = max(queries, len(captured))
+    timings.sort()
+    return {
+        'url': case.url(base_fixtures),
+        'method': case.method.upper(),
+        'status': status,
+        'iterations': iterations,
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_cases(client, iterations=20, warmup=2, only=None, log=None):
+    """Time every case (or those named in ``only``); returns ``{case name: result}``."""
+    log = log or (lambda message: None)
+    base = fixtures()
+    results = {}
+    for case in CASES:
+        if only and case.name not in only:
+            continue
+        results[case.name] = run_case(client, case, base, iterations, warmup)
+        log(f"{case.name}: p95 {results[case.name]['p95_ms']} ms, {results[case.name]['queries']} queries")
+    return results
+
+
+def check_budgets(results, budgets=None, p95_ms=None):
+    """Violations of per-view budgets: ``budgets`` maps case names to
+    ``{"queries": n, "p95_ms": x}`` and overrides each case's ``max_queries``
+    and the default ``p95_ms`` (``BENCH_P95_BUDGET_MS``)."""
+    budgets = budgets or {}
+    p95_ms = p95_ms if p95_ms is not None else getattr(settings, 'BENCH_P95_BUDGET_MS', 500)
+    limits = {case.name: case.max_queries for case in CASES}
+    violations = []
+    for name, result in results.items():
+        budget = budgets.get(name, {})
+        max_queries = budget.get('queries', limits.get(name))
+        max_p95 = budget.get('p95_ms', p95_ms)
+        if result['status'] is None or result['status'] >= 400:
+            violations.append(f'{name}: HTTP {result["status"]}')
+        if max_queries is not None and result['queries'] > max_queries:
+            violations.append(f'{name}: {result["queries"]} queries > budget {max_queries}')
+        if result['p95_ms'] > max_p95:
+            violations.append(f'{name}: p95 {result["p95_ms"]} ms > budget {max_p95} ms')
+    return violations
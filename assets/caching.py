@@ -0,0 +1,165 @@
+"""Generation-versioned cache keys.
+
+Every cached family (e.g. ``dashboard``) has a generation counter stored in the
+configured cache. Entries embed the current generation in their key, so
+invalidating a family is one atomic ``incr`` no matter how many entries or
+variants exist; superseded entries are never read again and simply expire.
+Works with any backend that supports ``incr`` (locmem, django-redis, ...).
+
+``get_or_rebuild`` adds stampede protection on top: one worker rebuilds an
+expired entry (single-flight lock in the cache) while the others keep serving
+the previous value for a grace period, and entries are refreshed a little
+early with probability rising towards expiry ("XFetch").
+
+``LocalLRUCache`` is a bounded per-process layer for hot, tiny lookups that
+should not even pay a cache round trip; it can only expire by TTL in other
+processes, so keep TTLs short.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from .metrics import record_cache_event
+from .routers import primary
+
+MISS_WAIT = 2.0  # seconds a worker waits for another worker's first build
+MISS_POLL = 0.05
+
+
+def _generation_key(namespace):
+    return f'{namespace}:generation'
+
+
+def _seed():
+    # Seed from the clock so a counter lost to eviction or a cache restart can
+    # never fall back to a generation whose entries are still cached.
+    return time.time_ns() // 1000
+
+
+def get_generation(namespace):
+    """Return the current generation of ``namespace``, creating it if needed."""
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _seed(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    """Invalidate every entry of ``namespace`` by moving to a new generation."""
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:  # counter missing: any fresh seed is newer than before
+        generation = _seed()
+        cache.add(key, generation, timeout=None)
+        return generation
+
+
+def versioned_key(namespace, name):
+    """Cache key for ``name`` in the current generation of ``namespace``."""
+    return f'{namespace}:{get_generation(namespace)}:{name}'
+
+
+def get_or_rebuild(namespace, name, compute, timeout, grace=30, beta=1.0, lock_timeout=10):
+    """Return the cached value of ``name``, rebuilding it with ``compute()`` at most once at a time.
+
+    The entry is fresh while it belongs to the current generation and
+    ``timeout`` seconds have not passed. Stale entries (expired or from an
+    older generation) stay readable for ``grace`` more seconds: the worker
+    that wins the lock rebuilds, everyone else is served the stale value.
+    ``beta`` scales early refresh; 0 disables it.
+    """
+    generation_key = _generation_key(namespace)
+    entry_key = f'{namespace}:entry:{name}'
+    lock_key = f'{namespace}:lock:{name}'
+
+    found = cache.get_many([generation_key, entry_key])
+    generation = found.get(generation_key) or get_generation(namespace)
+    entry = found.get(entry_key)
+
+    if entry is not None and entry['generation'] == generation:
+        # XFetch: -log(u) is exponential, so the chance of refreshing early
+        # grows as expiry approaches, scaled by how long a rebuild takes.
+        early = entry['delta'] * beta * -math.log(1.0 - random.random())
+        if time.time() + early < entry['expires']:
+            record_cache_event(namespace, 'hit')
+            return entry['value']
+
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        return _rebuild(namespace, entry_key, lock_key, generation, compute, timeout, grace)
+
+    if entry is not None:
+        record_cache_event(namespace, 'stale')
+        return entry['value']
+
+    # Nothing to serve yet: give the lock holder a moment before building too.
+    deadline = time.monotonic() + MISS_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(MISS_POLL)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            record_cache_event(namespace, 'stale' if entry['generation'] != generation else 'hit')
+            return entry['value']
+    return _rebuild(namespace, entry_key, None, generation, compute, timeout, grace)
+
+
+def _rebuild(namespace, entry_key, lock_key, generation, compute, timeout, grace):
+    record_cache_event(namespace, 'rebuild')
+    try:
+        started = time.monotonic()
+        with primary():
+            value = compute()
+        entry = {
+            'value': value,
+            'generation': generation,
+            'delta': time.monotonic() - started,
+            'expires': time.time() + timeout,
+        }
+        cache.set(entry_key, entry, timeout=timeout + grace)
+        return value
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU of at most ``maxsize`` entries, each with a TTL."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
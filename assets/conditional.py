@@ -0,0 +1,56 @@
+"""Conditional GET for pages that are polled but rarely change.
+
+Views build an ETag from what the page shows (the fragment keys of its rows,
+the dashboard cache generation, ...) after running their queries but before
+rendering, and answer a matching ``If-None-Match`` with ``304 Not Modified``.
+Responses are marked ``private, no-cache``: browsers keep them but revalidate
+on every load, so a refresh costs the validator queries and no rendering or
+transfer.
+
+No ``Last-Modified`` is sent: a deleted row changes a page without making
+anything on it newer, so a timestamp cannot validate it.
+"""
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from .fragments import digest, rendering_variant
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def page_etag(request, *parts):
+    """ETag of a page made from ``parts``, or None if it must be rendered anyway.
+
+    Pages with pending messages are always rendered, so the messages are shown
+    (and consumed) rather than hidden behind a 304.
+    """
+    if request.method not in CONDITIONAL_METHODS or len(get_messages(request)):
+        return None
+    return quote_etag(digest((parts, rendering_variant())))
+
+
+def set_validators(response, etag):
+    if etag is not None:
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag):
+    """A 304 response when the client already has the page tagged ``etag`` (412 for a failed If-Match), else None."""
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    return set_validators(response, etag) if response is not None else None
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs before rendering; subclasses implement ``get_etag_parts``."""
+
+    def get_etag_parts(self, context):
+        raise NotImplementedError
+
+    def render_to_response(self, context, **response_kwargs):
+        etag = page_etag(self.request, *self.get_etag_parts(context))
+        return not_modified(self.request, etag) or set_validators(
+            super().render_to_response(context, **response_kwargs), etag
+        )
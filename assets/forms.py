@@ -1,4 +1,7 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+from django.utils import timezone
 from .models import Asset, Location, AssetLocation
 
 class AssetForm(forms.ModelForm):
@@ -18,11 +21,97 @@ class LocationForm(forms.ModelForm):
             'address': forms.Textarea(attrs={'rows': 3}),
         }
 
+class LookupSelect(forms.Select):
+    """Select that renders only the empty and the selected option.
+
+    The remaining options are fetched page by page from ``lookup_url`` as the
+    user types (see assetlocation_form.html), so the page weight does not grow
+    with the size of the choice queryset. Validation is unchanged: the model
+    choice field resolves the submitted pk with a single lookup.
+    """
+
+    def __init__(self, lookup_url, attrs=None):
+        super().__init__(attrs)
+        self.lookup_url = lookup_url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-lookup-url'] = str(self.lookup_url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        choices = [] if field.empty_label is None else [('', field.empty_label)]
+        selected = [v for v in value if v not in self.choices.field.empty_values]
+        if selected:
+            try:
+                choices += [self.choices.choice(obj) for obj in field.queryset.filter(pk__in=selected)]
+            except (ValueError, TypeError, ValidationError):
+                pass  # an invalid submitted pk; the form reports it
+        return [
+            (None, [self.create_option(name, choice_value, label, str(choice_value) in value, index, attrs=attrs)], index)
+            for index, (choice_value, label) in enumerate(choices)
+        ]
+
+
 class AssetLocationForm(forms.ModelForm):
     class Meta:
         model = AssetLocation
         fields = ['asset', 'location']
         widgets = {
-            'asset': forms.Select(attrs={'class': 'form-control'}),
-            'location': forms.Select(attrs={'class': 'form-control'}),
+            'asset': LookupSelect(reverse_lazy('asset_lookup'), attrs={'class': 'form-control'}),
+            'location': LookupSelect(reverse_lazy('location_lookup'), attrs={'class': 'form-control'}),
         }
+
+    def _get_validation_exclusions(self):
+        # The choice fields already resolved both pks; skip the model's second existence check.
+        return super()._get_validation_exclusions() | {'asset', 'location'}
+
+class MovementRowForm(forms.Form):
+    """Validates one row of a bulk movement payload without touching the database.
+
+    Asset/location existence is checked for the whole batch in ``assets.ingest``.
+    """
+    asset = forms.IntegerField(min_value=1)
+    location = forms.IntegerField(min_value=1)
+    timestamp = forms.DateTimeField(required=False)
+
+
+class IntegerListField(forms.Field):
+    """Repeated query parameter of ids, e.g. ``?location=1&location=2``."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return [int(v) for v in value]
+        except (TypeError, ValueError):
+            raise ValidationError('Enter whole numbers.', code='invalid')
+
+
+class MovementExportForm(forms.Form):
+    start = forms.DateTimeField(required=False)
+    end = forms.DateTimeField(required=False)
+    location = IntegerListField(required=False)
+    asset = IntegerListField(required=False)
+    format = forms.ChoiceField(choices=[('ndjson', 'NDJSON'), ('csv', 'CSV')], required=False)
+    compress = forms.BooleanField(required=False)
+    archived = forms.BooleanField(required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('start') and cleaned.get('end') and cleaned['start'] >= cleaned['end']:
+            raise ValidationError('start must be before end.')
+        cleaned['format'] = cleaned.get('format') or 'ndjson'
+        return cleaned
+
+class SnapshotForm(forms.Form):
+    """``at`` defaults to now; ``location`` narrows the snapshot to one location."""
+    at = forms.DateTimeField(required=False)
+    location = forms.IntegerField(min_value=1, required=False)
+
+    def clean(self):
+        cleaned = super().clean()
+        cleaned['at'] = cleaned.get('at') or timezone.now()
+        return cleaned
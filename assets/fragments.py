@@ -0,0 +1,90 @@
+"""Russian-doll fragment caching for list pages.
+
+Each row is rendered from its own template and cached under a key made of
+the object's id and a version: its ``updated_at`` plus that of every related
+object the row shows. The rows of a page are joined into a page fragment
+cached under a digest of the row keys. One ``get_many`` fetches the page
+fragment and all its rows; on a page miss only the rows that changed are
+rendered, and they are stored together with the new page in one ``set_many``.
+
+Nothing is ever invalidated: an edit changes ``updated_at``, so the next
+render asks for new keys and the old entries expire unread. Writes that
+bypass ``save()`` (``QuerySet.update``) must set ``updated_at`` themselves.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+from .metrics import record_cache_event
+
+FRAGMENT_CACHE_NAMESPACE = 'fragments'
+
+
+def _asset_version(asset):
+    return (asset.updated_at,)
+
+
+def _movement_version(m):
+    return (m.updated_at, m.asset.updated_at, m.location.updated_at)
+
+
+def _location_version(location):
+    return (
+        location.updated_at,
+        location.asset_count,
+        tuple((m.pk, m.updated_at, m.asset.updated_at) for m in getattr(location, 'recent_movements', ())),
+    )
+
+
+# kind -> (row template, version of the object as shown in that row)
+ROWS = {
+    'asset': ('assets/_asset_row.html', _asset_version),
+    'location': ('assets/_location_row.html', _location_version),
+    'movement': ('assets/_movement_row.html', _movement_version),
+}
+
+
+def digest(value):
+    return hashlib.md5(repr(value).encode(), usedforsecurity=False).hexdigest()
+
+
+def rendering_variant():
+    """What else shapes rendered HTML: dates and numbers render per time zone and language."""
+    return (timezone.get_current_timezone_name(), translation.get_language())
+
+
+def row_keys(kind, objects):
+    _, version = ROWS[kind]
+    rendering = rendering_variant()
+    return [f'{FRAGMENT_CACHE_NAMESPACE}:{kind}:{obj.pk}:{digest((version(obj), rendering))}' for obj in objects]
+
+
+def page_key(kind, keys):
+    return f'{FRAGMENT_CACHE_NAMESPACE}:{kind}:page:{digest(keys)}'
+
+
+def render_rows(kind, objects):
+    """HTML of the ``kind`` rows of ``objects``, from the cache where possible."""
+    template_name, _ = ROWS[kind]
+    keys = row_keys(kind, objects)
+    outer = page_key(kind, keys)
+    found = cache.get_many([outer, *keys])
+    if outer in found:
+        record_cache_event(FRAGMENT_CACHE_NAMESPACE, 'hit')
+        return mark_safe(found[outer])
+
+    record_cache_event(FRAGMENT_CACHE_NAMESPACE, 'rebuild')
+    template = get_template(template_name)
+    missing = {}
+    rows = []
+    for obj, key in zip(objects, keys):
+        html = found.get(key)
+        if html is None:
+            html = missing[key] = template.render({'object': obj})
+        rows.append(html)
+    missing[outer] = page = ''.join(rows)
+    cache.set_many(missing, timeout=getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600))
+    return mark_safe(page)
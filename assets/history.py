@@ -0,0 +1,153 @@
+"""Paginated movement history for one asset.
+
+``movement_history`` pages through the raw scans newest first with keyset
+pagination on the ``(asset, timestamp)`` index. ``collapsed_stays`` merges
+consecutive scans at the same location into one stay: it reads the next
+``per_page + 1`` scans newest first with the same keyset seek, and ``LAG``
+over that window marks where the location changes. Every page costs
+O(page) rows however long the history is. A stay that continues past the
+window is carried in the cursor and completed on a later page, so a page
+lists at most ``per_page`` stays (none while one long stay is being read).
+"""
+import base64
+import binascii
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AssetLocation, Location
+from .pagination import InvalidCursor, KeysetPage, KeysetPaginator
+
+HISTORY_ORDERING = ('-timestamp', '-id')
+
+STAYS_SQL = '''
+SELECT id, location_id, "timestamp",
+       CASE WHEN location_id = LAG(location_id) OVER (ORDER BY "timestamp" DESC, id DESC) THEN 0 ELSE 1 END AS changed
+FROM (
+    SELECT id, location_id, "timestamp"
+    FROM {table}
+    WHERE asset_id = %s{seek}
+    ORDER BY "timestamp" DESC, id DESC
+    LIMIT %s
+) window_
+ORDER BY "timestamp" DESC, id DESC
+'''
+
+
+@dataclass
+class Stay:
+    """Consecutive scans of an asset at one location; ``ended_at`` is None while it is still there."""
+    location_id: int
+    location: str
+    first_movement_id: int
+    started_at: datetime
+    last_seen_at: datetime
+    ended_at: datetime
+    scans: int
+
+
+def _paginator(asset_id, per_page):
+    queryset = AssetLocation.objects.filter(asset_id=asset_id).select_related('location').only(
+        'id', 'asset_id', 'location_id', 'timestamp', 'location__name'
+    )
+    return KeysetPaginator(queryset, HISTORY_ORDERING, per_page)
+
+
+def _db_datetime(value):
+    # Aggregates lose the column type, so SQLite returns them as text.
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def movement_history(asset_id, cursor=None, per_page=25):
+    """One page of the asset's scans, newest first. Raises InvalidCursor."""
+    return _paginator(asset_id, per_page).page(cursor)
+
+
+def _encode_stays_cursor(stay):
+    # The open stay's oldest scan read so far is also where the next page starts.
+    state = asdict(stay, dict_factory=lambda items: {k: v.isoformat() if hasattr(v, 'isoformat') else v for k, v in items})
+    del state['location']
+    raw = json.dumps(['s', state], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_stays_cursor(cursor):
+    try:
+        kind, state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if kind != 's':
+            raise InvalidCursor(cursor)
+        stay = Stay(location=None, **state)
+        for name in ('started_at', 'last_seen_at', 'ended_at'):
+            value = getattr(stay, name)
+            if value is not None:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    raise InvalidCursor(cursor)
+                setattr(stay, name, parsed)
+        if stay.started_at is None or stay.last_seen_at is None:
+            raise InvalidCursor(cursor)
+        return stay
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def _stays_query(asset_id, after, limit):
+    """SQL and params for ``limit`` scans of the asset older than the stay ``after``."""
+    params = [asset_id]
+    seek = ''
+    if after is not None:
+        # The redundant "timestamp" <= %s lets the (asset_id, timestamp) index
+        # bound the scan; the OR alone would make it read every newer row.
+        seek = ' AND "timestamp" <= %s AND ("timestamp" < %s OR ("timestamp" = %s AND id < %s))'
+        value = AssetLocation._meta.get_field('timestamp').get_db_prep_value(after.started_at, connection)
+        params += [value, value, value, after.first_movement_id]
+    return STAYS_SQL.format(table=AssetLocation._meta.db_table, seek=seek), params + [limit]
+
+
+def collapsed_stays(asset_id, cursor=None, per_page=25):
+    """One page of the asset's stays, newest first. Raises InvalidCursor.
+
+    Reads at most ``per_page + 1`` scans. Only forward (older) cursors are
+    produced, so ``previous_cursor`` is never set.
+    """
+    current = _decode_stays_cursor(cursor) if cursor else None
+    with connection.cursor() as db:
+        db.execute(*_stays_query(asset_id, current, per_page + 1))
+        rows = db.fetchall()
+
+    stays = []
+    for i, (movement_id, location_id, timestamp, changed) in enumerate(rows):
+        timestamp = _db_datetime(timestamp)
+        # The first row of the window has no LAG; compare it with the carried stay.
+        continues = current is not None and (location_id == current.location_id if i == 0 else not changed)
+        if continues:
+            current.first_movement_id, current.started_at = movement_id, timestamp
+            current.scans += 1
+            continue
+        if current is not None:
+            stays.append(current)
+        current = Stay(
+            location_id=location_id,
+            location=None,
+            first_movement_id=movement_id,
+            started_at=timestamp,
+            last_seen_at=timestamp,
+            ended_at=current.started_at if current is not None else None,
+            scans=1,
+        )
+    more = len(rows) > per_page
+    if current is not None and not more:
+        stays.append(current)
+
+    names = dict(Location.objects.filter(pk__in={s.location_id for s in stays}).values_list('pk', 'name'))
+    for stay in stays:
+        stay.location = names.get(stay.location_id)
+    return KeysetPage(stays, next_cursor=_encode_stays_cursor(current) if more else None)
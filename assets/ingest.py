@@ -0,0 +1,129 @@
+"""Batched movement ingestion shared by the bulk endpoint and import command.
+
+Rows are written with ``bulk_create`` (no per-row signals); the derived state
+the signal handlers would have maintained is refreshed once per batch.
+"""
+import csv
+import io
+import json
+
+from django.db import connection, transaction
+from .forms import MovementRowForm
+from .models import Asset, Location, AssetLocation, CurrentLocation, DashboardRollup, InventoryCheckpoint
+from .signals import invalidate_dashboard
+
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+class PayloadError(ValueError):
+    """Raised when a bulk payload cannot be decoded at all."""
+
+
+def parse_line(line):
+    """One NDJSON line as a dict, or a PayloadError describing why it is not one."""
+    try:
+        row = json.loads(line)
+    except ValueError as exc:
+        return PayloadError(f'Invalid JSON: {exc}')
+    return row if isinstance(row, dict) else PayloadError('Expected a JSON object.')
+
+
+def parse_payload(body, content_type):
+    """Decode a JSON array (``application/json``) or NDJSON body into a list of dicts.
+
+    A malformed NDJSON line does not fail the batch: it is returned as a
+    PayloadError in its place, for ``validate_movements`` to report.
+    """
+    try:
+        text = body.decode('utf-8')
+        if content_type in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+            return [parse_line(line) for line in text.splitlines() if line.strip()]
+        data = json.loads(text)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise PayloadError(f'Invalid payload: {exc}') from exc
+    if isinstance(data, dict):
+        data = data.get('movements')
+    if not isinstance(data, list):
+        raise PayloadError('Expected a JSON array of movements or an object with a "movements" array.')
+    return data
+
+
+def validate_movements(rows):
+    """Validate raw movement dicts.
+
+    Returns ``(movements, errors)`` where ``movements`` are unsaved AssetLocation
+    instances and ``errors`` is a list of ``{'index': i, 'errors': {...}}``.
+    Foreign keys are checked with one query per model for the whole batch.
+    """
+    cleaned = []
+    errors = []
+    for index, row in enumerate(rows):
+        if isinstance(row, PayloadError):
+            errors.append({'index': index, 'errors': {'__all__': [{'message': str(row), 'code': 'invalid'}]}})
+            continue
+        form = MovementRowForm(row if isinstance(row, dict) else {})
+        if form.is_valid():
+            cleaned.append((index, form.cleaned_data))
+        else:
+            errors.append({'index': index, 'errors': form.errors.get_json_data()})
+
+    asset_ids = set(Asset.objects.filter(pk__in={c['asset'] for _, c in cleaned}).values_list('pk', flat=True))
+    location_ids = set(Location.objects.filter(pk__in={c['location'] for _, c in cleaned}).values_list('pk', flat=True))
+
+    movements = []
+    for index, data in cleaned:
+        row_errors = {}
+        if data['asset'] not in asset_ids:
+            row_errors['asset'] = [{'message': 'Unknown asset.', 'code': 'invalid_choice'}]
+        if data['location'] not in location_ids:
+            row_errors['location'] = [{'message': 'Unknown location.', 'code': 'invalid_choice'}]
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+        movement = AssetLocation(asset_id=data['asset'], location_id=data['location'])
+        if data['timestamp']:
+            movement.timestamp = data['timestamp']
+        movements.append(movement)
+    errors.sort(key=lambda e: e['index'])
+    return movements, errors
+
+
+def write_movements(movements, batch_size=BULK_CREATE_BATCH_SIZE, use_copy=False, invalidate=True):
+    """Insert movements in one transaction and refresh derived state (current
+    locations, rollups) once.
+
+    With ``use_copy`` the rows are streamed through PostgreSQL ``COPY`` when
+    the default connection supports it, falling back to ``bulk_create``.
+    Returns the number of rows written.
+    """
+    if not movements:
+        return 0
+    with transaction.atomic():
+        if use_copy and connection.vendor == 'postgresql':
+            copy_movements(movements)
+        else:
+            AssetLocation.objects.bulk_create(movements, batch_size=batch_size)
+        CurrentLocation.objects.refresh(m.asset_id for m in movements)
+        DashboardRollup.objects.adjust(total_movements=len(movements))
+        InventoryCheckpoint.objects.invalidate_from(min(m.timestamp for m in movements))
+    if invalidate:
+        invalidate_dashboard()
+    return len(movements)
+
+
+def copy_movements(movements):
+    """Load movements with ``COPY ... FROM STDIN`` (PostgreSQL only)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for m in movements:
+        writer.writerow([m.asset_id, m.location_id, m.timestamp.isoformat()])
+    buffer.seek(0)
+    table = connection.ops.quote_name(AssetLocation._meta.db_table)
+    sql = f'COPY {table} (asset_id, location_id, timestamp) FROM STDIN WITH (FORMAT csv)'
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+from assets.models import AssetLocation
+from assets.partitions import add_months, archive_month, month_start
+from assets.signals import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Move whole months of movements older than the retention period into gzip NDJSON archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months', type=int, default=getattr(settings, 'MOVEMENT_RETENTION_MONTHS', 24),
+            help='Keep this many months (plus the current one) in the database',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = add_months(month_start(timezone.now()), -options['retention_months'])
+        oldest = AssetLocation.objects.aggregate(oldest=Min('timestamp'))['oldest']
+        if oldest is None or oldest >= cutoff:
+            self.stdout.write('Nothing to archive.')
+            return
+        archived = 0
+        month = month_start(oldest)
+        while month < cutoff:
+            if options['dry_run']:
+                count = AssetLocation.objects.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1)).count()
+                if count:
+                    self.stdout.write(f'{month:%Y-%m}: {count} movements')
+            else:
+                archive = archive_month(month)
+                if archive:
+                    archived += archive.row_count
+                    self.stdout.write(f'{month:%Y-%m}: {archive.row_count} movements -> {archive.path}')
+            month = add_months(month, 1)
+        if archived:
+            invalidate_dashboard()
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} movements older than {cutoff:%Y-%m}.'))
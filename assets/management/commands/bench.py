@@ -0,0 +1,85 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from assets.benchmark import check_budgets, run_cases, seed, uncovered_url_names
+from assets.models import Asset
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway test database and report latency, query counts and peak memory for every view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=10000)
+        parser.add_argument('--locations', type=int, default=100)
+        parser.add_argument('--movements', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=365, help='Movements are spread over this many past days')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, so runs are comparable')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', action='append', help='Run only this case (repeatable)')
+        parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--assert', dest='check', action='store_true', help='Fail when a view exceeds its budget')
+        parser.add_argument('--budgets', help='JSON file of {"case": {"queries": n, "p95_ms": x}} overrides')
+        parser.add_argument('--p95-budget-ms', type=float, help='Default p95 budget (BENCH_P95_BUDGET_MS)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database and reuse its data next time')
+
+    def handle(self, *args, **options):
+        budgets = {}
+        if options['budgets']:
+            with open(options['budgets']) as fh:
+                budgets = json.load(fh)
+        log = (lambda message: self.stderr.write(message)) if options['verbosity'] > 1 else None
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # A private cache keeps the bench's generations and role entries
+            # (keyed by ids from the test database) away from the real ones,
+            # and reads must not be routed to the real replicas.
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                DATABASE_REPLICAS=[],
+            ):
+                report = self.run(options, log)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        violations = check_budgets(report['results'], budgets, options['p95_budget_ms'])
+        if not options['only']:
+            violations += [f'{name}: no benchmark case' for name in report['uncovered']]
+        report['violations'] = violations
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['check'] and violations:
+            raise CommandError('Budgets exceeded:\n' + '\n'.join(violations))
+
+    def run(self, options, log):
+        if not Asset.objects.exists():
+            seed(options['assets'], options['locations'], options['movements'], options['days'], options['seed'], log=log)
+        user, _ = get_user_model().objects.get_or_create(username='bench', defaults={'is_staff': True})
+        for name in ('manager', 'admin'):
+            Group.objects.get_or_create(name=name)[0].user_set.add(user)
+        client = Client()
+        client.force_login(user)
+        return {
+            'database': connection.vendor,
+            'dataset': {
+                'assets': Asset.objects.count(),
+                'locations': options['locations'],
+                'movements': options['movements'],
+                'seed': options['seed'],
+            },
+            'results': run_cases(client, options['iterations'], options['warmup'], options['only'], log=log),
+            'uncovered': uncovered_url_names(),
+        }
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from assets.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = 'Issue an API token for a machine client (e.g. a scanner gateway); it acts as the given user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="The token acts with this user's roles")
+        parser.add_argument('--name', default='', help='Label to tell tokens apart, e.g. the gateway host')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options['username']})
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        token, key = ApiToken.objects.issue(user, name=options['name'])
+        # Only a digest is stored, so the key cannot be shown again.
+        self.stdout.write(key)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from assets.snapshots import create_checkpoint, rebuild_invalidated
+
+
+class Command(BaseCommand):
+    help = 'Record where every asset is (or was at --at) as a checkpoint for point-in-time queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--at', help='ISO datetime of the checkpoint (default: now)')
+
+    def handle(self, *args, **options):
+        at = None
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None or at.tzinfo is None:
+                raise CommandError('--at must be an ISO datetime with a timezone offset')
+        rebuilt = rebuild_invalidated()
+        if rebuilt:
+            self.stdout.write(self.style.WARNING(f'Rebuilt {rebuilt} checkpoints invalidated by back-dated movements'))
+        checkpoint = create_checkpoint(at)
+        self.stdout.write(self.style.SUCCESS(f'Checkpoint at {checkpoint.taken_at}: {checkpoint.asset_count} assets.'))
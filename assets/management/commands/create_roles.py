@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import Group
+from assets.permissions import invalidate_roles
 
 
 class Command(BaseCommand):
@@ -13,4 +14,6 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.SUCCESS(f'Created group: {g}'))
             else:
                 self.stdout.write(self.style.NOTICE(f'Group already exists: {g}'))
+        # Roles cached while a group was missing would deny access until they expire.
+        invalidate_roles()
         self.stdout.write(self.style.SUCCESS('Default groups ensured.'))
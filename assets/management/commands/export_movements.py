@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from assets.export import export_movements
+from assets.forms import MovementExportForm
+
+
+class Command(BaseCommand):
+    help = 'Stream movement history as NDJSON or CSV (optionally gzip) to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Inclusive ISO datetime lower bound')
+        parser.add_argument('--end', help='Exclusive ISO datetime upper bound')
+        parser.add_argument('--location', type=int, action='append', default=[], help='Location id (repeatable)')
+        parser.add_argument('--asset', type=int, action='append', default=[], help='Asset id (repeatable)')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--include-archived', action='store_true', help='Also stream months moved to archive files')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        form = MovementExportForm({'start': options['start'], 'end': options['end']})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        chunks = export_movements(
+            options['format'],
+            compress=options['gzip'],
+            chunk_size=options['chunk_size'],
+            start=form.cleaned_data['start'],
+            end=form.cleaned_data['end'],
+            locations=options['location'],
+            assets=options['asset'],
+            include_archived=options['include_archived'],
+        )
+        if options['output']:
+            with open(options['output'], 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
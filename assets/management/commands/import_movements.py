@@ -0,0 +1,186 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from assets.ingest import write_movements
+from assets.models import Asset, Location, AssetLocation
+from assets.signals import invalidate_dashboard
+
+
+class BadRecord(ValueError):
+    """A line that cannot be imported; it is reported and skipped."""
+
+
+def parse_record(text, fmt, header):
+    if fmt == 'csv':
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as exc:
+            raise BadRecord(f'invalid CSV: {exc}') from exc
+        if len(values) != len(header):
+            raise BadRecord(f'expected {len(header)} columns, got {len(values)}')
+        return dict(zip(header, values))
+    try:
+        record = json.loads(text)
+    except ValueError as exc:
+        raise BadRecord(f'invalid JSON: {exc}') from exc
+    if not isinstance(record, dict):
+        raise BadRecord('not a JSON object')
+    return record
+
+
+def parse_timestamp(value, default):
+    if not value:
+        return default
+    try:
+        timestamp = parse_datetime(value)
+    except (TypeError, ValueError):
+        timestamp = None
+    if timestamp is None:
+        raise BadRecord(f'invalid timestamp {value!r}')
+    return timezone.make_aware(timestamp) if timezone.is_naive(timestamp) else timestamp
+
+
+def iter_records(fh, fmt, offset=0):
+    """Yield ``(line_offset, end_offset, record)`` for each line of a CSV or NDJSON file.
+
+    Reads one line at a time from a binary handle so memory stays constant and
+    every yielded offset is a safe resume point. CSV records must fit on one
+    line; the header is always read from the start of the file. A line that
+    cannot be parsed is yielded as a BadRecord instead of a dict.
+    """
+    header = None
+    if fmt == 'csv':
+        fh.seek(0)
+        header = next(csv.reader([fh.readline().decode('utf-8-sig')]))
+        offset = max(offset, fh.tell())
+    fh.seek(offset)
+    while True:
+        line = fh.readline()
+        if not line:
+            return
+        line_offset, offset = offset, offset + len(line)
+        try:
+            text = line.decode('utf-8').strip()
+        except UnicodeDecodeError as exc:
+            yield line_offset, offset, BadRecord(f'invalid UTF-8: {exc}')
+            continue
+        if not text:
+            continue
+        try:
+            yield line_offset, offset, parse_record(text, fmt, header)
+        except BadRecord as exc:
+            yield line_offset, offset, exc
+
+
+class NameCache:
+    """In-memory name -> id lookup for one model, filled in batches as names are seen."""
+
+    def __init__(self, model, key):
+        self.model = model
+        self.key = key
+        self.ids = {}
+
+    def resolve(self, values):
+        missing = {v for v in values if v not in self.ids}
+        if self.key == 'pk':
+            for value in {v for v in missing if not v.isdigit()}:
+                self.ids[value] = None
+                missing.discard(value)
+        if missing:
+            lookup = {f'{self.key}__in': missing}
+            # Names are not unique; the oldest row wins consistently.
+            for pk, value in self.model.objects.filter(**lookup).order_by('-pk').values_list('pk', self.key):
+                self.ids[str(value)] = pk
+            for value in missing:
+                self.ids.setdefault(value, None)
+        return self.ids
+
+
+class Command(BaseCommand):
+    help = 'Stream movements from a CSV or NDJSON file into AssetLocation (columns: asset, location, timestamp)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--key', choices=['name', 'id'], default='name',
+                            help='Whether asset/location columns hold names (default) or primary keys')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows written per transaction')
+        parser.add_argument('--offset', type=int, default=0, help='Byte offset to resume from')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        key = 'pk' if options['key'] == 'id' else 'name'
+        assets = NameCache(Asset, key)
+        locations = NameCache(Location, key)
+        chunk_size = options['chunk_size']
+
+        started = time.perf_counter()
+        imported = skipped = malformed = 0
+        chunk = []
+        offset = options['offset']
+        try:
+            with open(path, 'rb') as fh:
+                for line_offset, end_offset, record in iter_records(fh, fmt, offset):
+                    chunk.append((line_offset, record))
+                    last_offset = end_offset
+                    if len(chunk) >= chunk_size:
+                        written, unknown, bad = self.write_chunk(chunk, assets, locations, not options['no_copy'])
+                        imported, skipped, malformed, offset = (
+                            imported + written, skipped + unknown, malformed + bad, end_offset
+                        )
+                        chunk = []
+                        self.report(imported, skipped, malformed, offset, started)
+                if chunk:
+                    written, unknown, bad = self.write_chunk(chunk, assets, locations, not options['no_copy'])
+                    imported, skipped, malformed, offset = (
+                        imported + written, skipped + unknown, malformed + bad, last_offset
+                    )
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'{exc} -- resume with --offset {offset}') from exc
+        finally:
+            if imported:
+                invalidate_dashboard()
+
+        self.report(imported, skipped, malformed, offset, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} movements ({skipped} skipped, {malformed} malformed).'
+        ))
+
+    def write_chunk(self, records, assets, locations, use_copy):
+        """Write ``(line_offset, record)`` pairs; returns (written, unknown asset/location, malformed)."""
+        parsed = [(line_offset, r) for line_offset, r in records if not isinstance(r, BadRecord)]
+        asset_ids = assets.resolve({str(r.get('asset', '')) for _, r in parsed})
+        location_ids = locations.resolve({str(r.get('location', '')) for _, r in parsed})
+        now = timezone.now()
+        movements = []
+        malformed = 0
+        for line_offset, r in records:
+            try:
+                if isinstance(r, BadRecord):
+                    raise r
+                timestamp = parse_timestamp(r.get('timestamp'), now)
+            except BadRecord as exc:
+                malformed += 1
+                self.stderr.write(f'Skipped line at byte {line_offset}: {exc}')
+                continue
+            asset_id = asset_ids.get(str(r.get('asset', '')))
+            location_id = location_ids.get(str(r.get('location', '')))
+            if asset_id is None or location_id is None:
+                continue
+            movements.append(AssetLocation(asset_id=asset_id, location_id=location_id, timestamp=timestamp))
+        write_movements(movements, use_copy=use_copy, invalidate=False)
+        return len(movements), len(records) - len(movements) - malformed, malformed
+
+    def report(self, imported, skipped, malformed, offset, started):
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed > 0 else 0
+        self.stdout.write(
+            f'{imported} imported, {skipped} skipped, {malformed} malformed, {rate:.0f} rows/sec, '
+            f'committed through byte offset {offset}'
+        )
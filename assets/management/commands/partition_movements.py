@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from assets.partitions import add_months, convert_to_partitioned, ensure_partitions, is_partitioned, month_start
+
+
+class Command(BaseCommand):
+    help = 'Partition movements by month (PostgreSQL) and create partitions for the coming months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3, help='Months of future partitions to keep created')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f'{connection.vendor} does not support partitioning; movements stay in one table.'))
+            return
+        this_month = month_start(timezone.now())
+        if not is_partitioned():
+            convert_to_partitioned(months_ahead=options['ahead'])
+            self.stdout.write(self.style.SUCCESS('Movements table converted to monthly partitions.'))
+            return
+        created = ensure_partitions(this_month, add_months(this_month, options['ahead']))
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'Partitions ready through {add_months(this_month, options["ahead"]):%Y-%m}.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from assets.models import Asset, CurrentLocation
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CurrentLocation table (one row per asset) from AssetLocation history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Assets refreshed per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        chunk = []
+        total = 0
+        for asset_id in Asset.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+            chunk.append(asset_id)
+            if len(chunk) >= chunk_size:
+                CurrentLocation.objects.refresh(chunk)
+                total += len(chunk)
+                chunk = []
+        CurrentLocation.objects.refresh(chunk)
+        total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt current location for {total} assets.'))
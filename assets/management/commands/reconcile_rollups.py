@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from assets.models import DashboardRollup, LocationRollup
+from assets.signals import invalidate_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute dashboard and per-location rollups from the base tables, repairing any drift'
+
+    def handle(self, *args, **options):
+        drift = DashboardRollup.objects.reconcile()
+        for field, delta in drift.items():
+            self.stdout.write(self.style.WARNING(f'{field} drifted by {delta}'))
+        fixed = LocationRollup.objects.reconcile()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f'Repaired {fixed} location rollups'))
+        if drift or fixed:
+            invalidate_dashboard()
+        self.stdout.write(self.style.SUCCESS('Rollups reconciled.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from assets.analytics import process_new_movements, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Fold movements recorded since the last run into the dwell/transit analytics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute everything from the movement history')
+
+    def handle(self, *args, **options):
+        seen = rebuild() if options['rebuild'] else process_new_movements()
+        self.stdout.write(self.style.SUCCESS(f'Analytics updated from {seen} movements.'))
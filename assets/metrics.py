@@ -1,128 +1,497 @@
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.cache import never_cache
-from django.urls import reverse
+import threading
 import time
-from collections import deque
-from statistics import mean, median
+import re
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
 import psutil
 import os
 
-# Simple metrics store (reset on server restart, which is fine for demo)
-METRICS = {
-    'cache_hits': 0,
-    'cache_misses': 0,
-    'cache_hit_ratio': 0.0,
-    'cache_keys': 0,
-    'response_times': deque(maxlen=100),  # Keep last 100 response times
-    'requests_per_minute': 0,
-    'last_minute_requests': deque(maxlen=60),  # Track requests in last minute
-    'process_memory': 0,
-}
+# Fixed, log-scaled latency buckets (upper bounds in seconds): 0.5ms doubling
+# up to ~33s, plus +Inf. Observing a request is one bisect and two increments.
+LATENCY_BUCKETS = tuple(0.0005 * 2 ** i for i in range(17))
+UNMATCHED_ROUTE = '<unmatched>'
+RATE_WINDOW = 60  # seconds covered by requests_per_minute
+
+# Interval between process memory samples; reading RSS is a syscall, so it is
+# not done on every request.
+MEMORY_SAMPLE_INTERVAL = getattr(settings, 'METRICS_MEMORY_SAMPLE_INTERVAL', 5.0)
+
+
+class MetricsStore:
+    """Flat ``{key tuple: float}`` store behind all counters, histograms and gauges.
+
+    Counters only ever grow for the life of the process.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount=1):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, key, default=0):
+        return self._values.get(key, default)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+# Metrics that describe a live process; not archived when a worker exits.
+GAUGES = ('process_memory_bytes', 'rate_slot_second', 'rate_slot_count')
+
+
+def _drop_stale_rate_slots(values):
+    """Keep only rate slots stamped within the window (per worker, before merging)."""
+    horizon = time.time() - RATE_WINDOW
+    stale = {
+        key[1] for key, value in values.items()
+        if key[0] == 'rate_slot_second' and value <= horizon
+    }
+    return {
+        key: value for key, value in values.items()
+        if not (key[0] in ('rate_slot_second', 'rate_slot_count') and key[1] in stale)
+    }
+
+
+def _create_registry():
+    # With METRICS_MULTIPROC_DIR set (one directory shared by all workers of
+    # a server), every worker records into its own memory-mapped file and
+    # reads merge all of them, so /metrics/ reports the whole server.
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+    if not directory:
+        return MetricsStore()
+    from .metrics_mmap import MultiProcessMetricsStore
+    os.makedirs(directory, exist_ok=True)
+    return MultiProcessMetricsStore(
+        directory, gauges=GAUGES, max_merge=('rate_slot_second',), normalize=_drop_stale_rate_slots
+    )
+
+
+REGISTRY = _create_registry()
+
+
+def observe_request(route, status, seconds, now=None):
+    """Record one request in the per-route histogram and status counters."""
+    now = time.time() if now is None else now
+    REGISTRY.inc(('http_requests_total', route, str(status)))
+    REGISTRY.inc(('http_request_duration_seconds_bucket', route, bisect_left(LATENCY_BUCKETS, seconds)))
+    REGISTRY.inc(('http_request_duration_seconds_sum', route), seconds)
+    # Requests per second in a ring of RATE_WINDOW slots, each stamped with the
+    # second it counts so a stale slot is recognised and restarted.
+    second = int(now)
+    slot = second % RATE_WINDOW
+    if REGISTRY.get(('rate_slot_second', slot)) != second:
+        REGISTRY.set(('rate_slot_second', slot), second)
+        REGISTRY.set(('rate_slot_count', slot), 0)
+    REGISTRY.inc(('rate_slot_count', slot))
+
+
+def record_cache_event(namespace, outcome):
+    """Count a cache lookup outcome (``hit``, ``stale`` or ``rebuild``) for ``namespace``."""
+    REGISTRY.inc(('cache_events_total', namespace, outcome))
+
+
+def cache_event_counts(namespace, values=None):
+    values = REGISTRY.snapshot() if values is None else values
+    return {
+        outcome: int(values.get(('cache_events_total', namespace, outcome), 0))
+        for outcome in ('hit', 'stale', 'rebuild')
+    }
+
+
+# SQL instrumentation
+# A wrapper installed on every database connection adds each query's duration
+# to the current request's SqlStats (a context variable, so it follows the
+# request into sync_to_async/async_to_sync threads). Outside a request it only
+# checks the variable. Per-route totals go to REGISTRY; per-fingerprint stats
+# are kept per process in a bounded top-K table.
+SQL_TOP_K = getattr(settings, 'METRICS_SQL_TOP_K', 20)
+
+_current_sql = ContextVar('current_sql', default=None)
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SQL_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Normalize ``sql`` so queries differing only in values or IN-list length share one key."""
+    sql = _SQL_LITERALS.sub('?', sql)
+    sql = _SQL_LISTS.sub('(...)', sql)
+    return _SQL_SPACE.sub(' ', sql).strip()
+
+
+class SqlStats:
+    """Queries run while handling one request."""
+    __slots__ = ('count', 'seconds', 'fingerprints')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = {}
+
+    def add(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        stats = self.fingerprints.get(sql)
+        if stats is None:
+            self.fingerprints[sql] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    stats = _current_sql.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - start)
+
+
+def install_sql_wrapper(sender=None, connection=None, **kwargs):
+    """``connection_created`` receiver: instrument each connection once."""
+    if getattr(settings, 'METRICS_SQL', True) and sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+class TopQueries:
+    """Per-route ``{fingerprint: [count, total seconds, max seconds]}``.
+
+    Each route keeps at most ``2 * k`` fingerprints; past that it is cut back to
+    the ``k`` with the most total time, so memory stays bounded whatever SQL
+    the application produces.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, route, fingerprints):
+        with self._lock:
+            table = self._routes.setdefault(route, {})
+            for sql, (count, seconds, slowest) in fingerprints.items():
+                key = fingerprint(sql)
+                stats = table.get(key)
+                if stats is None:
+                    table[key] = [count, seconds, slowest]
+                else:
+                    stats[0] += count
+                    stats[1] += seconds
+                    stats[2] = max(stats[2], slowest)
+            if len(table) > 2 * self.k:
+                keep = sorted(table.items(), key=lambda item: item[1][1], reverse=True)[:self.k]
+                self._routes[route] = dict(keep)
+
+    def top(self, route, limit=None):
+        with self._lock:
+            table = dict(self._routes.get(route, {}))
+        rows = sorted(table.items(), key=lambda item: item[1][1], reverse=True)[:limit or self.k]
+        return [
+            {'fingerprint': sql, 'count': count, 'total_seconds': seconds, 'max_seconds': slowest}
+            for sql, (count, seconds, slowest) in rows
+        ]
+
+    def routes(self):
+        with self._lock:
+            return list(self._routes)
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+TOP_QUERIES = TopQueries(SQL_TOP_K)
+
+
+def observe_sql(route, stats):
+    REGISTRY.inc(('db_queries_total', route), stats.count)
+    REGISTRY.inc(('db_time_seconds_sum', route), stats.seconds)
+    if stats.fingerprints:
+        TOP_QUERIES.add(route, stats.fingerprints)
+
+
+def sample_memory():
+    REGISTRY.set(('process_memory_bytes',), psutil.Process(os.getpid()).memory_info().rss)
+
 
 class MetricsMiddleware:
-    """Track cache hits/misses and other metrics."""
+    """Per-route latency histograms, status counters, request rate and SQL time.
+
+    Per-request cost is a clock read, a bisect and a few dict increments; the
+    route name is taken from the URL resolver match, and memory is sampled at
+    most every MEMORY_SAMPLE_INTERVAL seconds. The request's query count and
+    time in the database are added as a ``Server-Timing`` header unless
+    METRICS_SERVER_TIMING is off. Runs natively in async stacks, so async
+    views are not pushed through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-        # Initialize metrics (handle test resets)
-        METRICS['cache_hits'] = 0
-        METRICS['cache_misses'] = 0
-        METRICS['cache_hit_ratio'] = 0.0
-        METRICS['cache_keys'] = 0
-        METRICS['response_times'].clear()
-        METRICS['last_minute_requests'].clear()
-        METRICS['requests_per_minute'] = 0
-        METRICS['process_memory'] = 0
+        self._next_memory_sample = 0.0
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        # Record request start time
-        start_time = time.time()
-        
-        # Process request (before view)
-        keys_before = 0
-        if hasattr(cache, '_cache'):
-            try:
-                keys_before = len(cache._cache)
-            except (TypeError, AttributeError):
-                pass
-
-        response = self.get_response(request)
-
-        # Calculate response time
-        response_time = time.time() - start_time
-        METRICS['response_times'].append(response_time)
-        
-        # Update request rate
-        current_time = int(time.time())
-        METRICS['last_minute_requests'].append(current_time)
-        # Remove requests older than 60 seconds
-        while METRICS['last_minute_requests'] and METRICS['last_minute_requests'][0] < current_time - 60:
-            METRICS['last_minute_requests'].popleft()
-        METRICS['requests_per_minute'] = len(METRICS['last_minute_requests'])
-
-        # Update memory usage
-        process = psutil.Process(os.getpid())
-        METRICS['process_memory'] = process.memory_info().rss
-
-        # Update metrics after view
-        keys_after = 0
-        if hasattr(cache, '_cache'):
-            try:
-                keys_after = len(cache._cache)
-            except (TypeError, AttributeError):
-                pass
-
-        # Track cache activity on cacheable views
-        if request.path == reverse('dashboard'):
-            if keys_after > keys_before:
-                METRICS['cache_misses'] += 1
-            elif keys_after == keys_before and keys_after > 0:
-                METRICS['cache_hits'] += 1
-
-        METRICS['cache_keys'] = keys_after
-        total = METRICS['cache_hits'] + METRICS['cache_misses']
-        if total > 0:
-            METRICS['cache_hit_ratio'] = METRICS['cache_hits'] / total
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = SqlStats()
+        token = _current_sql.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_sql.reset(token)
+        return self.observe(request, response, stats, start)
 
+    async def __acall__(self, request):
+        stats = SqlStats()
+        token = _current_sql.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_sql.reset(token)
+        return self.observe(request, response, stats, start)
+
+    def observe(self, request, response, stats, start):
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = (match.view_name if match else None) or UNMATCHED_ROUTE
+        observe_request(route, response.status_code, elapsed)
+        observe_sql(route, stats)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+                f'app;dur={(elapsed - stats.seconds) * 1000:.2f}, total;dur={elapsed * 1000:.2f}'
+            )
+
+        if start >= self._next_memory_sample:
+            self._next_memory_sample = start + MEMORY_SAMPLE_INTERVAL
+            sample_memory()
         return response
 
+
+def _histograms(values):
+    """Per-route ``(bucket counts, sum)`` from a store snapshot."""
+    routes = {}
+    for key, value in values.items():
+        if key[0] == 'http_request_duration_seconds_bucket':
+            counts = routes.setdefault(key[1], [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])[0]
+            counts[int(key[2])] += int(value)
+        elif key[0] == 'http_request_duration_seconds_sum':
+            routes.setdefault(key[1], [[0] * (len(LATENCY_BUCKETS) + 1), 0.0])[1] += value
+    return routes
+
+
+def _quantile(counts, q):
+    """Estimate quantile ``q`` by linear interpolation inside the matching bucket."""
+    total = sum(counts)
+    if not total:
+        return 0
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(counts):
+        if n and seen + n >= rank:
+            lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+            upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            return lower + (upper - lower) * (rank - seen) / n
+        seen += n
+    return LATENCY_BUCKETS[-1]
+
+
+def _route_stats(counts, total_seconds):
+    count = sum(counts)
+    return {
+        'count': count,
+        'avg': total_seconds / count if count else 0,
+        'p50': _quantile(counts, 0.5),
+        'p95': _quantile(counts, 0.95),
+        'p99': _quantile(counts, 0.99),
+    }
+
+
+def _requests_per_minute(values, now):
+    return int(sum(
+        values.get(('rate_slot_count', slot), 0)
+        for slot in range(RATE_WINDOW)
+        if values.get(('rate_slot_second', slot), 0) > now - RATE_WINDOW
+    ))
+
+
+def _cache_keys():
+    if hasattr(cache, '_cache'):
+        try:
+            return len(cache._cache)
+        except (TypeError, AttributeError):
+            pass
+    return 0
+
+
+def _prometheus(values, histograms, cache_counts):
+    lines = [
+        '# HELP http_requests_total Requests by route and status code.',
+        '# TYPE http_requests_total counter',
+    ]
+    for key, value in sorted((k, v) for k, v in values.items() if k[0] == 'http_requests_total'):
+        lines.append(f'http_requests_total{{route="{key[1]}",status="{key[2]}"}} {int(value)}')
+
+    lines += [
+        '# HELP http_request_duration_seconds Request latency by route.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for route, (counts, total_seconds) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else f'{bound:g}'
+            lines.append(f'http_request_duration_seconds_bucket{{route="{route}",le="{le}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{{route="{route}"}} {total_seconds}')
+        lines.append(f'http_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+
+    lines += [
+        '# HELP cache_events_total Cache lookups by namespace and outcome.',
+        '# TYPE cache_events_total counter',
+    ]
+    for namespace, counts in sorted(cache_counts.items()):
+        for outcome, n in counts.items():
+            lines.append(f'cache_events_total{{namespace="{namespace}",outcome="{outcome}"}} {n}')
+
+    lines += [
+        '# HELP db_queries_total SQL queries run while handling requests, by route.',
+        '# TYPE db_queries_total counter',
+    ]
+    for key, value in sorted((k, v) for k, v in values.items() if k[0] == 'db_queries_total'):
+        lines.append(f'db_queries_total{{route="{key[1]}"}} {int(value)}')
+    lines += [
+        '# HELP db_time_seconds_total Time spent waiting for SQL queries, by route.',
+        '# TYPE db_time_seconds_total counter',
+    ]
+    for key, value in sorted((k, v) for k, v in values.items() if k[0] == 'db_time_seconds_sum'):
+        lines.append(f'db_time_seconds_total{{route="{key[1]}"}} {value}')
+
+    lines += [
+        '# HELP process_resident_memory_bytes Resident memory, sampled periodically.',
+        '# TYPE process_resident_memory_bytes gauge',
+        f"process_resident_memory_bytes {int(values.get(('process_memory_bytes',), 0))}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _db_stats(values, histograms):
+    routes = {}
+    for route, (counts, _) in sorted(histograms.items()):
+        requests = sum(counts)
+        queries = values.get(('db_queries_total', route), 0)
+        seconds = values.get(('db_time_seconds_sum', route), 0.0)
+        routes[route] = {
+            'queries_total': int(queries),
+            'time_seconds_total': seconds,
+            'queries_per_request': queries / requests if requests else 0,
+            'time_per_request': seconds / requests if requests else 0,
+            'top_queries': TOP_QUERIES.top(route),
+        }
+    return routes
+
+
+def _wants_prometheus(request):
+    if request.GET.get('format') == 'prometheus':
+        return True
+    accept = request.headers.get('Accept', '')
+    return 'openmetrics' in accept or accept.startswith('text/plain')
+
+
 @never_cache
 def metrics_view(request):
     """
-    Enhanced Prometheus-style metrics endpoint.
-    
+    Prometheus-style metrics endpoint.
+
+    Returns JSON by default; Prometheus text exposition when scraped with a
+    ``text/plain``/OpenMetrics Accept header or ``?format=prometheus``.
+
     Provides detailed metrics about:
-    - Cache performance (hits, misses, ratio)
-    - Response times (avg, median, p95)
-    - Request rates
+    - Cache performance (hits, misses, ratio, dashboard rebuild outcomes)
+    - Response times overall and per route (avg, median, p95, p99)
+    - Request counts by route and status code, request rate
+    - SQL per route: queries and database time per request, and the top
+      query fingerprints by total time (this process only)
     - Memory usage
     """
-    response_times = list(METRICS['response_times'])
-    response_time_stats = {
-        'avg': mean(response_times) if response_times else 0,
-        'median': median(response_times) if response_times else 0,
-        'p95': sorted(response_times)[int(len(response_times) * 0.95)] if len(response_times) >= 20 else 0
-    }
+    values = REGISTRY.snapshot()
+    histograms = _histograms(values)
+    namespaces = {key[1] for key in values if key[0] == 'cache_events_total'} | {'dashboard'}
+    cache_counts = {ns: cache_event_counts(ns, values) for ns in namespaces}
+
+    if _wants_prometheus(request):
+        return HttpResponse(
+            _prometheus(values, histograms, cache_counts),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
+
+    all_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    for counts, _ in histograms.values():
+        all_counts = [a + b for a, b in zip(all_counts, counts)]
+    overall = _route_stats(all_counts, sum(total for _, total in histograms.values()))
+
+    # A stale value served while another worker rebuilds still counts as a hit.
+    cache_hits = sum(c['hit'] + c['stale'] for c in cache_counts.values())
+    cache_misses = sum(c['rebuild'] for c in cache_counts.values())
+    memory = values.get(('process_memory_bytes',), 0)
+    status_codes = {}
+    for key, value in values.items():
+        if key[0] == 'http_requests_total':
+            status_codes[key[2]] = status_codes.get(key[2], 0) + int(value)
 
     return JsonResponse({
         # Cache metrics
-        'cache_hits': METRICS['cache_hits'],
-        'cache_misses': METRICS['cache_misses'],
-        'cache_hit_ratio': METRICS['cache_hit_ratio'],
-        'cache_keys': METRICS['cache_keys'],
-        
-        # Performance metrics
-        'response_time_avg': response_time_stats['avg'],
-        'response_time_median': response_time_stats['median'],
-        'response_time_p95': response_time_stats['p95'],
-        'requests_per_minute': METRICS['requests_per_minute'],
-        
+        'cache_hits': cache_hits,
+        'cache_misses': cache_misses,
+        'cache_hit_ratio': cache_hits / (cache_hits + cache_misses) if cache_hits + cache_misses else 0.0,
+        'cache_keys': _cache_keys(),
+
+        # Dashboard cache outcomes (stale = served while another worker rebuilt)
+        'dashboard_cache_hits': cache_counts['dashboard']['hit'],
+        'dashboard_cache_stale': cache_counts['dashboard']['stale'],
+        'dashboard_cache_rebuilds': cache_counts['dashboard']['rebuild'],
+
+        # Performance metrics (estimated from the latency histograms)
+        'response_time_avg': overall['avg'],
+        'response_time_median': overall['p50'],
+        'response_time_p95': overall['p95'],
+        'response_time_p99': overall['p99'],
+        'requests_per_minute': _requests_per_minute(values, time.time()),
+        'requests_total': overall['count'],
+        'status_codes': status_codes,
+        'routes': {route: _route_stats(counts, total) for route, (counts, total) in sorted(histograms.items())},
+        'db': _db_stats(values, histograms),
+
         # Resource usage
-        'process_memory_bytes': METRICS['process_memory'],
-        'process_memory_mb': METRICS['process_memory'] / (1024 * 1024),
-        
+        'process_memory_bytes': memory,
+        'process_memory_mb': memory / (1024 * 1024),
+
         # Cache memory from Redis (if available)
         'cache_memory_used': cache.info().get('used_memory', 0) if hasattr(cache, 'info') else 0,
-    })
\ No newline at end of file
+    })
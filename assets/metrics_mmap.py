@@ -0,0 +1,231 @@
+"""Memory-mapped metrics store for multi-process servers (e.g. gunicorn workers).
+
+Each process writes its values into its own file, ``metrics_<pid>.db``, in the
+shared ``METRICS_MULTIPROC_DIR``; readers merge every file. Writes are plain
+memory stores into the mapping, so recording stays as cheap as the in-process
+store and nothing is exchanged between workers until someone reads.
+
+File layout: an 8 byte header holding the number of bytes used, then entries
+of ``<int32 key length><key bytes, padded to 8><float64 value>``. Keys are
+JSON-encoded tuples.
+"""
+import fcntl
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+INITIAL_SIZE = 1024 * 1024
+HEADER = struct.Struct('i4x')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+ARCHIVE_NAME = 'metrics_archive.db'
+
+
+class MmapedDict:
+    """A growable ``{bytes key: float}`` map stored in one memory-mapped file."""
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY if read_only else os.O_RDWR | os.O_CREAT)
+        size = os.fstat(self._fd).st_size
+        if size == 0 and not read_only:
+            os.ftruncate(self._fd, INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._size = size
+        access = mmap.ACCESS_READ if read_only else mmap.ACCESS_WRITE
+        self._m = mmap.mmap(self._fd, size, access=access) if size else b''
+        # Clamp: a writer may have grown the file after we sized our mapping.
+        self._used = min(HEADER.unpack_from(self._m, 0)[0], size) if size else 0
+        if self._used == 0 and not read_only:
+            self._used = HEADER.size
+            HEADER.pack_into(self._m, 0, self._used)
+        self._positions = {key: pos for key, _, pos in self._read_entries()}
+
+    def _read_entries(self):
+        pos = HEADER.size
+        while pos + LENGTH.size <= self._used:
+            length = LENGTH.unpack_from(self._m, pos)[0]
+            key_pos = pos + LENGTH.size
+            value_pos = key_pos + length + (-(LENGTH.size + length) % 8)
+            if value_pos + VALUE.size > self._used:
+                return
+            yield bytes(self._m[key_pos:key_pos + length]), VALUE.unpack_from(self._m, value_pos)[0], value_pos
+            pos = value_pos + VALUE.size
+
+    def items(self):
+        return [(key, value) for key, value, _ in self._read_entries()]
+
+    def read(self, key):
+        pos = self._positions.get(key)
+        return VALUE.unpack_from(self._m, pos)[0] if pos is not None else 0.0
+
+    def write(self, key, value):
+        pos = self._positions.get(key)
+        if pos is None:
+            pos = self._append(key)
+        VALUE.pack_into(self._m, pos, value)
+
+    def _append(self, key):
+        padding = -(LENGTH.size + len(key)) % 8
+        needed = LENGTH.size + len(key) + padding + VALUE.size
+        while self._used + needed > self._size:
+            self._grow()
+        LENGTH.pack_into(self._m, self._used, len(key))
+        self._m[self._used + LENGTH.size:self._used + LENGTH.size + len(key)] = key
+        pos = self._used + LENGTH.size + len(key) + padding
+        VALUE.pack_into(self._m, pos, 0.0)
+        # Publish the entry only after it is fully written.
+        self._used += needed
+        HEADER.pack_into(self._m, 0, self._used)
+        self._positions[key] = pos
+        return pos
+
+    def _grow(self):
+        self._size *= 2
+        os.ftruncate(self._fd, self._size)
+        self._m.close()
+        self._m = mmap.mmap(self._fd, self._size, access=mmap.ACCESS_WRITE)
+
+    def close(self):
+        if self._size:
+            self._m.close()
+        os.close(self._fd)
+
+
+def _encode(key):
+    return json.dumps(key, separators=(',', ':')).encode()
+
+
+def _decode(raw):
+    return tuple(json.loads(raw))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MultiProcessMetricsStore:
+    """Drop-in replacement for ``metrics.MetricsStore`` backed by per-process files.
+
+    ``gauges`` names metrics (first key element) that describe a live process
+    rather than accumulate: they are dropped, not archived, when a worker
+    dies. Metrics in ``max_merge`` are combined across workers with ``max``
+    instead of summed, and ``normalize`` (if given) is applied to each file's
+    values before merging.
+    """
+
+    def __init__(self, directory, gauges=(), max_merge=(), normalize=None):
+        self.directory = directory
+        self.gauges = frozenset(gauges)
+        self.max_merge = frozenset(max_merge)
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self._pid = None
+        self._dict = None
+        self._encoded = {}
+
+    def _key(self, key):
+        raw = self._encoded.get(key)
+        if raw is None:
+            raw = self._encoded[key] = _encode(key)
+        return raw
+
+    def _own(self):
+        # Re-open after fork: a worker must never write into its parent's file.
+        pid = os.getpid()
+        if pid != self._pid:
+            path = os.path.join(self.directory, f'metrics_{pid}.db')
+            if os.path.exists(path):  # left behind by a dead process with our pid
+                self._archive([path])
+            self._dict = MmapedDict(path)
+            self._pid = pid
+        return self._dict
+
+    def inc(self, key, amount=1):
+        raw = self._key(key)
+        with self._lock:
+            d = self._own()
+            d.write(raw, d.read(raw) + amount)
+
+    def set(self, key, value):
+        raw = self._key(key)
+        with self._lock:
+            self._own().write(raw, value)
+
+    def get(self, key, default=0):
+        with self._lock:
+            value = self._own().read(self._key(key))
+        return value if value else default
+
+    def snapshot(self):
+        """Merge every worker's file (and the archive of dead workers).
+
+        Holds the archive lock shared, so no dead worker's file is folded into
+        the archive while it is read: it would be counted in both.
+        """
+        self.cleanup()
+        merged = {}
+        with self._archive_lock(fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(self.directory, 'metrics_*.db')):
+                values = self._read_file(path)
+                if self.normalize:
+                    values = self.normalize(values)
+                for key, value in values.items():
+                    if key[0] in self.max_merge:
+                        merged[key] = max(merged.get(key, value), value)
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def cleanup(self):
+        """Fold the counters of workers that have exited into the archive file."""
+        dead = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.db')):
+            pid = os.path.basename(path)[len('metrics_'):-len('.db')]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead.append(path)
+        if dead:
+            self._archive(dead)
+
+    @contextmanager
+    def _archive_lock(self, operation):
+        # Released when the file is closed.
+        with open(os.path.join(self.directory, 'metrics_archive.lock'), 'a') as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    def _archive(self, paths):
+        with self._archive_lock(fcntl.LOCK_EX):
+            archive = MmapedDict(os.path.join(self.directory, ARCHIVE_NAME))
+            try:
+                for path in paths:
+                    if not os.path.exists(path):  # archived by another reader
+                        continue
+                    for key, value in self._read_file(path).items():
+                        if key[0] not in self.gauges:
+                            raw = _encode(key)
+                            archive.write(raw, archive.read(raw) + value)
+                    os.unlink(path)
+            finally:
+                archive.close()
+
+    @staticmethod
+    def _read_file(path):
+        try:
+            d = MmapedDict(path, read_only=True)
+        except FileNotFoundError:
+            return {}
+        try:
+            return {_decode(key): value for key, value in d.items()}
+        finally:
+            d.close()
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_current_locations(apps, schema_editor):
+    db = schema_editor.connection.alias
+    AssetLocation = apps.get_model('assets', 'AssetLocation')
+    CurrentLocation = apps.get_model('assets', 'CurrentLocation')
+    latest = AssetLocation.objects.using(db).filter(asset_id=OuterRef('asset_id')).order_by('-timestamp', '-pk')
+    rows = AssetLocation.objects.using(db).filter(
+        pk=Subquery(latest.values('pk')[:1]),
+    ).values_list('asset_id', 'location_id', 'pk', 'timestamp').order_by()
+    batch = []
+    for asset_id, location_id, movement_id, timestamp in rows.iterator(chunk_size=2000):
+        batch.append(CurrentLocation(asset_id=asset_id, location_id=location_id, movement_id=movement_id, timestamp=timestamp))
+        if len(batch) >= 2000:
+            CurrentLocation.objects.using(db).bulk_create(batch)
+            batch = []
+    CurrentLocation.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentLocation',
+            fields=[
+                ('asset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_location', serialize=False, to='assets.asset')),
+                ('timestamp', models.DateTimeField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='current_assets', to='assets.location')),
+                ('movement', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='assets.assetlocation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'timestamp'], name='assets_curr_locatio_eee6f4_idx')],
+            },
+        ),
+        migrations.RunPython(populate_current_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_currentlocation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='asset',
+            name='assets_asse_created_6d1779_idx',
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(fields=['created_at', 'id'], name='assets_asse_created_6a835c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assetlocation',
+            index=models.Index(fields=['timestamp', 'id'], name='assets_asse_timesta_8a0c43_idx'),
+        ),
+    ]
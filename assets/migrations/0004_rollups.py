@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Asset = apps.get_model('assets', 'Asset')
+    Location = apps.get_model('assets', 'Location')
+    AssetLocation = apps.get_model('assets', 'AssetLocation')
+    CurrentLocation = apps.get_model('assets', 'CurrentLocation')
+    DashboardRollup = apps.get_model('assets', 'DashboardRollup')
+    LocationRollup = apps.get_model('assets', 'LocationRollup')
+    DashboardRollup.objects.using(db).create(
+        pk=1,
+        total_assets=Asset.objects.using(db).count(),
+        total_locations=Location.objects.using(db).count(),
+        total_movements=AssetLocation.objects.using(db).count(),
+        total_value=Asset.objects.using(db).aggregate(total=Sum('value'))['total'] or 0,
+    )
+    current = {
+        row['location_id']: row
+        for row in CurrentLocation.objects.using(db).values('location_id').annotate(
+            count=Count('asset_id'), value=Sum('asset__value')
+        ).order_by()
+    }
+    LocationRollup.objects.using(db).bulk_create(
+        [
+            LocationRollup(
+                location_id=pk,
+                asset_count=current.get(pk, {}).get('count', 0),
+                inventory_value=current.get(pk, {}).get('value') or 0,
+            )
+            for pk in Location.objects.using(db).values_list('pk', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_assets', models.BigIntegerField(default=0)),
+                ('total_locations', models.BigIntegerField(default=0)),
+                ('total_movements', models.BigIntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='currentlocation',
+            name='asset',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='current_location', serialize=False, to='assets.asset'),
+        ),
+        migrations.CreateModel(
+            name='LocationRollup',
+            fields=[
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='assets.location')),
+                ('asset_count', models.BigIntegerField(default=0)),
+                ('inventory_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['asset_count'], name='assets_loca_asset_c_e7dfdd_idx')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('path', models.CharField(max_length=500)),
+                ('row_count', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['period_start'],
+                'indexes': [models.Index(fields=['period_start', 'period_end'], name='assets_move_period__cb35d1_idx')],
+            },
+        ),
+    ]
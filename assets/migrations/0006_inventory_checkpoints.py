@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_movement_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(unique=True)),
+                ('asset_count', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('invalidated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckpointEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assets.asset')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assets.location')),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='assets.inventorycheckpoint')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['checkpoint', 'location'], name='assets_chec_checkpo_2d7ddc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('checkpoint', 'asset'), name='unique_checkpoint_asset')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0006_inventory_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DwellRecord',
+            fields=[
+                ('movement', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='dwell', serialize=False, to='assets.assetlocation')),
+                ('arrived_at', models.DateTimeField()),
+                ('departed_at', models.DateTimeField(null=True)),
+                ('seconds', models.BigIntegerField(null=True)),
+                ('asset', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='assets.asset')),
+                ('location', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='assets.location')),
+                ('next_location', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='assets.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['asset', 'arrived_at'], name='assets_dwel_asset_i_9b9a13_idx'), models.Index(fields=['location', 'arrived_at'], name='assets_dwel_locatio_9e7274_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TransitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trips', models.BigIntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('from_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assets.location')),
+                ('to_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assets.location')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trips'], name='assets_tran_trips_d42d44_idx')],
+                'constraints': [models.UniqueConstraint(fields=('from_location', 'to_location'), name='unique_transit_pair')],
+            },
+        ),
+    ]
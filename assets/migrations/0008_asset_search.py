@@ -0,0 +1,73 @@
+from django.db import migrations, transaction, DatabaseError
+
+# Expression indexes matching the SQL Django generates for istartswith /
+# icontains on PostgreSQL: UPPER("name"::text) LIKE UPPER('abc%').
+PG_PREFIX_INDEX = (
+    'CREATE INDEX IF NOT EXISTS assets_asset_name_prefix '
+    'ON assets_asset (UPPER(name::text) text_pattern_ops)'
+)
+PG_TRIGRAM_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS assets_asset_name_trgm ON assets_asset USING gin (UPPER(name::text) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS assets_asset_description_trgm ON assets_asset USING gin (UPPER(description::text) gin_trgm_ops)',
+]
+
+# External-content FTS5 table with the trigram tokenizer (SQLite 3.34+):
+# case-insensitive substring MATCH over name and description, kept in sync
+# by triggers. Django rebuilds SQLite tables for most schema changes, which
+# drops the triggers: a later migration altering Asset must recreate them.
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE assets_asset_fts USING fts5("
+    "name, description, content='assets_asset', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER assets_asset_fts_insert AFTER INSERT ON assets_asset BEGIN "
+    "INSERT INTO assets_asset_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER assets_asset_fts_delete AFTER DELETE ON assets_asset BEGIN "
+    "INSERT INTO assets_asset_fts(assets_asset_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER assets_asset_fts_update AFTER UPDATE ON assets_asset BEGIN "
+    "INSERT INTO assets_asset_fts(assets_asset_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO assets_asset_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO assets_asset_fts(assets_asset_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(PG_PREFIX_INDEX)
+        try:
+            # pg_trgm may be unavailable or need more privileges; substring
+            # search then works without an index.
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                for sql in PG_TRIGRAM_INDEXES:
+                    schema_editor.execute(sql)
+        except DatabaseError:
+            pass
+    elif connection.vendor == 'sqlite':
+        import sqlite3
+        if sqlite3.sqlite_version_info >= (3, 34):
+            for sql in SQLITE_FTS:
+                schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for name in ('assets_asset_name_prefix', 'assets_asset_name_trgm', 'assets_asset_description_trgm'):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+    elif connection.vendor == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS assets_asset_fts_{trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS assets_asset_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_dwell_analytics'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
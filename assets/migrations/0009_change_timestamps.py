@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:07
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0008_asset_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetlocation',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now()),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def populate_archived_positions(apps, schema_editor):
+    # Months archived so far left the positions they ended with in
+    # CurrentLocation; those rows point at movements that no longer exist.
+    db = schema_editor.connection.alias
+    AssetLocation = apps.get_model('assets', 'AssetLocation')
+    CurrentLocation = apps.get_model('assets', 'CurrentLocation')
+    ArchivedPosition = apps.get_model('assets', 'ArchivedPosition')
+    live = AssetLocation.objects.using(db).filter(pk=OuterRef('movement_id'))
+    ArchivedPosition.objects.using(db).bulk_create(
+        [
+            ArchivedPosition(asset_id=c.asset_id, location_id=c.location_id, movement_id=c.movement_id, timestamp=c.timestamp)
+            for c in CurrentLocation.objects.using(db).filter(~Exists(live)).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0009_change_timestamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPosition',
+            fields=[
+                ('asset', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='assets.asset')),
+                ('movement_id', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assets.location')),
+            ],
+        ),
+        migrations.RunPython(populate_archived_positions, migrations.RunPython.noop),
+    ]
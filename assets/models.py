@@ -1,4 +1,13 @@
-from django.db import models
+import hashlib
+import secrets
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Now
 from django.utils import timezone
 
 
@@ -12,9 +21,22 @@ class Asset(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['name']),
-            models.Index(fields=['created_at']),
+            # (created_at, id) serves keyset pagination of the asset list.
+            models.Index(fields=['created_at', 'id']),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Value as loaded, so an edit can apply only the delta to the rollups.
+        instance._loaded_value = instance.__dict__.get('value')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Rollups are adjusted by the post_save handler in the same transaction.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -22,12 +44,18 @@ class Asset(models.Model):
 class Location(models.Model):
     name = models.CharField(max_length=255)
     address = models.TextField()
+    # Versions the cached list fragments (see assets/fragments.py).
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     class Meta:
         indexes = [
             models.Index(fields=['name']),
         ]
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -36,13 +64,470 @@ class AssetLocation(models.Model):
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='locations')
     location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='assets')
     timestamp = models.DateTimeField(default=timezone.now)
+    # The database default covers rows loaded with COPY (assets.ingest).
+    updated_at = models.DateTimeField(auto_now=True, db_default=Now())
 
     class Meta:
         indexes = [
             models.Index(fields=['asset', 'timestamp']),
             models.Index(fields=['location', 'timestamp']),
+            # (timestamp, id) serves keyset pagination of the global movement list.
+            models.Index(fields=['timestamp', 'id']),
         ]
         ordering = ['-timestamp']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the asset the row was loaded with so an edit that moves the
+        # movement to another asset can refresh both current positions.
+        instance._loaded_asset_id = instance.__dict__.get('asset_id')
+        # Likewise the timestamp, so moving a movement back in time invalidates
+        # the checkpoints it now precedes.
+        instance._loaded_timestamp = instance.__dict__.get('timestamp')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The post_save handler updates CurrentLocation and the rollups; keep
+        # all writes in one transaction so readers never see one without the other.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._loaded_asset_id = self.asset_id
+        self._loaded_timestamp = self.timestamp
+
     def __str__(self):
         return f"{self.asset.name} at {self.location.name} on {self.timestamp}"
+
+
+class CurrentLocationManager(models.Manager):
+    REFRESH_CHUNK_SIZE = 500  # keeps IN (...) lists under SQLite's parameter limit
+
+    def refresh(self, asset_ids, asset_values=None):
+        """Recompute the current position of ``asset_ids`` from movement history.
+
+        Uses one indexed "latest movement per asset" lookup for the whole batch,
+        so it is correct for back-dated scans, edits and deletes alike. Assets
+        whose latest scan was archived keep the position recorded in
+        ArchivedPosition unless a live movement is newer. The asset
+        rows are locked so concurrent writers for the same asset are serialized,
+        and LocationRollup counts are adjusted for every asset that changed
+        location. ``asset_values`` supplies values for assets already deleted.
+        """
+        asset_ids = sorted({pk for pk in asset_ids if pk is not None})
+        if not asset_ids:
+            return
+        with transaction.atomic():
+            for start in range(0, len(asset_ids), self.REFRESH_CHUNK_SIZE):
+                self._refresh(asset_ids[start:start + self.REFRESH_CHUNK_SIZE], asset_values or {})
+
+    def _refresh(self, asset_ids, asset_values):
+        values = dict(
+            Asset.objects.select_for_update().filter(pk__in=asset_ids).order_by('pk').values_list('pk', 'value')
+        )
+        values.update(asset_values)
+        previous = dict(self.filter(asset_id__in=asset_ids).values_list('asset_id', 'location_id'))
+
+        latest = AssetLocation.objects.filter(asset_id=OuterRef('asset_id')).order_by('-timestamp', '-pk')
+        rows = AssetLocation.objects.filter(
+            asset_id__in=asset_ids,
+            pk=Subquery(latest.values('pk')[:1]),
+        ).values_list('asset_id', 'location_id', 'pk', 'timestamp')
+
+        latest_rows = {row[0]: row for row in rows}
+        for p in ArchivedPosition.objects.filter(asset_id__in=asset_ids):
+            live = latest_rows.get(p.asset_id)
+            if live is None or (p.timestamp, p.movement_id) > (live[3], live[2]):
+                latest_rows[p.asset_id] = (p.asset_id, p.location_id, p.movement_id, p.timestamp)
+        current = [
+            CurrentLocation(asset_id=asset_id, location_id=location_id, movement_id=movement_id, timestamp=timestamp)
+            for asset_id, location_id, movement_id, timestamp in latest_rows.values()
+        ]
+        if current:
+            self.bulk_create(
+                current,
+                update_conflicts=True,
+                unique_fields=['asset'],
+                update_fields=['location', 'movement', 'timestamp'],
+            )
+        moved_out = set(asset_ids) - {c.asset_id for c in current}
+        if moved_out:
+            self.filter(asset_id__in=moved_out).delete()
+
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        now_at = {c.asset_id: c.location_id for c in current}
+        for asset_id in asset_ids:
+            old, new = previous.get(asset_id), now_at.get(asset_id)
+            if old == new:
+                continue
+            value = Decimal(str(values.get(asset_id) or 0))
+            if old is not None:
+                deltas[old][0] -= 1
+                deltas[old][1] -= value
+            if new is not None:
+                deltas[new][0] += 1
+                deltas[new][1] += value
+        LocationRollup.objects.adjust(deltas)
+
+
+class CurrentLocation(models.Model):
+    """Where each asset is right now: one row per asset, derived from AssetLocation.
+
+    Maintained by the AssetLocation signal handlers and rebuilt from scratch by
+    ``manage.py rebuild_current_locations``.
+    """
+    # DO_NOTHING: deleting an asset or location deletes its movements too, and
+    # the delete handlers (DeleteCascade) re-point or remove these rows
+    # (adjusting the rollups) before the deferred FK checks run at commit.
+    asset = models.OneToOneField(Asset, on_delete=models.DO_NOTHING, primary_key=True, related_name='current_location')
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, related_name='current_assets')
+    movement = models.ForeignKey(
+        AssetLocation, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    timestamp = models.DateTimeField()
+
+    objects = CurrentLocationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['location', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} at {self.location_id} since {self.timestamp}"
+
+
+class DashboardRollupManager(models.Manager):
+    def totals(self):
+        """Return the global totals row, building it from live data on first use."""
+        rollup = self.filter(pk=1).first()
+        if rollup is None:
+            self.reconcile()
+            rollup = self.get(pk=1)
+        return rollup
+
+    def adjust(self, **deltas):
+        """Atomically add ``deltas`` to the global totals (``total_assets=1`` ...).
+
+        Called after the triggering write in the same transaction; if the row
+        does not exist yet it is built from live data, which already includes
+        that write.
+        """
+        deltas = {k: v for k, v in deltas.items() if v}
+        if deltas and not self.filter(pk=1).update(**{k: F(k) + v for k, v in deltas.items()}):
+            self.reconcile()
+
+    def reconcile(self):
+        """Recompute the global totals from the base tables; returns the drift found."""
+        actual = {
+            'total_assets': Asset.objects.count(),
+            'total_locations': Location.objects.count(),
+            'total_movements': AssetLocation.objects.count(),
+            'total_value': Asset.objects.aggregate(total=Sum('value'))['total'] or Decimal(0),
+        }
+        with transaction.atomic():
+            rollup, created = self.select_for_update().get_or_create(pk=1, defaults=actual)
+            drift = {} if created else {
+                k: actual[k] - getattr(rollup, k) for k in actual if actual[k] != getattr(rollup, k)
+            }
+            if drift:
+                self.filter(pk=1).update(**actual)
+        return drift
+
+
+class DashboardRollup(models.Model):
+    """Global dashboard totals, kept current with F() increments by the signal handlers."""
+    total_assets = models.BigIntegerField(default=0)
+    total_locations = models.BigIntegerField(default=0)
+    total_movements = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    objects = DashboardRollupManager()
+
+    def __str__(self):
+        return f"{self.total_assets} assets, {self.total_movements} movements"
+
+
+class LocationRollupManager(models.Manager):
+    def adjust(self, deltas):
+        """Apply ``{location_id: (asset_count_delta, value_delta)}`` with F() increments."""
+        for location_id, (count, value) in deltas.items():
+            if count or value:
+                self.filter(location_id=location_id).update(
+                    asset_count=F('asset_count') + count,
+                    inventory_value=F('inventory_value') + value,
+                )
+
+    def reconcile(self):
+        """Recompute every location's rollup from CurrentLocation; returns rows fixed."""
+        actual = {
+            row['location_id']: (row['count'], row['value'] or Decimal(0))
+            for row in CurrentLocation.objects.values('location_id').annotate(
+                count=Count('asset_id'), value=Sum('asset__value')
+            ).order_by()
+        }
+        fixed = 0
+        with transaction.atomic():
+            stored = {
+                r.location_id: r
+                for r in self.select_for_update().order_by('location_id')
+            }
+            for location_id in Location.objects.values_list('pk', flat=True).iterator():
+                count, value = actual.get(location_id, (0, Decimal(0)))
+                rollup = stored.get(location_id)
+                if rollup is None:
+                    self.create(location_id=location_id, asset_count=count, inventory_value=value)
+                    fixed += 1
+                elif (rollup.asset_count, rollup.inventory_value) != (count, value):
+                    self.filter(location_id=location_id).update(asset_count=count, inventory_value=value)
+                    fixed += 1
+        return fixed
+
+
+class LocationRollup(models.Model):
+    """Assets currently at a location and their total value, maintained incrementally."""
+    location = models.OneToOneField(Location, on_delete=models.CASCADE, primary_key=True, related_name='rollup')
+    asset_count = models.BigIntegerField(default=0)
+    inventory_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    objects = LocationRollupManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['asset_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.location_id}: {self.asset_count} assets"
+
+
+class MovementArchive(models.Model):
+    """A month of movements moved out of AssetLocation into a gzip NDJSON file."""
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    path = models.CharField(max_length=500)
+    row_count = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['period_start']
+        indexes = [
+            models.Index(fields=['period_start', 'period_end']),
+        ]
+
+    def __str__(self):
+        return f"{self.period_start:%Y-%m}: {self.row_count} movements"
+
+
+class ArchivedPositionManager(models.Manager):
+    def record(self, start, end):
+        """Remember each asset's latest movement in ``start``..``end`` before the range is archived.
+
+        An existing position is only replaced by a later one, so archiving
+        months out of order (or re-archiving back-dated scans) keeps the newest.
+        """
+        in_range = AssetLocation.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        latest = in_range.filter(asset_id=OuterRef('asset_id')).order_by('-timestamp', '-pk')
+        rows = in_range.filter(pk=Subquery(latest.values('pk')[:1])).values_list(
+            'asset_id', 'location_id', 'pk', 'timestamp'
+        ).order_by('asset_id')
+        batch = []
+        for row in rows.iterator(chunk_size=CurrentLocationManager.REFRESH_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= CurrentLocationManager.REFRESH_CHUNK_SIZE:
+                self._record(batch)
+                batch = []
+        self._record(batch)
+
+    def _record(self, rows):
+        existing = {
+            p.asset_id: (p.timestamp, p.movement_id)
+            for p in self.filter(asset_id__in=[row[0] for row in rows])
+        }
+        positions = [
+            ArchivedPosition(asset_id=asset_id, location_id=location_id, movement_id=movement_id, timestamp=timestamp)
+            for asset_id, location_id, movement_id, timestamp in rows
+            if asset_id not in existing or (timestamp, movement_id) > existing[asset_id]
+        ]
+        if positions:
+            self.bulk_create(
+                positions,
+                update_conflicts=True,
+                unique_fields=['asset'],
+                update_fields=['location', 'movement_id', 'timestamp'],
+            )
+
+
+class ArchivedPosition(models.Model):
+    """Each asset's latest archived movement: where it is when no live movement is newer.
+
+    Written by ``archive_month`` and read by ``CurrentLocation.objects.refresh``.
+    """
+    asset = models.OneToOneField(Asset, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='+')
+    # The movement itself only exists in the archive file.
+    movement_id = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+
+    objects = ArchivedPositionManager()
+
+    def __str__(self):
+        return f"{self.asset_id} at {self.location_id} since {self.timestamp}"
+
+
+class InventoryCheckpointManager(models.Manager):
+    def valid(self):
+        return self.filter(invalidated_at__isnull=True)
+
+    def nearest(self, at):
+        """The latest valid checkpoint taken at or before ``at``, or ``None``."""
+        return self.valid().filter(taken_at__lte=at).order_by('-taken_at').first()
+
+    def invalidate_from(self, timestamp):
+        """Mark checkpoints taken at or after ``timestamp`` stale.
+
+        Called for every movement write; a movement newer than the latest
+        checkpoint (the common case) matches no rows.
+        """
+        if timestamp is None:
+            return 0
+        return self.valid().filter(taken_at__gte=timestamp).update(invalidated_at=timezone.now())
+
+
+class InventoryCheckpoint(models.Model):
+    """Where every asset was at ``taken_at``; point-in-time queries replay movements from here."""
+    taken_at = models.DateTimeField(unique=True)
+    asset_count = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Set when a movement is written at or before taken_at; such checkpoints
+    # are ignored until rebuilt by create_checkpoint.
+    invalidated_at = models.DateTimeField(null=True, blank=True)
+
+    objects = InventoryCheckpointManager()
+
+    class Meta:
+        ordering = ['-taken_at']
+
+    def __str__(self):
+        return f"Checkpoint at {self.taken_at}"
+
+
+class CheckpointEntry(models.Model):
+    checkpoint = models.ForeignKey(InventoryCheckpoint, on_delete=models.CASCADE, related_name='entries')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='+')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='+')
+    # When the asset arrived at the location.
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checkpoint', 'asset'], name='unique_checkpoint_asset'),
+        ]
+        indexes = [
+            models.Index(fields=['checkpoint', 'location']),
+        ]
+
+
+class DwellRecord(models.Model):
+    """One stay: the asset arrived at ``location`` with ``movement`` and left at ``departed_at``.
+
+    Maintained by ``assets.analytics``. No database foreign keys, so records
+    outlive archived movements and do not get in the way of partitioning.
+    """
+    movement = models.OneToOneField(AssetLocation, on_delete=models.DO_NOTHING, db_constraint=False, primary_key=True, related_name='dwell')
+    asset = models.ForeignKey(Asset, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    arrived_at = models.DateTimeField()
+    # Null while the asset is still there.
+    departed_at = models.DateTimeField(null=True)
+    next_location = models.ForeignKey(Location, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    seconds = models.BigIntegerField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['asset', 'arrived_at']),
+            models.Index(fields=['location', 'arrived_at']),
+        ]
+
+
+class TransitStatManager(models.Manager):
+    def adjust(self, deltas):
+        """Apply ``{(from_id, to_id): (trips_delta, seconds_delta)}`` with F() increments."""
+        for (from_id, to_id), (trips, seconds) in deltas.items():
+            if not (trips or seconds):
+                continue
+            updated = self.filter(from_location_id=from_id, to_location_id=to_id).update(
+                trips=F('trips') + trips, total_seconds=F('total_seconds') + seconds,
+            )
+            if not updated and trips > 0:
+                stat, created = self.get_or_create(
+                    from_location_id=from_id, to_location_id=to_id, defaults={'trips': trips, 'total_seconds': seconds},
+                )
+                if not created:
+                    self.filter(pk=stat.pk).update(trips=F('trips') + trips, total_seconds=F('total_seconds') + seconds)
+
+
+class TransitStat(models.Model):
+    """Completed stays at ``from_location`` that ended with a move to ``to_location``.
+
+    ``total_seconds / trips`` is the average time from arriving at one to
+    arriving at the other; summed over ``to_location`` it is the average
+    dwell at ``from_location``. ``from == to`` counts re-scans in place.
+    """
+    from_location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='+')
+    to_location = models.ForeignKey(Location, on_delete=models.CASCADE, related_name='+')
+    trips = models.BigIntegerField(default=0)
+    total_seconds = models.BigIntegerField(default=0)
+
+    objects = TransitStatManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_location', 'to_location'], name='unique_transit_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['trips']),
+        ]
+
+    @property
+    def average(self):
+        return timedelta(seconds=round(self.total_seconds / self.trips)) if self.trips else None
+
+    def __str__(self):
+        return f"{self.from_location_id} -> {self.to_location_id}: {self.trips} trips"
+
+
+class AnalyticsWatermark(models.Model):
+    """Single row (pk=1): the last movement id ``process_new_movements`` has seen."""
+    last_movement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True)
+
+
+class ApiTokenManager(models.Manager):
+    def issue(self, user, name=''):
+        """Create a token for ``user``; returns ``(token, key)``. Only a digest of the key is stored."""
+        key = secrets.token_urlsafe(32)
+        return self.create(user=user, name=name, key_digest=ApiToken.digest(key)), key
+
+    def authenticate(self, key):
+        """The active user holding ``key``, or ``None``."""
+        token = self.select_related('user').filter(key_digest=ApiToken.digest(key)).first()
+        if token is None or not token.user.is_active:
+            return None
+        return token.user
+
+
+class ApiToken(models.Model):
+    """A bearer token for machine clients such as scanner gateways; acts as ``user``."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    key_digest = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = ApiTokenManager()
+
+    @staticmethod
+    def digest(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def __str__(self):
+        return self.name or f'Token {self.pk} for {self.user}'
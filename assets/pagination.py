@@ -0,0 +1,163 @@
+"""Keyset (cursor) pagination for large, append-heavy lists.
+
+Pages are fetched with a ``WHERE (a, b) < (x, y) ORDER BY a, b LIMIT n`` style
+query on an indexed ordering, so page 1000 costs the same as page 1 and no
+``COUNT(*)`` is issued. Cursors are opaque url-safe tokens.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` on ``ordering``, e.g. ``('-timestamp', '-id')``.
+
+    The last field must be unique (normally the primary key) so every row has
+    a distinct position. All fields must sort in the same direction so one
+    composite index can serve both forward and backward pages.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        descending = {f.startswith('-') for f in ordering}
+        if len(descending) != 1:
+            raise ValueError('Keyset ordering fields must all sort in the same direction.')
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.fields = [f.lstrip('-') for f in ordering]
+        self.descending = descending.pop()
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        direction, values, qs = self._page_query(cursor)
+        return self._make_page(direction, values, list(qs))
+
+    async def apage(self, cursor=None):
+        """``page`` for async views, fetching rows with the async ORM."""
+        direction, values, qs = self._page_query(cursor)
+        return self._make_page(direction, values, [obj async for obj in qs])
+
+    def _page_query(self, cursor):
+        if not cursor:
+            direction, values = 'n', None
+        else:
+            direction, values = self.decode_cursor(cursor)
+
+        qs = self.queryset
+        if direction == 'n':
+            if values is not None:
+                qs = qs.filter(self._seek(values, forward=True))
+            qs = qs.order_by(*self.ordering)
+        else:
+            reverse = [f[1:] if f.startswith('-') else '-' + f for f in self.ordering]
+            qs = qs.filter(self._seek(values, forward=False)).order_by(*reverse)
+        return direction, values, qs[:self.per_page + 1]
+
+    def _make_page(self, direction, values, rows):
+        more = len(rows) > self.per_page
+        if direction == 'n':
+            rows = rows[:self.per_page]
+            has_next, has_previous = more, values is not None
+        else:
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, more
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor('n', rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode_cursor('p', rows[0]) if has_previous and rows else None,
+        )
+
+    def _seek(self, values, forward):
+        # (a, b) after (x, y)  ==  a > x OR (a = x AND b > y), flipped for DESC.
+        op = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            term = Q(**{f'{field}__{op}': values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_field: prev_value})
+            condition |= term
+        if len(self.fields) > 1:
+            # Redundant a >= x in front of the OR: databases don't derive an
+            # index range from the OR alone and would walk every newer row.
+            condition = Q(**{f'{self.fields[0]}__{op}e': values[0]}) & condition
+        return condition
+
+    def encode_cursor(self, direction, obj):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        raw = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+            if direction not in ('n', 'p') or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            opts = self.queryset.model._meta
+            return direction, [opts.get_field(f).to_python(v) for f, v in zip(self.fields, values)]
+        except (binascii.Error, ValueError, TypeError) as exc:
+            raise InvalidCursor(cursor) from exc
+
+
+class KeysetPaginationMixin:
+    """ListView mixin replacing OFFSET pagination with keyset pagination.
+
+    Set ``keyset_ordering`` on the view; ``page_obj`` exposes ``next_cursor`` and
+    ``previous_cursor`` for templates. ``?format=json`` returns the page as JSON
+    using ``serialize_object``.
+    """
+    keyset_ordering = ('-pk',)
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.keyset_ordering, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def serialize_object(self, obj):
+        return {'id': obj.pk}
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') == 'json':
+            page = context['page_obj']
+            return JsonResponse({
+                'results': [self.serialize_object(obj) for obj in page.object_list],
+                'next': page.next_cursor,
+                'previous': page.previous_cursor,
+            })
+        return super().render_to_response(context, **response_kwargs)
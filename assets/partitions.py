@@ -0,0 +1,205 @@
+"""Monthly range partitioning of movements (PostgreSQL) and archival.
+
+Partitioning is opt-in: ``manage.py partition_movements`` converts the
+existing ``AssetLocation`` table into a table partitioned by month on
+``timestamp`` (one ``<table>_pYYYYMM`` partition per month plus a DEFAULT
+partition for anything outside them) and, when re-run, creates partitions
+for the coming months. Queries bounded by ``timestamp`` are pruned to the
+relevant partitions by PostgreSQL. Other backends stay unpartitioned.
+
+``archive_month`` moves one month of movements into a gzip NDJSON file (the
+export format, see ``assets.export``) and records it as a MovementArchive,
+dropping the month's partition when there is one.
+"""
+import datetime
+import os
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .export import export_movements, export_queryset
+from .models import ArchivedPosition, AssetLocation, DashboardRollup, MovementArchive
+
+TABLE = AssetLocation._meta.db_table
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year:04d}{month.month:02d}'
+
+
+def _literal(value):
+    # Bounds are generated month starts, never user input.
+    return "'" + value.astimezone(datetime.timezone.utc).isoformat() + "'"
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def existing_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.oid = to_regclass(%s)',
+            [TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(first_month, last_month, parent=TABLE):
+    """Create monthly partitions of ``parent`` covering ``first_month``..``last_month``."""
+    existing = existing_partitions() if parent == TABLE else set()
+    created = []
+    month = month_start(first_month)
+    with connection.cursor() as cursor:
+        while month <= last_month:
+            name = partition_name(month)
+            if name not in existing:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} '
+                    f'PARTITION OF {connection.ops.quote_name(parent)} '
+                    f'FOR VALUES FROM ({_literal(month)}) TO ({_literal(add_months(month, 1))})'
+                )
+                created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(months_ahead=3):
+    """Rebuild the movement table as a monthly-partitioned table (PostgreSQL only).
+
+    Runs in one transaction holding an exclusive lock: rows are copied into the
+    new partitions, the old table is dropped and the new one takes its name,
+    indexes and id sequence. The primary key becomes ``(id, timestamp)`` as
+    PostgreSQL requires; ids stay unique because they come from one sequence.
+    Nothing may reference the table with a database foreign key (CurrentLocation
+    uses ``db_constraint=False`` for that reason).
+    """
+    q = connection.ops.quote_name
+    new = f'{TABLE}_partitioned'
+    seq = f'{TABLE}_id_part_seq'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {q(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT min(timestamp), max(id) FROM {q(TABLE)}')
+        oldest, max_id = cursor.fetchone()
+        now = timezone.now()
+
+        cursor.execute(f'CREATE TABLE {q(new)} (LIKE {q(TABLE)} INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)')
+        cursor.execute(f'CREATE SEQUENCE {q(seq)}')
+        cursor.execute('SELECT setval(%s, %s, false)', [seq, (max_id or 0) + 1])
+        cursor.execute(f"ALTER TABLE {q(new)} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+        ensure_partitions(month_start(oldest or now), add_months(month_start(now), months_ahead), parent=new)
+        cursor.execute(f'CREATE TABLE {q(TABLE + "_default")} PARTITION OF {q(new)} DEFAULT')
+        cursor.execute(f'INSERT INTO {q(new)} SELECT * FROM {q(TABLE)}')
+
+        cursor.execute(f'DROP TABLE {q(TABLE)}')
+        cursor.execute(f'ALTER TABLE {q(new)} RENAME TO {q(TABLE)}')
+        cursor.execute(f'ALTER SEQUENCE {q(seq)} OWNED BY {q(TABLE)}.id')
+        cursor.execute(f'ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(TABLE + "_pkey")} PRIMARY KEY (id, timestamp)')
+        for field in ('asset', 'location'):
+            related = AssetLocation._meta.get_field(field).related_model._meta.db_table
+            cursor.execute(
+                f'ALTER TABLE {q(TABLE)} ADD CONSTRAINT {q(f"{TABLE}_{field}_id_fk")} '
+                f'FOREIGN KEY ({field}_id) REFERENCES {q(related)} (id) DEFERRABLE INITIALLY DEFERRED'
+            )
+        # Same names as the migrations so later migrations find them. The
+        # single-column FK indexes are covered by the (fk, timestamp) ones.
+        with connection.schema_editor(atomic=False) as editor:
+            for index in AssetLocation._meta.indexes:
+                editor.add_index(AssetLocation, index)
+
+
+def archive_dir():
+    return getattr(settings, 'MOVEMENT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))
+
+
+def archive_month(month):
+    """Move the movements of ``month`` into a compressed archive file.
+
+    Returns the MovementArchive created, or ``None`` if the month is empty.
+    Each asset's latest scan in the month is kept as an ArchivedPosition, so
+    an asset whose latest scan was archived is still where that scan put it.
+
+    The file is written, synced and renamed into place before the rows are
+    deleted. If anything fails before the deletion commits, the file is
+    removed again and the rows stay in the table; a crash in between leaves
+    a file that the next run overwrites.
+    """
+    start, end = month_start(month), add_months(month_start(month), 1)
+    q = connection.ops.quote_name
+    partitioned = is_partitioned()
+    partition = partition_name(start) if partitioned and partition_name(start) in existing_partitions() else None
+
+    os.makedirs(archive_dir(), exist_ok=True)
+    suffix = MovementArchive.objects.filter(period_start=start).count()
+    filename = f'movements-{start:%Y-%m}' + (f'-{suffix + 1}' if suffix else '') + '.ndjson.gz'
+    path = os.path.join(archive_dir(), filename)
+
+    written = False
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Block writes into the month while it is exported and removed.
+                with connection.cursor() as cursor:
+                    target = partition or TABLE
+                    cursor.execute(f'LOCK TABLE {q(target)} IN SHARE ROW EXCLUSIVE MODE')
+            rows = export_queryset(start=start, end=end)
+            row_count = rows.count()
+            if not row_count:
+                return None
+            _write_durably(path, export_movements('ndjson', compress=True, start=start, end=end))
+            written = True
+            ArchivedPosition.objects.record(start, end)
+
+            if partition:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ALTER TABLE {q(TABLE)} DETACH PARTITION {q(partition)}')
+                    cursor.execute(f'DROP TABLE {q(partition)}')
+            # Unpartitioned tables, and stragglers in the DEFAULT partition.
+            # _raw_delete: one statement, no per-row signals.
+            AssetLocation.objects.filter(timestamp__gte=start, timestamp__lt=end)._raw_delete(connection.alias)
+
+            archive = MovementArchive.objects.create(period_start=start, period_end=end, path=path, row_count=row_count)
+            DashboardRollup.objects.adjust(total_movements=-row_count)
+        return archive
+    except BaseException:
+        # Rolled back: the rows are still in the table, so the file is a spare copy.
+        if written:
+            os.unlink(path)
+        raise
+
+
+def _write_durably(path, chunks):
+    """Write ``chunks`` to ``path`` via a synced temporary file and an atomic rename."""
+    try:
+        with open(path + '.tmp', 'wb') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(path + '.tmp', path)
+    finally:
+        if os.path.exists(path + '.tmp'):
+            os.unlink(path + '.tmp')
+    # Make the rename itself durable before the rows are deleted.
+    directory = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
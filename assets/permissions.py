@@ -1,6 +1,65 @@
+"""Role checks for views.
+
+A user's roles are their group names. ``get_roles`` caches them per user in
+the configured cache (versioned by the ``roles`` generation) with a small
+process-local layer in front, so steady-state permission checks cost no
+queries and usually no cache round trip either. Membership changes and
+group renames/deletes invalidate them (see ``assets.signals``); other
+processes may keep serving their local copy for up to
+``ROLE_CACHE_LOCAL_TTL`` seconds.
+
+Machine clients authenticate with an ``ApiToken`` instead of a session
+(``ApiRoleRequiredMixin``).
+"""
+from django.conf import settings
 from django.contrib.auth.mixins import AccessMixin
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
 from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from .caching import LocalLRUCache, bump_generation, versioned_key
+from .models import ApiToken
+from .routers import primary
+
+ROLES_CACHE_NAMESPACE = 'roles'
+
+_local = LocalLRUCache(maxsize=1024)  # user id -> roles
+
+
+def _cache_key(user_id):
+    return versioned_key(ROLES_CACHE_NAMESPACE, f'user:{user_id}')
+
+
+def get_roles(user):
+    """Return the names of ``user``'s groups as a frozenset."""
+    if not user.is_authenticated:
+        return frozenset()
+    roles = _local.get(user.pk)
+    if roles is not None:
+        return roles
+    key = _cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        with primary():
+            roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+    _local.set(user.pk, roles, getattr(settings, 'ROLE_CACHE_LOCAL_TTL', 5))
+    return roles
+
+
+def invalidate_roles(user_ids=None):
+    """Forget the cached roles of ``user_ids``, or of everyone when ``None``."""
+    if user_ids is None:
+        bump_generation(ROLES_CACHE_NAMESPACE)
+        _local.clear()
+        return
+    user_ids = list(user_ids)
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+    for user_id in user_ids:
+        _local.pop(user_id)
 
 
 class RoleRequiredMixin(AccessMixin):
@@ -17,9 +76,49 @@ class RoleRequiredMixin(AccessMixin):
         if not self.required_groups:
             return super().dispatch(request, *args, **kwargs)
 
-        user_groups = set(request.user.groups.values_list('name', flat=True))
-        if user_groups.intersection(set(self.required_groups)) or request.user.is_superuser:
+        if get_roles(request.user).intersection(self.required_groups) or request.user.is_superuser:
             return super().dispatch(request, *args, **kwargs)
 
         # Redirect to login page or show forbidden
         return redirect('dashboard')
+
+
+def bearer_token(request):
+    """The key of an ``Authorization: Bearer <key>`` header, or ``None``."""
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    return (key.strip() or None) if scheme.lower() == 'bearer' else None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ApiRoleRequiredMixin:
+    """``RoleRequiredMixin`` for endpoints called by machines, e.g. scanner gateways.
+
+    Clients send ``Authorization: Bearer <key>`` (``manage.py create_api_token``)
+    and act as the token's user. The view is CSRF exempt so they need no
+    session; requests authenticated by a browser session still get the CSRF
+    check. Failures are JSON 401/403 responses instead of redirects.
+    """
+    required_groups = None
+
+    def dispatch(self, request, *args, **kwargs):
+        key = bearer_token(request)
+        if key is not None:
+            user = ApiToken.objects.authenticate(key)
+            if user is None:
+                return self.unauthorized('Invalid token.')
+            request.user = user
+        elif not request.user.is_authenticated:
+            return self.unauthorized('Authentication required.')
+        elif CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {}) is not None:
+            return JsonResponse({'error': 'CSRF verification failed.'}, status=403)
+
+        if self.required_groups and not (
+            get_roles(request.user).intersection(self.required_groups) or request.user.is_superuser
+        ):
+            return JsonResponse({'error': 'Permission denied.'}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+
+    def unauthorized(self, message):
+        response = JsonResponse({'error': message}, status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
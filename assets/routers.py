@@ -0,0 +1,142 @@
+"""Primary/replica database routing with read-your-writes stickiness.
+
+Reads made while handling a request go to one of ``DATABASE_REPLICAS``
+(chosen once per request); everything else uses ``default``:
+
+- writes, and reads inside a transaction on ``default`` (signal handlers,
+  ``select_for_update``, ingestion);
+- the whole of a POST/PUT/PATCH/DELETE request, and any request made after
+  something was written during it;
+- requests from a client that wrote within the last ``REPLICA_PIN_SECONDS``,
+  marked by a short-lived cookie, so users never read their own writes from a
+  lagging replica;
+- management commands and other code outside a request.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+UNSAFE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+_routing = ContextVar('db_routing', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+class RequestRouting:
+    """Routing state of the current request."""
+    __slots__ = ('replica', 'pinned', 'wrote')
+
+    def __init__(self, replica, pinned):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.pinned or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        if _in_transaction():
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside this block.
+
+    For building shared caches after an invalidation: a lagging replica
+    would put the data from before the write back into the cache.
+    """
+    state = _routing.get()
+    if state is None or state.pinned:
+        yield
+        return
+    inner = RequestRouting(state.replica, pinned=True)
+    token = _routing.set(inner)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+        if inner.wrote:
+            state.wrote = state.pinned = True
+
+
+class ReplicaPinningMiddleware:
+    """Set up routing for each request and set the pin cookie after writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        aliases = replicas()
+        state = self.routing(request, aliases)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(response, state, aliases)
+
+    async def __acall__(self, request):
+        aliases = replicas()
+        state = self.routing(request, aliases)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(response, state, aliases)
+
+    def routing(self, request, aliases):
+        pinned = request.method in UNSAFE_METHODS or _pin_active(request)
+        return RequestRouting(random.choice(aliases) if aliases else None, pinned)
+
+    def pin(self, response, state, aliases):
+        if state.wrote and aliases:
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def _in_transaction():
+    # TestCase wraps each test in atomic blocks of its own; those don't count.
+    return any(not getattr(block, '_from_testcase', False) for block in connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+
+def _pin_active(request):
+    try:
+        return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
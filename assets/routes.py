@@ -0,0 +1,102 @@
+"""Location-to-location route graph.
+
+TransitStat is the sparse transition matrix (trips and total transit seconds
+per location pair), kept up to date incrementally by ``assets.analytics``.
+``route_graph`` loads it into adjacency maps once per analytics generation
+and caches the result, so route queries never touch movement history and
+only read the database after the analytics change.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from .caching import get_or_rebuild
+from .models import Location, TransitStat
+
+ROUTES_CACHE_NAMESPACE = 'routes'
+
+
+class RouteGraph:
+    """``outgoing[a][b]`` / ``incoming[b][a]`` are ``(trips, total_seconds)`` for moves a -> b."""
+
+    def __init__(self, edges, names):
+        self.names = names
+        self.outgoing = defaultdict(dict)
+        self.incoming = defaultdict(dict)
+        for from_id, to_id, trips, seconds in edges:
+            self.outgoing[from_id][to_id] = (trips, seconds)
+            self.incoming[to_id][from_id] = (trips, seconds)
+
+    def _location(self, location_id):
+        return {'location_id': location_id, 'location': self.names.get(location_id)}
+
+    def next_destinations(self, location_id, limit=10):
+        """Where assets go after ``location_id``, most frequent first, with their share of departures."""
+        destinations = {to_id: edge for to_id, edge in self.outgoing.get(location_id, {}).items() if to_id != location_id}
+        departures = sum(trips for trips, _ in destinations.values())
+        top = heapq.nlargest(limit, destinations.items(), key=lambda item: (item[1][0], -item[0]))
+        return [
+            dict(self._location(to_id), trips=trips, share=trips / departures, average_seconds=seconds / trips)
+            for to_id, (trips, seconds) in top
+        ]
+
+    def common_routes(self, limit=10):
+        """The most travelled location pairs."""
+        edges = (
+            (from_id, to_id, trips, seconds)
+            for from_id, targets in self.outgoing.items()
+            for to_id, (trips, seconds) in targets.items()
+            if from_id != to_id
+        )
+        return [
+            {
+                'from_location_id': from_id,
+                'from_location': self.names.get(from_id),
+                'to_location_id': to_id,
+                'to_location': self.names.get(to_id),
+                'trips': trips,
+                'average_seconds': seconds / trips,
+            }
+            for from_id, to_id, trips, seconds in heapq.nlargest(limit, edges, key=lambda e: (e[2], -e[0], -e[1]))
+        ]
+
+    def bottlenecks(self, limit=10):
+        """Locations where assets spend the most time in total (stays x average dwell).
+
+        ``backlog`` is arrivals minus departures among completed moves; a
+        persistently positive value means assets pile up there.
+        """
+        rows = []
+        for location_id in set(self.outgoing) | set(self.incoming):
+            targets = self.outgoing.get(location_id, {})
+            stays = sum(trips for trips, _ in targets.values())
+            dwell = sum(seconds for _, seconds in targets.values())
+            arrivals = sum(trips for from_id, (trips, _) in self.incoming.get(location_id, {}).items() if from_id != location_id)
+            departures = sum(trips for to_id, (trips, _) in targets.items() if to_id != location_id)
+            rows.append(dict(
+                self._location(location_id),
+                stays=stays,
+                total_dwell_seconds=dwell,
+                average_dwell_seconds=dwell / stays if stays else None,
+                arrivals=arrivals,
+                departures=departures,
+                backlog=arrivals - departures,
+            ))
+        return heapq.nlargest(limit, rows, key=lambda row: (row['total_dwell_seconds'], row['backlog'], -row['location_id']))
+
+
+def build_route_graph():
+    edges = TransitStat.objects.filter(trips__gt=0).values_list(
+        'from_location_id', 'to_location_id', 'trips', 'total_seconds'
+    ).iterator(chunk_size=5000)
+    return RouteGraph(edges, dict(Location.objects.values_list('pk', 'name').iterator(chunk_size=5000)))
+
+
+def route_graph():
+    """The cached graph for the current analytics generation."""
+    return get_or_rebuild(
+        ROUTES_CACHE_NAMESPACE,
+        'graph',
+        build_route_graph,
+        timeout=getattr(settings, 'ROUTE_GRAPH_CACHE_TIMEOUT', 3600),
+    )
@@ -0,0 +1,86 @@
+"""Asset search and autocomplete.
+
+``search_assets`` filters on substrings of name and description. On
+PostgreSQL the ``icontains`` lookups are served by the trigram GIN indexes
+from migration 0008 (when pg_trgm is available); on SQLite by the
+``assets_asset_fts`` FTS5 trigram table. Trigram indexes need at least three
+characters, so shorter terms fall back to a name prefix match.
+
+``autocomplete`` returns the first names starting with a prefix from a
+bounded in-process LRU, so hot prefixes cost no query; entries expire after
+``AUTOCOMPLETE_CACHE_TTL`` seconds and asset writes clear this process's
+entries.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .caching import LocalLRUCache
+from .models import Asset
+from .routers import primary
+
+MIN_TRIGRAM_LENGTH = 3
+FTS_TABLE = 'assets_asset_fts'
+
+_autocomplete_cache = LocalLRUCache(maxsize=getattr(settings, 'AUTOCOMPLETE_CACHE_SIZE', 1024))
+_fts_available = {}
+
+
+def has_fts():
+    """Whether the SQLite FTS5 table from migration 0008 exists on this database."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available[name] = cursor.fetchone() is not None
+    return _fts_available[name]
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def search_assets(term, queryset=None):
+    """Filter ``queryset`` (default: all assets) to those whose name or description contains ``term``."""
+    queryset = Asset.objects.all() if queryset is None else queryset
+    term = term.strip()
+    if not term:
+        return queryset
+    if len(term) < MIN_TRIGRAM_LENGTH:
+        return queryset.filter(name__istartswith=term)
+    if has_fts():
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts_phrase(term)]
+        ))
+    return queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+
+
+def _prefix_matches(prefix, limit):
+    queryset = Asset.objects.filter(name__istartswith=prefix)
+    if len(prefix) >= MIN_TRIGRAM_LENGTH and has_fts():
+        # SQLite cannot use an index for case-insensitive LIKE; narrow with FTS first.
+        queryset = search_assets(prefix, queryset)
+    return [
+        {'id': pk, 'name': name}
+        for pk, name in queryset.order_by('name', 'pk').values_list('pk', 'name')[:limit]
+    ]
+
+
+def autocomplete(prefix, limit=None):
+    """Up to ``limit`` assets whose name starts with ``prefix``, alphabetically."""
+    limit = limit or getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+    key = (prefix.strip().casefold(), limit)
+    if not key[0]:
+        return []
+    results = _autocomplete_cache.get(key)
+    if results is None:
+        with primary():
+            results = _prefix_matches(key[0], limit)
+        _autocomplete_cache.set(key, results, getattr(settings, 'AUTOCOMPLETE_CACHE_TTL', 30))
+    return results
+
+
+def clear_autocomplete_cache():
+    _autocomplete_cache.clear()
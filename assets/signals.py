@@ -1,23 +1,217 @@
-from django.db.models.signals import post_save, post_delete
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import Asset, AssetLocation
+from .analytics import refresh_assets
+from .caching import bump_generation
+from .permissions import invalidate_roles
+from .search import clear_autocomplete_cache
+from .models import Asset, Location, AssetLocation, CurrentLocation, DashboardRollup, InventoryCheckpoint, LocationRollup
+
+DASHBOARD_CACHE_NAMESPACE = 'dashboard'
 
-DASHBOARD_CACHE_KEY = '_dashboard_view'  # shared key used by cache_page on dashboard
+_cascade = ContextVar('delete_cascade', default=None)
 
 
 def invalidate_dashboard():
-    """Clear the dashboard cache so next request gets fresh data."""
-    cache.delete(DASHBOARD_CACHE_KEY)
+    """Move the dashboard cache to a new generation so next request gets fresh data."""
+    bump_generation(DASHBOARD_CACHE_NAMESPACE)
+
+
+def _decimal(value):
+    return Decimal(str(value or 0))
+
+
+@receiver(post_save, sender=Asset)
+def handle_asset_change(sender, instance, created, **kwargs):
+    """When assets are created/updated, adjust the rollups and invalidate the dashboard cache."""
+    value = _decimal(instance.value)
+    if created:
+        DashboardRollup.objects.adjust(total_assets=1, total_value=value)
+    else:
+        delta = value - _decimal(getattr(instance, '_loaded_value', value))
+        if delta:
+            DashboardRollup.objects.adjust(total_value=delta)
+            location_id = CurrentLocation.objects.filter(asset_id=instance.pk).values_list('location_id', flat=True).first()
+            if location_id is not None:
+                LocationRollup.objects.adjust({location_id: (0, delta)})
+    instance._loaded_value = instance.value
+    clear_autocomplete_cache()
+    invalidate_dashboard()
+
+
+class DeleteCascade:
+    """Movements removed by deleting assets or locations, settled in one batch.
+
+    Deleting an asset or a location cascades to its movements. Rather than
+    running the per-movement handler for each of them, the pre_delete handlers
+    collect what the cascade will touch and the last post_delete applies it:
+    one current-location refresh, one analytics refresh, one rollup adjust
+    and one dashboard invalidation for the whole delete.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        # The atomic block of the delete; the cascade is over once it exits,
+        # even if the delete failed before its post_delete signals were sent.
+        blocks = transaction.get_connection(using).atomic_blocks
+        self.block = blocks[-1] if blocks else None
+        self.pending = 0
+        self.asset_values = {}  # deleted asset -> value, for the rollups
+        self.location_ids = set()
+        self.refresh_ids = set()
+        self.since = {}  # asset -> earliest of its movements being deleted
+        self.movements = 0
+
+    def active(self, using):
+        return using == self.using and self.block in transaction.get_connection(using).atomic_blocks
+
+    def covers(self, movement):
+        return movement.asset_id in self.asset_values or movement.location_id in self.location_ids
+
+    def collect(self, movements):
+        rows = movements.values('asset_id').annotate(n=Count('pk'), since=Min('timestamp')).order_by()
+        for asset_id, n, since in rows.values_list('asset_id', 'n', 'since'):
+            self.movements += n
+            self.since[asset_id] = min(self.since.get(asset_id, since), since)
+            self.refresh_ids.add(asset_id)
+
+    def settle(self):
+        CurrentLocation.objects.refresh(self.refresh_ids, asset_values=self.asset_values)
+        if self.since:
+            InventoryCheckpoint.objects.invalidate_from(min(self.since.values()))
+            refresh_assets(self.since)
+        DashboardRollup.objects.adjust(
+            total_assets=-len(self.asset_values),
+            total_value=-sum(self.asset_values.values(), Decimal(0)),
+            total_locations=-len(self.location_ids),
+            total_movements=-self.movements,
+        )
+        if self.asset_values:
+            clear_autocomplete_cache()
+        invalidate_dashboard()
+
+
+def _begin_cascade(using):
+    cascade = _cascade.get()
+    if cascade is None or not cascade.active(using):
+        cascade = DeleteCascade(using)
+        _cascade.set(cascade)
+    cascade.pending += 1
+    return cascade
+
 
+def _end_cascade(using):
+    cascade = _cascade.get()
+    if cascade is None or not cascade.active(using):
+        return
+    cascade.pending -= 1
+    if not cascade.pending:
+        _cascade.set(None)
+        cascade.settle()
 
-@receiver([post_save, post_delete], sender=Asset)
-def handle_asset_change(sender, instance, **kwargs):
-    """When assets are created/updated/deleted, invalidate the dashboard cache."""
+
+def _settled_by_cascade(movement, using):
+    cascade = _cascade.get()
+    return cascade is not None and cascade.active(using) and cascade.covers(movement)
+
+
+@receiver(pre_delete, sender=Asset)
+def collect_asset_delete(sender, instance, using, **kwargs):
+    cascade = _begin_cascade(using)
+    cascade.asset_values[instance.pk] = _decimal(instance.value)
+    # Also catches a current location left without history.
+    cascade.refresh_ids.add(instance.pk)
+    cascade.collect(AssetLocation.objects.using(using).filter(asset_id=instance.pk))
+
+
+@receiver(post_delete, sender=Asset)
+def handle_asset_delete(sender, instance, using, **kwargs):
+    """When assets are deleted, adjust the rollups and invalidate the dashboard cache."""
+    _end_cascade(using)
+
+
+@receiver(post_save, sender=Location)
+def handle_location_save(sender, instance, created, **kwargs):
+    """New locations start with an empty rollup row; renames show on the dashboard."""
+    if created:
+        LocationRollup.objects.get_or_create(location=instance)
+        DashboardRollup.objects.adjust(total_locations=1)
     invalidate_dashboard()
 
 
+@receiver(pre_delete, sender=Location)
+def collect_location_delete(sender, instance, using, **kwargs):
+    cascade = _begin_cascade(using)
+    cascade.location_ids.add(instance.pk)
+    cascade.collect(AssetLocation.objects.using(using).filter(location_id=instance.pk))
+    # Assets placed here by an archived position have no movement here left.
+    cascade.refresh_ids.update(
+        CurrentLocation.objects.using(using).filter(location_id=instance.pk).values_list('asset_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Location)
+def handle_location_delete(sender, instance, using, **kwargs):
+    _end_cascade(using)
+
+
 @receiver([post_save, post_delete], sender=AssetLocation)
-def handle_movement_change(sender, instance, **kwargs):
-    """When movements are recorded/updated/deleted, invalidate the dashboard cache."""
-    invalidate_dashboard()
\ No newline at end of file
+def handle_movement_change(sender, instance, created=False, **kwargs):
+    """When movements are recorded/updated/deleted, refresh the asset's current
+    location, adjust the rollups, invalidate checkpoints the change precedes
+    and invalidate the dashboard cache."""
+    if kwargs['signal'] is post_delete and _settled_by_cascade(instance, kwargs['using']):
+        # Settled in one batch when the asset or location delete finishes.
+        return
+    CurrentLocation.objects.refresh([instance.asset_id, getattr(instance, '_loaded_asset_id', None)])
+    loaded_timestamp = getattr(instance, '_loaded_timestamp', None)
+    InventoryCheckpoint.objects.invalidate_from(
+        min(instance.timestamp, loaded_timestamp) if loaded_timestamp else instance.timestamp
+    )
+    if not created:
+        # New movements are folded into the analytics in batches
+        # (refresh_analytics); edits and deletes rewrite stays right away.
+        since = {instance.asset_id: instance.timestamp}
+        loaded_asset_id = getattr(instance, '_loaded_asset_id', None)
+        if loaded_asset_id is not None and loaded_timestamp is not None:
+            since[loaded_asset_id] = min(since.get(loaded_asset_id, loaded_timestamp), loaded_timestamp)
+        refresh_assets(since)
+    if created:
+        DashboardRollup.objects.adjust(total_movements=1)
+    elif kwargs['signal'] is post_delete:
+        DashboardRollup.objects.adjust(total_movements=-1)
+    invalidate_dashboard()
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def handle_group_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached roles of users added to or removed from groups."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_roles([instance.pk])
+    elif pk_set:
+        invalidate_roles(pk_set)
+    else:
+        # group.user_set.clear(): the affected users are no longer known.
+        invalidate_roles()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def handle_group_change(sender, instance, created=False, **kwargs):
+    """Renamed or deleted groups change the roles of all their members."""
+    if not created:
+        invalidate_roles()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def handle_user_change(sender, instance, created=False, **kwargs):
+    """New or deleted users must not inherit roles cached under a reused id."""
+    if created or kwargs['signal'] is post_delete:
+        invalidate_roles([instance.pk])
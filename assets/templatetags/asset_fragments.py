@@ -0,0 +1,10 @@
+from django import template
+from ..fragments import render_rows
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_rows(objects, kind):
+    """``{% cached_rows assets 'asset' %}``: the rows of ``objects``, cached per object and per page."""
+    return render_rows(kind, objects)
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .analytics import process_new_movements, rebuild
+from .models import Asset, AssetLocation, DwellRecord, Location, TransitStat
+
+
+class DwellAnalyticsTest(TestCase):
+    def setUp(self):
+        self.t0 = timezone.now() - timedelta(days=30)
+        self.dock = Location.objects.create(name='Dock', address='1 Road')
+        self.yard = Location.objects.create(name='Yard', address='2 Road')
+        self.shop = Location.objects.create(name='Shop', address='3 Road')
+        self.crate = Asset.objects.create(name='Crate', value=1)
+        self.van = Asset.objects.create(name='Van', value=2)
+
+    def move(self, asset, location, hours):
+        return AssetLocation.objects.create(asset=asset, location=location, timestamp=self.t0 + timedelta(hours=hours))
+
+    def state(self):
+        stays = set(DwellRecord.objects.values_list('movement_id', 'location_id', 'next_location_id', 'seconds'))
+        stats = {(s.from_location_id, s.to_location_id): (s.trips, s.total_seconds) for s in TransitStat.objects.filter(trips__gt=0)}
+        return stays, stats
+
+    def test_incremental_matches_rebuild(self):
+        self.move(self.crate, self.dock, 0)
+        self.move(self.crate, self.yard, 2)
+        self.move(self.van, self.dock, 1)
+        process_new_movements()
+        self.assertEqual(TransitStat.objects.get(from_location=self.dock, to_location=self.yard).total_seconds, 7200)
+        self.move(self.crate, self.shop, 5)
+        self.move(self.van, self.yard, 4)
+        self.move(self.crate, self.dock, 1)  # back-dated between two stays
+        self.assertEqual(process_new_movements(), 6)
+        incremental = self.state()
+        rebuild()
+        self.assertEqual(incremental, self.state())
+        self.assertEqual(TransitStat.objects.get(from_location=self.dock, to_location=self.yard).trips, 2)
+
+    def test_edit_and_delete_apply_immediately(self):
+        self.move(self.crate, self.dock, 0)
+        middle = self.move(self.crate, self.yard, 2)
+        self.move(self.crate, self.shop, 3)
+        process_new_movements()
+        middle.delete()
+        self.assertEqual(
+            DwellRecord.objects.get(location=self.dock).next_location_id, self.shop.pk
+        )
+        last = AssetLocation.objects.get(location=self.shop)
+        last.asset = self.van
+        last.save()
+        stays, stats = self.state()
+        rebuild()
+        self.assertEqual((stays, stats), self.state())
+        self.assertIsNone(DwellRecord.objects.get(location=self.dock).departed_at)
+
+    def test_archived_predecessor_keeps_its_stay(self):
+        first = self.move(self.crate, self.dock, 0)
+        process_new_movements()
+        AssetLocation.objects.filter(pk=first.pk)._raw_delete('default')
+        self.move(self.crate, self.yard, 6)
+        process_new_movements()
+        stay = DwellRecord.objects.get(movement_id=first.pk)
+        self.assertEqual((stay.next_location_id, stay.seconds), (self.yard.pk, 6 * 3600))
+
+    def test_analytics_view(self):
+        self.move(self.crate, self.dock, 0)
+        self.move(self.crate, self.yard, 3)
+        process_new_movements()
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        data = self.client.get(reverse('analytics'), {'format': 'json', 'asset': self.crate.pk}).json()
+        self.assertEqual(data['transit'], [
+            {'from_location_id': self.dock.pk, 'to_location_id': self.yard.pk, 'trips': 1, 'average_seconds': 10800.0}
+        ])
+        self.assertEqual(len(data['stays']), 2)
+        self.assertContains(self.client.get(reverse('analytics')), 'Yard')
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.http import Http404
+from django.test import AsyncClient, AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from .async_queries import gather_queries
+from .metrics import SqlStats, _current_sql
+from .models import Asset, AssetLocation, Location
+from .views import asset_detail_async, asset_list_async, assetlocation_list_async, dashboard_async
+
+
+class AsyncViewTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='u', password='p')
+        self.dock = Location.objects.create(name='Dock', address='1 Road')
+        self.assets = [Asset.objects.create(name=f'Crate {i}', value=1) for i in range(12)]
+        AssetLocation.objects.create(asset=self.assets[0], location=self.dock)
+
+    def call(self, view, user=None, data=None, headers=None, **kwargs):
+        request = AsyncRequestFactory().get('/', data or {}, headers=headers)
+        request.user = user or self.user
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_dashboard(self):
+        resp = self.call(dashboard_async)
+        self.assertContains(resp, 'Crate 0')
+        self.assertContains(resp, 'Dock')
+
+    def test_lists_paginate_with_cursors(self):
+        data = json.loads(self.call(asset_list_async, data={'format': 'json'}).content)
+        self.assertEqual(len(data['results']), 10)
+        second = json.loads(self.call(asset_list_async, data={'format': 'json', 'cursor': data['next']}).content)
+        self.assertEqual([r['name'] for r in second['results']], ['Crate 1', 'Crate 0'])
+        self.assertContains(self.call(assetlocation_list_async), 'Dock')
+        with self.assertRaises(Http404):
+            self.call(asset_list_async, data={'cursor': 'garbage'})
+
+    def test_detail_and_login(self):
+        self.assertContains(self.call(asset_detail_async, pk=self.assets[0].pk), 'Dock')
+        with self.assertRaises(Http404):
+            self.call(asset_detail_async, pk=0)
+        self.assertEqual(self.call(dashboard_async, user=AnonymousUser()).status_code, 302)
+
+    def test_conditional_get(self):
+        for view, kwargs in [(dashboard_async, {}), (asset_list_async, {}), (asset_detail_async, {'pk': self.assets[0].pk})]:
+            etag = self.call(view, **kwargs)['ETag']
+            self.assertEqual(self.call(view, headers={'if-none-match': etag}, **kwargs).status_code, 304)
+
+
+urlpatterns = [path('async/assets/', asset_list_async)]
+
+
+@override_settings(ROOT_URLCONF=__name__, DEBUG=True)
+class AsyncMiddlewareStackTest(TestCase):
+    async def test_async_view_runs_without_thread_hops(self):
+        user = await get_user_model().objects.acreate_user(username='u', password='p')
+        await Asset.objects.acreate(name='Crate', value=1)
+        client = AsyncClient()
+        await client.aforce_login(user)
+        # With DEBUG on, Django logs every middleware it has to run in a thread.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            resp = await client.get('/async/assets/', {'format': 'json'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([row['name'] for row in resp.json()['results']], ['Crate'])
+        self.assertIn('desc="', resp['Server-Timing'])
+
+
+class GatherQueriesTest(TransactionTestCase):
+    def test_queries_run_concurrently_on_separate_connections(self):
+        Location.objects.create(name='Dock', address='1 Road')
+        seen = []
+
+        def query():
+            seen.append((threading.get_ident(), id(connection.connection)))
+            time.sleep(0.2)
+            return Location.objects.count()
+
+        start = time.monotonic()
+        results = async_to_sync(gather_queries)(query, query, query)
+        self.assertEqual(results, [1, 1, 1])
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(len({thread for thread, _ in seen}), 3)
+
+    def test_sql_instrumentation_follows_the_request_into_worker_threads(self):
+        stats = SqlStats()
+        token = _current_sql.set(stats)
+        try:
+            async_to_sync(gather_queries)(Location.objects.count, Asset.objects.count)
+        finally:
+            _current_sql.reset(token)
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.seconds, 0)
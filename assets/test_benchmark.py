@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+from .benchmark import CASES, check_budgets, percentile, run_cases, seed, uncovered_url_names
+from .models import Asset, AssetLocation, CurrentLocation, DashboardRollup, DwellRecord
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        seed(assets=30, locations=5, movements=300, days=30)
+
+    def test_seed_builds_derived_state(self):
+        self.assertEqual(AssetLocation.objects.count(), 300)
+        self.assertEqual(DashboardRollup.objects.totals().total_movements, 300)
+        self.assertEqual(CurrentLocation.objects.count(), Asset.objects.filter(locations__isnull=False).distinct().count())
+        self.assertEqual(DwellRecord.objects.count(), 300)
+
+    def test_every_url_has_a_case_within_budget(self):
+        self.assertEqual(uncovered_url_names(), [])
+        user = get_user_model().objects.create_user(username='bench', password='p')
+        for name in ('manager', 'admin'):
+            Group.objects.get_or_create(name=name)[0].user_set.add(user)
+        self.client.force_login(user)
+        results = run_cases(self.client, iterations=2, warmup=1)
+        self.assertEqual(set(results), {case.name for case in CASES})
+        self.assertEqual(check_budgets(results, p95_ms=60000), [])
+
+    def test_budgets(self):
+        result = {'status': 200, 'queries': 9, 'p95_ms': 12.0}
+        self.assertEqual(check_budgets({'dashboard': result}, p95_ms=100), ['dashboard: 9 queries > budget 2'])
+        self.assertEqual(check_budgets({'dashboard': result}, {'dashboard': {'queries': 9, 'p95_ms': 10}}), [
+            'dashboard: p95 12.0 ms > budget 10 ms',
+        ])
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
@@ -2,6 +2,9 @@ from django.test import TestCase, Client
 from django.urls import reverse
 from django.core.cache import cache
 from .models import Asset
+from .caching import bump_generation, get_generation, get_or_rebuild
+from .metrics import cache_event_counts
+from .signals import DASHBOARD_CACHE_NAMESPACE
 import time
 
 
@@ -33,6 +36,42 @@ class CachingTest(TestCase):
         self.assertIn('Total assets', str(resp2.content))
         self.assertIn('1', str(resp2.content))  # one asset now
 
+    def test_invalidation_bumps_generation_for_every_variant(self):
+        """A write moves the dashboard to a new generation shared by all users and headers."""
+        from django.contrib.auth import get_user_model
+        get_user_model().objects.create_user(username='other', password='pass')
+        other = Client(HTTP_ACCEPT_LANGUAGE='de')
+        other.login(username='other', password='pass')
+
+        self.client.get(reverse('dashboard'))
+        other.get(reverse('dashboard'))
+        before = get_generation(DASHBOARD_CACHE_NAMESPACE)
+        self.assertEqual(cache.get('dashboard:entry:context')['generation'], before)
+
+        Asset.objects.create(name='Fresh', value=1.00)
+        self.assertEqual(get_generation(DASHBOARD_CACHE_NAMESPACE), before + 1)
+        for client in (self.client, other):
+            self.assertEqual(client.get(reverse('dashboard')).context['total_assets'], 1)
+
+    def test_single_flight_serves_stale_while_rebuilding(self):
+        self.assertEqual(get_or_rebuild('t', 'v', lambda: 'old', timeout=60), 'old')
+        bump_generation('t')
+        # Another worker holds the rebuild lock: we get the previous value.
+        cache.add('t:lock:v', 1)
+        self.assertEqual(get_or_rebuild('t', 'v', lambda: 'new', timeout=60), 'old')
+        cache.delete('t:lock:v')
+        self.assertEqual(get_or_rebuild('t', 'v', lambda: 'new', timeout=60), 'new')
+        self.assertEqual(get_or_rebuild('t', 'v', lambda: 'newer', timeout=60), 'new')
+        self.assertEqual(cache_event_counts('t'), {'rebuild': 2, 'stale': 1, 'hit': 1})
+
+    def test_early_refresh_before_expiry(self):
+        get_or_rebuild('e', 'v', lambda: 1, timeout=60)
+        entry = cache.get('e:entry:v')
+        entry.update(expires=time.time() + 1, delta=10.0)
+        cache.set('e:entry:v', entry)
+        self.assertEqual(get_or_rebuild('e', 'v', lambda: 2, timeout=60, beta=1000), 2)
+        self.assertEqual(get_or_rebuild('e', 'v', lambda: 3, timeout=60, beta=0), 2)
+
     def test_metrics_endpoint(self):
         """Test that metrics endpoint returns comprehensive stats."""
         cache.clear()  # ensure clean state
@@ -51,6 +90,8 @@ class CachingTest(TestCase):
         self.assertIn('cache_hits', data)
         self.assertIn('cache_misses', data)
         self.assertGreaterEqual(data['cache_hits'] + data['cache_misses'], 1)
+        self.assertGreaterEqual(data['dashboard_cache_rebuilds'], 1)
+        self.assertIn('dashboard_cache_stale', data)
         
         # Performance metrics
         self.assertIn('response_time_avg', data)
@@ -0,0 +1,69 @@
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from .models import Asset, AssetLocation, Location
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.dock = Location.objects.create(name='Dock', address='Road')
+        self.asset = Asset.objects.create(name='Crate', value=1)
+        self.movement = AssetLocation.objects.create(asset=self.asset, location=self.dock)
+
+    def revalidate(self, url):
+        """GET ``url``, then GET it again with the ETag it returned."""
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        return first['ETag'], self.client.get(url, headers={'if-none-match': first['ETag']})
+
+    def test_unchanged_pages_are_not_rendered(self):
+        for url in [
+            reverse('dashboard'),
+            reverse('asset_list'),
+            reverse('asset_detail', args=[self.asset.pk]),
+            reverse('asset_detail', args=[self.asset.pk]) + '?view=stays',
+            reverse('location_list'),
+            reverse('location_detail', args=[self.dock.pk]),
+            reverse('assetlocation_list'),
+        ]:
+            with self.subTest(url=url):
+                etag, response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.templates, [])
+
+    def test_edits_change_the_etag(self):
+        urls = [reverse('dashboard'), reverse('location_list'), reverse('assetlocation_list')]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.dock.name = 'Quay'
+        self.dock.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, headers={'if-none-match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Quay')
+
+    def test_deleted_row_changes_the_list_etag(self):
+        other = AssetLocation.objects.create(asset=self.asset, location=self.dock)
+        etag = self.client.get(reverse('assetlocation_list'))['ETag']
+        other.delete()
+        response = self.client.get(reverse('assetlocation_list'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_are_always_rendered(self):
+        etag = self.client.get(reverse('asset_list'))['ETag']
+        # Queue a message as a form view would: add it and store it in the response cookie.
+        response = self.client.get(reverse('asset_list'))
+        messages.success(response.wsgi_request, 'Saved')
+        response.wsgi_request._messages.update(response)
+        self.client.cookies.update(response.cookies)
+        response = self.client.get(reverse('asset_list'), headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertContains(response, 'Saved')
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .models import Asset, Location, AssetLocation, CurrentLocation
+
+
+class CurrentLocationTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.asset = Asset.objects.create(name='Pallet', value=10.00)
+        self.depot = Location.objects.create(name='Depot', address='1 Road')
+        self.hub = Location.objects.create(name='Hub', address='2 Road')
+
+    def current(self):
+        return CurrentLocation.objects.filter(asset=self.asset).values_list('location_id', flat=True).first()
+
+    def test_latest_movement_wins(self):
+        AssetLocation.objects.create(asset=self.asset, location=self.depot, timestamp=self.now)
+        self.assertEqual(self.current(), self.depot.pk)
+        # A back-dated scan arriving late must not move the asset.
+        AssetLocation.objects.create(asset=self.asset, location=self.hub, timestamp=self.now - timedelta(days=1))
+        self.assertEqual(self.current(), self.depot.pk)
+
+    def test_edit_and_delete_recompute(self):
+        old = AssetLocation.objects.create(asset=self.asset, location=self.hub, timestamp=self.now - timedelta(days=1))
+        latest = AssetLocation.objects.create(asset=self.asset, location=self.depot, timestamp=self.now)
+        latest.delete()
+        self.assertEqual(self.current(), self.hub.pk)
+
+        other = Asset.objects.create(name='Crate', value=5.00)
+        old = AssetLocation.objects.get(pk=old.pk)
+        old.asset = other
+        old.save()
+        self.assertIsNone(self.current())
+        self.assertEqual(CurrentLocation.objects.get(asset=other).location_id, self.hub.pk)
+
+    def test_location_delete_repoints_assets(self):
+        AssetLocation.objects.create(asset=self.asset, location=self.hub, timestamp=self.now - timedelta(days=1))
+        AssetLocation.objects.create(asset=self.asset, location=self.depot, timestamp=self.now)
+        self.depot.delete()
+        self.assertEqual(self.current(), self.hub.pk)
+
+    def test_location_list_counts_only_current_assets(self):
+        from django.contrib.auth import get_user_model
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        AssetLocation.objects.create(asset=self.asset, location=self.hub, timestamp=self.now - timedelta(days=1))
+        AssetLocation.objects.create(asset=self.asset, location=self.depot, timestamp=self.now)
+        resp = self.client.get(reverse('location_list'))
+        counts = {loc.pk: loc.asset_count for loc in resp.context['locations']}
+        self.assertEqual(counts, {self.depot.pk: 1, self.hub.pk: 0})
+
+    def test_rebuild_command(self):
+        AssetLocation.objects.create(asset=self.asset, location=self.depot, timestamp=self.now)
+        CurrentLocation.objects.all().delete()
+        call_command('rebuild_current_locations', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.current(), self.depot.pk)
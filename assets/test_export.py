@@ -0,0 +1,54 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .models import Asset, Location, AssetLocation
+
+
+class MovementExportTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.now = timezone.now()
+        self.asset = Asset.objects.create(name='Tote', value=1.00)
+        self.dock = Location.objects.create(name='Dock', address='1 Road')
+        self.yard = Location.objects.create(name='Yard', address='2 Road')
+        for days, loc in [(3, self.dock), (2, self.yard), (1, self.dock)]:
+            AssetLocation.objects.create(asset=self.asset, location=loc, timestamp=self.now - timedelta(days=days))
+
+    def get(self, **params):
+        resp = self.client.get(reverse('assetlocation_export'), params)
+        self.assertEqual(resp.status_code, 200)
+        return b''.join(resp.streaming_content)
+
+    def test_ndjson_filtered_by_location_and_range(self):
+        body = self.get(location=self.dock.pk, start=(self.now - timedelta(days=2, hours=12)).isoformat())
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['asset'], rows[0]['location']), ('Tote', 'Dock'))
+
+    def test_gzip_csv(self):
+        body = gzip.decompress(self.get(format='csv', compress='1'))
+        rows = list(csv.reader(io.StringIO(body.decode())))
+        self.assertEqual(rows[0], ['id', 'asset_id', 'asset', 'location_id', 'location', 'timestamp'])
+        self.assertEqual([r[4] for r in rows[1:]], ['Dock', 'Yard', 'Dock'])
+
+    def test_invalid_range(self):
+        resp = self.client.get(reverse('assetlocation_export'), {'start': self.now.isoformat(), 'end': '2000-01-01'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out.ndjson.gz')
+            call_command('export_movements', gzip=True, output=path, asset=[self.asset.pk])
+            with gzip.open(path, 'rt') as fh:
+                self.assertEqual(len(fh.readlines()), 3)
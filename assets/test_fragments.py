@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.backends.django import Template
+from django.test import TestCase
+from django.urls import reverse
+from .metrics import cache_event_counts
+from .models import Asset, AssetLocation, Location
+
+
+class FragmentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.dock = Location.objects.create(name='Dock', address='Road')
+        self.assets = [Asset.objects.create(name=f'Crate {i}', value=1) for i in range(3)]
+        for asset in self.assets:
+            AssetLocation.objects.create(asset=asset, location=self.dock)
+
+    def rendered_rows(self, url):
+        """Fetch ``url`` and return it with the number of templates rendered for it."""
+        with mock.patch.object(Template, 'render', autospec=True, side_effect=Template.render) as render:
+            response = self.client.get(url)
+        rows = [c for c in render.call_args_list if c.args[0].template.name.startswith('assets/_')]
+        return response, len(rows)
+
+    def test_repeat_request_serves_the_cached_page(self):
+        response, rendered = self.rendered_rows(reverse('asset_list'))
+        self.assertEqual(rendered, 3)
+        hits = cache_event_counts('fragments')['hit']
+        again, rendered = self.rendered_rows(reverse('asset_list'))
+        self.assertEqual(rendered, 0)
+        self.assertEqual(again.content, response.content)
+        self.assertEqual(cache_event_counts('fragments')['hit'], hits + 1)
+
+    def test_edit_rerenders_only_the_changed_row(self):
+        self.rendered_rows(reverse('asset_list'))
+        asset = self.assets[1]
+        asset.name = 'Pallet'
+        asset.save()
+        response, rendered = self.rendered_rows(reverse('asset_list'))
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Pallet')
+        self.assertNotContains(response, 'Crate 1')
+
+    def test_related_rename_refreshes_movement_and_location_rows(self):
+        self.rendered_rows(reverse('assetlocation_list'))
+        self.rendered_rows(reverse('location_list'))
+        self.dock.name = 'Quay'
+        self.dock.save()
+        self.assets[2].name = 'Pallet'
+        self.assets[2].save()
+        response, rendered = self.rendered_rows(reverse('assetlocation_list'))
+        self.assertEqual(rendered, 3)
+        self.assertContains(response, 'Quay')
+        response, rendered = self.rendered_rows(reverse('location_list'))
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Quay')
+        self.assertContains(response, 'Pallet')
+
+    def test_versions_load_with_the_page(self):
+        with self.assertNumQueries(3):  # session, user, movements joined to assets and locations
+            self.client.get(reverse('assetlocation_list'))
+
+    def test_empty_list(self):
+        AssetLocation.objects.all().delete()
+        self.assertContains(self.client.get(reverse('assetlocation_list')), 'No movements')
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .history import _decode_stays_cursor, _stays_query, collapsed_stays, movement_history
+from .models import Asset, AssetLocation, Location
+from .pagination import InvalidCursor
+
+
+class AssetHistoryTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.t0 = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        self.dock, self.yard = (Location.objects.create(name=n, address='Road') for n in ('Dock', 'Yard'))
+        self.asset = Asset.objects.create(name='Pallet', value=1)
+        # Dock x3, Yard x2, Dock x1, Yard x2 (hourly scans).
+        for hour, location in enumerate([self.dock] * 3 + [self.yard] * 2 + [self.dock] + [self.yard] * 2):
+            AssetLocation.objects.create(asset=self.asset, location=location, timestamp=self.at(hour))
+
+    def at(self, hour):
+        return self.t0 + timedelta(hours=hour)
+
+    def test_scans_page_newest_first(self):
+        page = movement_history(self.asset.pk, per_page=5)
+        self.assertEqual([m.timestamp for m in page], [self.at(h) for h in (7, 6, 5, 4, 3)])
+        rest = movement_history(self.asset.pk, page.next_cursor, per_page=5)
+        self.assertEqual([m.timestamp for m in rest], [self.at(h) for h in (2, 1, 0)])
+        self.assertIsNone(rest.next_cursor)
+
+    def test_collapsed_stays(self):
+        stays = list(collapsed_stays(self.asset.pk))
+        self.assertEqual(
+            [(s.location, s.started_at, s.last_seen_at, s.ended_at, s.scans) for s in stays],
+            [
+                ('Yard', self.at(6), self.at(7), None, 2),
+                ('Dock', self.at(5), self.at(5), self.at(6), 1),
+                ('Yard', self.at(3), self.at(4), self.at(5), 2),
+                ('Dock', self.at(0), self.at(2), self.at(3), 3),
+            ],
+        )
+
+    def pages(self, per_page):
+        cursor, pages = None, []
+        while True:
+            page = collapsed_stays(self.asset.pk, cursor, per_page=per_page)
+            pages.append(list(page))
+            cursor = page.next_cursor
+            if cursor is None:
+                return pages
+
+    def test_stays_pages_carry_the_open_stay(self):
+        # Each page reads three scans; a stay still open at the end of a page is finished on the next.
+        pages = self.pages(per_page=2)
+        self.assertEqual(
+            [[(s.location, s.started_at, s.ended_at, s.scans) for s in page] for page in pages],
+            [
+                [('Yard', self.at(6), None, 2)],
+                [('Dock', self.at(5), self.at(6), 1), ('Yard', self.at(3), self.at(5), 2)],
+                [('Dock', self.at(0), self.at(3), 3)],
+            ],
+        )
+        self.assertEqual(sum(pages, []), list(collapsed_stays(self.asset.pk)))
+
+    def test_long_stay_is_read_page_by_page(self):
+        for hour in range(8, 20):
+            AssetLocation.objects.create(asset=self.asset, location=self.yard, timestamp=self.at(hour))
+        pages = self.pages(per_page=3)
+        self.assertEqual([len(page) for page in pages[:3]], [0, 0, 0])
+        self.assertEqual([(s.started_at, s.last_seen_at, s.scans) for s in pages[3][:1]], [(self.at(6), self.at(19), 14)])
+        with self.assertRaises(InvalidCursor):
+            collapsed_stays(self.asset.pk, movement_history(self.asset.pk, per_page=1).next_cursor)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_stays_seek_is_an_index_range(self):
+        after = _decode_stays_cursor(collapsed_stays(self.asset.pk, per_page=2).next_cursor)
+        sql, params = _stays_query(self.asset.pk, after, 3)
+        with connection.cursor() as db:
+            db.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in db.fetchall())
+        self.assertIn('(asset_id=? AND timestamp<?)', plan)
+
+    @override_settings(ASSET_HISTORY_PAGE_SIZE=3)
+    def test_detail_page_and_json_endpoint(self):
+        response = self.client.get(reverse('asset_detail', args=[self.asset.pk]), {'view': 'stays'})
+        self.assertContains(response, 'to now (2 scans)')
+        self.assertContains(response, 'data-view="stays"')
+        data = self.client.get(reverse('asset_history', args=[self.asset.pk])).json()
+        self.assertEqual([r['timestamp'] for r in data['results']], [self.at(h).isoformat() for h in (7, 6, 5)])
+        data = self.client.get(reverse('asset_history', args=[self.asset.pk]), {'view': 'stays'}).json()
+        self.assertEqual([(r['location']['name'], r['scans']) for r in data['results']], [('Yard', 2), ('Dock', 1)])
+        data = self.client.get(reverse('asset_history', args=[self.asset.pk]), {'cursor': data['next_cursor'], 'view': 'stays'}).json()
+        self.assertEqual([(r['location']['name'], r['scans']) for r in data['results']], [('Yard', 2)])
+        self.assertEqual(self.client.get(reverse('asset_history', args=[self.asset.pk]), {'cursor': '!'}).status_code, 404)
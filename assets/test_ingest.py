@@ -0,0 +1,164 @@
+import io
+import json
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from .models import ApiToken, Asset, Location, AssetLocation, CurrentLocation
+
+User = get_user_model()
+
+
+class BulkMovementTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        manager = User.objects.create_user(username='m', password='m')
+        Group.objects.get_or_create(name='manager')[0].user_set.add(manager)
+        self.client.login(username='m', password='m')
+        self.asset = Asset.objects.create(name='Tote', value=1.00)
+        self.loc = Location.objects.create(name='Dock', address='3 Road')
+
+    def test_ndjson_batch_reports_errors_and_invalidates_once(self):
+        lines = [
+            {'asset': self.asset.pk, 'location': self.loc.pk, 'timestamp': '2025-01-01T10:00:00Z'},
+            {'asset': self.asset.pk, 'location': self.loc.pk},
+            {'asset': 999, 'location': self.loc.pk},
+            {'asset': 'x'},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines)
+        with mock.patch('assets.ingest.invalidate_dashboard') as invalidate:
+            resp = self.client.post(reverse('assetlocation_bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data['received'], data['accepted'], data['rejected']), (4, 2, 2))
+        self.assertEqual([e['index'] for e in data['errors']], [2, 3])
+        self.assertIn('rows_per_second', data)
+        invalidate.assert_called_once()
+        self.assertEqual(AssetLocation.objects.count(), 2)
+        self.assertEqual(CurrentLocation.objects.get(asset=self.asset).location_id, self.loc.pk)
+
+    def test_malformed_payload(self):
+        resp = self.client.post(reverse('assetlocation_bulk'), '{"movements": 1}', content_type='application/json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_malformed_ndjson_line_is_reported_not_fatal(self):
+        row = json.dumps({'asset': self.asset.pk, 'location': self.loc.pk})
+        body = '\n'.join([row, '{"asset": ', '[1, 2]', row])
+        resp = self.client.post(reverse('assetlocation_bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual((data['received'], data['accepted'], data['rejected']), (4, 2, 2))
+        self.assertEqual([e['index'] for e in data['errors']], [1, 2])
+        self.assertIn('Invalid JSON', data['errors'][0]['errors']['__all__'][0]['message'])
+        self.assertEqual(AssetLocation.objects.count(), 2)
+
+
+class BulkMovementAuthTest(TestCase):
+    """Gateways post without a session or CSRF token."""
+
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.gateway = User.objects.create_user(username='gateway')
+        Group.objects.get_or_create(name='manager')[0].user_set.add(self.gateway)
+        asset = Asset.objects.create(name='Tote', value=1.00)
+        loc = Location.objects.create(name='Dock', address='3 Road')
+        self.body = json.dumps([{'asset': asset.pk, 'location': loc.pk}])
+
+    def post(self, **headers):
+        return self.client.post(reverse('assetlocation_bulk'), self.body, content_type='application/json', headers=headers)
+
+    def test_token_authenticates_without_csrf(self):
+        out = io.StringIO()
+        call_command('create_api_token', 'gateway', name='dock-1', stdout=out)
+        resp = self.post(authorization=f'Bearer {out.getvalue().strip()}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['accepted'], 1)
+
+    def test_failures_are_json_not_redirects(self):
+        resp = self.post()
+        self.assertEqual((resp.status_code, resp['WWW-Authenticate']), (401, 'Bearer'))
+        self.assertEqual(self.post(authorization='Bearer wrong').status_code, 401)
+
+        viewer = User.objects.create_user(username='viewer')
+        _, key = ApiToken.objects.issue(viewer)
+        resp = self.post(authorization=f'Bearer {key}')
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(resp.json(), {'error': 'Permission denied.'})
+
+    def test_session_requests_still_need_csrf(self):
+        self.client.force_login(self.gateway)
+        resp = self.post()
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(resp.json(), {'error': 'CSRF verification failed.'})
+        self.assertEqual(AssetLocation.objects.count(), 0)
+
+
+class ImportMovementsCommandTest(TestCase):
+    CSV = (
+        'asset,location,timestamp\n'
+        'Tote,Dock,2025-01-01T10:00:00\n'
+        'Tote,Yard,2025-01-02T10:00:00\n'
+        'Missing,Dock,2025-01-02T10:00:00\n'
+        'Tote,Dock,2025-01-03T10:00:00\n'
+    )
+
+    def setUp(self):
+        self.asset = Asset.objects.create(name='Tote', value=1.00)
+        self.dock = Location.objects.create(name='Dock', address='3 Road')
+        self.yard = Location.objects.create(name='Yard', address='4 Road')
+        self.file = tempfile.NamedTemporaryFile(suffix='.csv')
+        self.file.write(self.CSV.encode())
+        self.file.flush()
+
+    def tearDown(self):
+        self.file.close()
+
+    def test_import_csv_in_chunks(self):
+        out = io.StringIO()
+        call_command('import_movements', self.file.name, chunk_size=2, stdout=out)
+        self.assertEqual(AssetLocation.objects.count(), 3)
+        self.assertEqual(CurrentLocation.objects.get(asset=self.asset).location_id, self.dock.pk)
+        self.assertIn('1 skipped', out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+
+    def test_resume_from_offset(self):
+        # Resume after the first two data rows were committed.
+        call_command('import_movements', self.file.name, offset=self.CSV.index('Missing'), stdout=io.StringIO())
+        self.assertEqual(
+            list(AssetLocation.objects.order_by('timestamp').values_list('location__name', flat=True)),
+            ['Dock'],
+        )
+
+    def test_bad_lines_are_reported_and_skipped(self):
+        lines = [
+            'asset,location,timestamp\n',
+            'Tote,Dock,2025-01-01T10:00:00\n',
+            'Tote,"Yard,2025-01-02T10:00:00\n',
+            'Tote,Yard,yesterday\n',
+            'Tote,Yard,2025-01-03T10:00:00\n',
+        ]
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(''.join(lines).encode())
+        self.file.flush()
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_movements', self.file.name, chunk_size=2, stdout=out, stderr=err)
+        self.assertEqual(CurrentLocation.objects.get(asset=self.asset).location_id, self.yard.pk)
+        self.assertEqual(AssetLocation.objects.count(), 2)
+        self.assertIn('0 skipped, 2 malformed', out.getvalue())
+        self.assertIn(f'byte {len("".join(lines[:2]))}', err.getvalue())
+        self.assertIn(f"byte {len(''.join(lines[:3]))}: invalid timestamp 'yesterday'", err.getvalue())
+
+    def test_ndjson_line_that_is_not_an_object(self):
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as fh:
+            fh.write(b'{"asset": "Tote", "location": "Dock"}\n[1, 2]\n{"asset": \n{"asset": "Tote", "location": "Yard"}\n')
+            fh.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_movements', fh.name, stdout=out, stderr=err)
+        self.assertEqual(AssetLocation.objects.count(), 2)
+        self.assertIn('byte 38: not a JSON object', err.getvalue())
+        self.assertIn('byte 45: invalid JSON', err.getvalue())
@@ -0,0 +1,50 @@
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import Asset, AssetLocation, Location
+
+
+@override_settings(LOCATION_RECENT_MOVEMENTS=3, LOCATION_LIST_RECENT_MOVEMENTS=2)
+class LocationHistoryTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        t0 = timezone.now() - timedelta(days=1)
+        self.dock = Location.objects.create(name='Dock', address='Road')
+        self.yard = Location.objects.create(name='Yard', address='Road')
+        self.assets = [Asset.objects.create(name=f'Crate {i}', value=1) for i in range(8)]
+        for i, asset in enumerate(self.assets):
+            AssetLocation.objects.create(asset=asset, location=self.dock, timestamp=t0 + timedelta(minutes=i))
+        AssetLocation.objects.create(asset=self.assets[0], location=self.yard, timestamp=t0 + timedelta(hours=1))
+
+    def names(self, html):
+        return re.findall(r'>(Crate \d)</a>', html)
+
+    def test_detail_shows_latest_movements_only(self):
+        response = self.client.get(reverse('location_detail', args=[self.dock.pk]))
+        self.assertEqual(self.names(response.content.decode()), ['Crate 7', 'Crate 6', 'Crate 5'])
+        self.assertEqual(response.context['location'].asset_count, 7)
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_history_fragment_pages_through_the_rest(self):
+        cursor = self.client.get(reverse('location_detail', args=[self.dock.pk])).context['next_cursor']
+        response = self.client.get(reverse('location_history', args=[self.dock.pk]), {'cursor': cursor})
+        self.assertEqual(self.names(response.content.decode()), ['Crate 4', 'Crate 3', 'Crate 2', 'Crate 1', 'Crate 0'])
+        self.assertNotContains(response, 'data-history-more')
+        self.assertEqual(self.client.get(reverse('location_history', args=[self.dock.pk]), {'cursor': 'x'}).status_code, 404)
+
+    def test_quiet_location_has_no_more_link(self):
+        response = self.client.get(reverse('location_detail', args=[self.yard.pk]))
+        self.assertEqual(self.names(response.content.decode()), ['Crate 0'])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_list_prefetches_a_bounded_window(self):
+        with self.assertNumQueries(5):  # session, user, page count, locations, one windowed prefetch
+            response = self.client.get(reverse('location_list'))
+        dock, yard = response.context['locations']
+        self.assertEqual([m.asset.name for m in dock.recent_movements], ['Crate 7', 'Crate 6'])
+        self.assertEqual([m.asset.name for m in yard.recent_movements], ['Crate 0'])
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .forms import AssetLocationForm
+from .models import Asset, AssetLocation, Location
+
+
+class LazyLookupTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='m', password='p')
+        Group.objects.create(name='manager').user_set.add(user)
+        self.client.login(username='m', password='p')
+        self.assets = [Asset.objects.create(name=f'Crate {i:02d}', value=1) for i in range(25)]
+        self.dock = Location.objects.create(name='Dock', address='Road')
+        self.yard = Location.objects.create(name='Yard', address='Road')
+
+    def test_form_renders_only_selected_options(self):
+        response = self.client.get(reverse('assetlocation_create'))
+        self.assertContains(response, 'data-lookup-url="%s"' % reverse('asset_lookup'))
+        self.assertNotContains(response, 'Crate 00')
+        movement = AssetLocation.objects.create(asset=self.assets[3], location=self.yard, timestamp=timezone.now() - timedelta(hours=1))
+        response = self.client.get(reverse('assetlocation_update', args=[movement.pk]))
+        self.assertContains(response, f'<option value="{self.assets[3].pk}" selected>Crate 03</option>', html=True)
+        self.assertNotContains(response, 'Crate 04')
+        self.assertNotContains(response, '>Dock<')
+
+    def test_lookup_pages_by_name(self):
+        page = self.client.get(reverse('asset_lookup')).json()
+        self.assertEqual(len(page['results']), 20)
+        self.assertEqual(page['results'][0], {'id': self.assets[0].pk, 'text': 'Crate 00'})
+        rest = self.client.get(reverse('asset_lookup'), {'cursor': page['next_cursor']}).json()
+        self.assertEqual([r['text'] for r in rest['results']], [f'Crate {i}' for i in range(20, 25)])
+        self.assertIsNone(rest['next_cursor'])
+        self.assertEqual(self.client.get(reverse('asset_lookup'), {'cursor': 'garbage'}).status_code, 404)
+
+    def test_lookup_filters(self):
+        assets = self.client.get(reverse('asset_lookup'), {'q': 'ate 1'}).json()['results']
+        self.assertEqual(len(assets), 10)
+        locations = self.client.get(reverse('location_lookup'), {'q': 'ar'}).json()['results']
+        self.assertEqual(locations, [{'id': self.yard.pk, 'text': 'Yard'}])
+
+    def test_validation_looks_up_one_pk(self):
+        form = AssetLocationForm(data={'asset': self.assets[5].pk, 'location': self.dock.pk})
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid())
+        form = AssetLocationForm(data={'asset': 999999, 'location': self.dock.pk})
+        self.assertFalse(form.is_valid())
+        self.assertIn('asset', form.errors)
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, Client
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from .metrics import GAUGES, LATENCY_BUCKETS, TopQueries, _drop_stale_rate_slots, _quantile, fingerprint
+from .metrics_mmap import MmapedDict, MultiProcessMetricsStore
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+
+    def test_per_route_stats_and_status_codes(self):
+        self.client.get(reverse('asset_list'))
+        self.client.get('/no-such-page/')
+        data = self.client.get(reverse('metrics')).json()
+        self.assertGreaterEqual(data['routes']['asset_list']['count'], 1)
+        self.assertIn('<unmatched>', data['routes'])
+        self.assertGreaterEqual(data['status_codes']['404'], 1)
+        self.assertGreater(data['process_memory_bytes'], 0)
+
+    def test_prometheus_exposition(self):
+        self.client.get(reverse('asset_list'))
+        resp = self.client.get(reverse('metrics'), HTTP_ACCEPT='text/plain;version=0.0.4')
+        self.assertTrue(resp['Content-Type'].startswith('text/plain'))
+        body = resp.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="asset_list",le="+Inf"}', body)
+        self.assertIn('http_requests_total{route="asset_list",status="200"}', body)
+
+    def test_sql_time_per_route_and_server_timing(self):
+        resp = self.client.get(reverse('asset_list'))
+        self.assertRegex(resp['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, total;dur=[\d.]+$')
+        data = self.client.get(reverse('metrics')).json()
+        route = data['db']['asset_list']
+        self.assertGreater(route['queries_total'], 0)
+        self.assertGreater(route['queries_per_request'], 0)
+        fingerprints = [q['fingerprint'] for q in route['top_queries']]
+        self.assertTrue(any('FROM "assets_asset"' in sql for sql in fingerprints))
+        body = self.client.get(reverse('metrics'), {'format': 'prometheus'}).content.decode()
+        self.assertIn('db_queries_total{route="asset_list"}', body)
+
+    def test_fingerprints_and_bounded_top_queries(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'a''b'\n LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+        top = TopQueries(k=2)
+        for i in range(10):
+            top.add('r', {f'SELECT {i} FROM t{i}': [1, i / 1000, i / 1000]})
+        rows = top.top('r')
+        self.assertEqual([row['fingerprint'] for row in rows], ['SELECT ? FROM t9', 'SELECT ? FROM t8'])
+        self.assertLessEqual(len(top._routes['r']), 4)
+
+    def test_quantile_interpolates_within_bucket(self):
+        counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        counts[1] = 10  # all samples in (0.0005, 0.001]
+        self.assertAlmostEqual(_quantile(counts, 0.5), 0.00075)
+        self.assertEqual(_quantile([0] * len(counts), 0.5), 0)
+
+
+class MultiProcessMetricsTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def store(self):
+        return MultiProcessMetricsStore(
+            self.tmp.name, gauges=GAUGES, max_merge=('rate_slot_second',), normalize=_drop_stale_rate_slots
+        )
+
+    def test_workers_merge_and_dead_workers_are_archived(self):
+        now = int(time.time())
+        for _ in range(2):
+            pid = os.fork()
+            if pid == 0:  # worker: record, then exit without cleanup
+                worker = self.store()
+                for _ in range(1000):
+                    worker.inc(('http_requests_total', 'dashboard', '200'))
+                worker.set(('rate_slot_second', now % 60), now)
+                worker.inc(('rate_slot_count', now % 60), 3)
+                worker.set(('process_memory_bytes',), 100)
+                os._exit(0)
+            os.waitpid(pid, 0)
+
+        reader = self.store()
+        reader.inc(('http_requests_total', 'dashboard', '200'))
+        merged = reader.snapshot()
+        self.assertEqual(merged[('http_requests_total', 'dashboard', '200')], 2001)
+        # Both workers have exited: their counters live on in the archive,
+        # their gauges are gone.
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            ['metrics_%d.db' % os.getpid(), 'metrics_archive.db', 'metrics_archive.lock'],
+        )
+        self.assertNotIn(('process_memory_bytes',), merged)
+
+    def test_archiving_waits_for_readers(self):
+        pid = os.fork()
+        if pid == 0:
+            self.store().inc(('http_requests_total', 'dashboard', '200'), 1000)
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        reader, archiver = self.store(), self.store()
+        reader.inc(('http_requests_total', 'dashboard', '200'))
+        read_file = MultiProcessMetricsStore._read_file
+        folding = []
+
+        def read_while_archiving(path):
+            if not folding:
+                # Another reader folds the dead worker's file in the middle of this read.
+                folding.append(threading.Thread(target=archiver.cleanup))
+                folding[0].start()
+                folding[0].join(0.5)
+            return read_file(path)
+
+        with mock.patch.object(reader, 'cleanup'), mock.patch.object(reader, '_read_file', read_while_archiving):
+            merged = reader.snapshot()
+        folding[0].join()
+        self.assertEqual(merged[('http_requests_total', 'dashboard', '200')], 1001)
+        self.assertEqual(reader.snapshot()[('http_requests_total', 'dashboard', '200')], 1001)
+
+    def test_rate_slots_merge_by_max_stamp_and_sum_counts(self):
+        store = self.store()
+        now = int(time.time())
+        store.set(('rate_slot_second', 1), now)
+        store.inc(('rate_slot_count', 1), 2)
+        store.set(('rate_slot_second', 2), now - 600)
+        store.inc(('rate_slot_count', 2), 5)
+        merged = store.snapshot()
+        self.assertEqual(merged[('rate_slot_second', 1)], now)
+        self.assertNotIn(('rate_slot_count', 2), merged)
+
+    def test_file_grows_past_initial_size(self):
+        path = os.path.join(self.tmp.name, 'metrics_1.db')
+        with mock.patch('assets.metrics_mmap.INITIAL_SIZE', 64):
+            d = MmapedDict(path)
+            for i in range(50):
+                d.write(str(i).encode(), i)
+            d.close()
+        d = MmapedDict(path, read_only=True)
+        self.assertEqual(dict(d.items())[b'49'], 49.0)
+        d.close()
+
+    def test_metrics_view_reads_merged_store(self):
+        with mock.patch('assets.metrics.REGISTRY', self.store()):
+            self.client.get(reverse('metrics'))
+            data = self.client.get(reverse('metrics')).json()
+        self.assertEqual(data['routes']['metrics']['count'], 1)
+        self.assertEqual(data['requests_per_minute'], 1)
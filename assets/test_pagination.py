@@ -0,0 +1,55 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from .models import Asset, Location, AssetLocation
+from .pagination import KeysetPaginator
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        asset = Asset.objects.create(name='Bin', value=1.00)
+        loc = Location.objects.create(name='Bay', address='5 Road')
+        # Identical timestamps force the id tie-breaker to keep pages disjoint.
+        now = timezone.now()
+        self.movements = AssetLocation.objects.bulk_create(
+            [AssetLocation(asset=asset, location=loc, timestamp=now) for _ in range(25)]
+        )
+
+    def test_walk_forward_and_back(self):
+        url = reverse('assetlocation_list')
+        seen = []
+        pages = []
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'format': 'json', 'cursor': cursor}).json()
+            pages.append(data)
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            cursor = data['next']
+        self.assertEqual(seen, sorted((m.pk for m in self.movements), reverse=True))
+        self.assertEqual([len(p['results']) for p in pages], [10, 10, 5])
+
+        back = self.client.get(url, {'format': 'json', 'cursor': pages[2]['previous']}).json()
+        self.assertEqual(back['results'], pages[1]['results'])
+
+    def test_html_page_links_and_bad_cursor(self):
+        resp = self.client.get(reverse('asset_list'))
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.get(reverse('assetlocation_list'))
+        self.assertContains(resp, '?cursor=')
+        resp = self.client.get(reverse('assetlocation_list'), {'cursor': 'garbage'})
+        self.assertEqual(resp.status_code, 404)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific')
+    def test_seek_is_an_index_range(self):
+        paginator = KeysetPaginator(AssetLocation.objects.all(), ('-timestamp', '-id'), 10)
+        cursor = paginator.page().next_cursor
+        _, _, qs = paginator._page_query(cursor)
+        self.assertIn('(timestamp<?)', qs.explain())
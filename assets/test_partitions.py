@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .export import export_movements
+from .models import Asset, AssetLocation, CurrentLocation, DashboardRollup, Location, LocationRollup, MovementArchive
+from .partitions import add_months, archive_month, convert_to_partitioned, existing_partitions, is_partitioned, month_start, partition_name
+
+
+class MovementArchiveTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MOVEMENT_ARCHIVE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.this_month = month_start(timezone.now())
+        self.asset = Asset.objects.create(name='Pallet', value=5)
+        self.dock = Location.objects.create(name='Dock', address='1 Road')
+        self.yard = Location.objects.create(name='Yard', address='2 Road')
+        self.old = [
+            AssetLocation.objects.create(asset=self.asset, location=self.dock, timestamp=add_months(self.this_month, -30)),
+            AssetLocation.objects.create(asset=self.asset, location=self.yard, timestamp=add_months(self.this_month, -26)),
+        ]
+        self.recent = AssetLocation.objects.create(asset=self.asset, location=self.dock, timestamp=add_months(self.this_month, -1))
+
+    def test_command_archives_months_past_retention(self):
+        call_command('archive_movements', retention_months=24, stdout=open('/dev/null', 'w'))
+        self.assertEqual(list(AssetLocation.objects.values_list('pk', flat=True)), [self.recent.pk])
+        self.assertEqual(MovementArchive.objects.count(), 2)
+        self.assertEqual(DashboardRollup.objects.totals().total_movements, 1)
+        archive = MovementArchive.objects.first()
+        with gzip.open(archive.path, 'rt') as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual([(r['id'], r['location']) for r in rows], [(self.old[0].pk, 'Dock')])
+        self.assertEqual(CurrentLocation.objects.get(asset=self.asset).movement_id, self.recent.pk)
+
+    def test_export_includes_archived_rows(self):
+        archive_month(self.old[0].timestamp)
+        body = b''.join(export_movements(include_archived=True, locations=[self.yard.pk, self.dock.pk]))
+        ids = [json.loads(line)['id'] for line in body.decode().splitlines()]
+        self.assertEqual(ids, [self.old[0].pk, self.old[1].pk, self.recent.pk])
+        body = b''.join(export_movements(include_archived=True, locations=[self.dock.pk]))
+        self.assertEqual([json.loads(line)['id'] for line in body.decode().splitlines()], [self.old[0].pk, self.recent.pk])
+
+    def test_archived_position_survives_later_changes(self):
+        crate = Asset.objects.create(name='Crate', value=7)
+        only = AssetLocation.objects.create(asset=crate, location=self.yard, timestamp=self.old[0].timestamp)
+        archive_month(only.timestamp)
+        self.assertFalse(AssetLocation.objects.filter(pk=only.pk).exists())
+        AssetLocation.objects.create(asset=crate, location=self.dock).delete()
+        current = CurrentLocation.objects.get(asset=crate)
+        self.assertEqual((current.location_id, current.movement_id), (self.yard.pk, only.pk))
+        rollup = LocationRollup.objects.get(location=self.yard)
+        self.assertEqual((rollup.asset_count, rollup.inventory_value), (1, 7))
+        CurrentLocation.objects.all().delete()
+        call_command('rebuild_current_locations', stdout=open(os.devnull, 'w'))
+        self.assertEqual(CurrentLocation.objects.get(asset=crate).location_id, self.yard.pk)
+
+    def test_failed_rename_keeps_the_rows(self):
+        with mock.patch('assets.partitions.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                archive_month(self.old[0].timestamp)
+        self.assertTrue(AssetLocation.objects.filter(pk=self.old[0].pk).exists())
+        self.assertFalse(MovementArchive.objects.exists())
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_failed_delete_removes_the_file(self):
+        with mock.patch.object(MovementArchive.objects, 'create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                archive_month(self.old[0].timestamp)
+        self.assertTrue(AssetLocation.objects.filter(pk=self.old[0].pk).exists())
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_empty_month_is_skipped(self):
+        self.assertIsNone(archive_month(add_months(self.this_month, -12)))
+        self.assertFalse(MovementArchive.objects.exists())
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'partitioning needs PostgreSQL')
+    def test_partitioned_table_drops_archived_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        convert_to_partitioned(months_ahead=2)
+        self.assertTrue(is_partitioned())
+        self.assertIn(partition_name(add_months(self.this_month, 2)), existing_partitions())
+        moved = AssetLocation.objects.create(asset=self.asset, location=self.yard, timestamp=timezone.now())
+        self.assertGreater(moved.pk, self.recent.pk)
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        archive_month(self.old[0].timestamp)
+        self.assertNotIn(partition_name(self.old[0].timestamp), existing_partitions())
+        self.assertEqual(AssetLocation.objects.count(), 3)
@@ -1,7 +1,10 @@
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
+from .permissions import get_roles, invalidate_roles
 
 User = get_user_model()
 
@@ -41,3 +44,42 @@ class PermissionTest(TestCase):
         self.client.login(username='a', password='a')
         resp = self.client.get(reverse('asset_delete', args=[asset.pk]))
         self.assertEqual(resp.status_code, 200)
+
+
+class RoleCacheTest(TestCase):
+    def setUp(self):
+        invalidate_roles()
+        self.manager = Group.objects.create(name='manager')
+        self.user = User.objects.create_user(username='m', password='m')
+        self.manager.user_set.add(self.user)
+
+    def test_roles_cached_after_first_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_roles(self.user), {'manager'})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_roles(self.user), {'manager'})
+        invalidate_roles([self.user.pk])
+        # Shared cache emptied too: the next lookup reads the database again.
+        with self.assertNumQueries(1):
+            get_roles(self.user)
+
+    def test_membership_and_group_changes_invalidate(self):
+        get_roles(self.user)
+        admin = Group.objects.create(name='admin')
+        self.user.groups.add(admin)
+        self.assertEqual(get_roles(self.user), {'manager', 'admin'})
+        admin.user_set.remove(self.user)
+        self.assertEqual(get_roles(self.user), {'manager'})
+        self.manager.name = 'supervisor'
+        self.manager.save()
+        self.assertEqual(get_roles(self.user), {'supervisor'})
+        self.manager.delete()
+        self.assertEqual(get_roles(self.user), frozenset())
+
+    def test_permission_check_needs_no_group_query(self):
+        self.client.login(username='m', password='m')
+        self.client.get(reverse('asset_create'))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('asset_create'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q for q in queries if 'auth_group' in q['sql']])
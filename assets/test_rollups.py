@@ -0,0 +1,84 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .ingest import write_movements
+from .models import Asset, Location, AssetLocation, CurrentLocation, DashboardRollup, LocationRollup
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.depot = Location.objects.create(name='Depot', address='1 Road')
+        self.hub = Location.objects.create(name='Hub', address='2 Road')
+        self.crate = Asset.objects.create(name='Crate', value=Decimal('10.00'))
+        self.truck = Asset.objects.create(name='Truck', value=Decimal('500.00'))
+
+    def assertNoDrift(self):
+        totals = DashboardRollup.objects.totals()
+        rollups = {r.location_id: (r.asset_count, r.inventory_value) for r in LocationRollup.objects.all()}
+        self.assertEqual(DashboardRollup.objects.reconcile(), {})
+        self.assertEqual(LocationRollup.objects.reconcile(), 0)
+        return totals, rollups
+
+    def test_incremental_updates_match_reconcile(self):
+        AssetLocation.objects.create(asset=self.crate, location=self.depot, timestamp=self.now - timedelta(hours=1))
+        AssetLocation.objects.create(asset=self.crate, location=self.hub, timestamp=self.now)
+        write_movements([AssetLocation(asset=self.truck, location=self.depot, timestamp=self.now)])
+        self.truck.value = Decimal('450.00')
+        self.truck.save()
+
+        totals, rollups = self.assertNoDrift()
+        self.assertEqual((totals.total_assets, totals.total_movements, totals.total_value), (2, 3, Decimal('460.00')))
+        self.assertEqual(rollups[self.depot.pk], (1, Decimal('450.00')))
+        self.assertEqual(rollups[self.hub.pk], (1, Decimal('10.00')))
+
+        self.hub.delete()
+        self.truck.delete()
+        totals, rollups = self.assertNoDrift()
+        self.assertEqual((totals.total_assets, totals.total_locations, totals.total_movements), (1, 1, 1))
+        self.assertEqual(rollups[self.depot.pk], (1, Decimal('10.00')))
+
+    def scan(self, asset, scans):
+        write_movements([
+            AssetLocation(asset=asset, location=(self.depot, self.hub)[i % 2], timestamp=self.now - timedelta(hours=scans - i))
+            for i in range(scans)
+        ])
+
+    def test_delete_cost_does_not_grow_with_history(self):
+        self.scan(self.crate, 2)
+        self.scan(self.truck, 30)
+        with CaptureQueriesContext(connection) as short:
+            self.crate.delete()
+        with CaptureQueriesContext(connection) as long:
+            self.truck.delete()
+        self.assertEqual(len(long), len(short))
+        totals, rollups = self.assertNoDrift()
+        self.assertEqual((totals.total_assets, totals.total_movements, totals.total_value), (0, 0, 0))
+
+    def test_location_delete_moves_assets_back_in_one_batch(self):
+        self.scan(self.crate, 3)
+        self.scan(self.truck, 101)
+        with CaptureQueriesContext(connection) as queries:
+            self.depot.delete()
+        # 53 movements went with the depot; the per-movement handler would
+        # have run about ten queries for each.
+        self.assertLess(len(queries), 53)
+        self.assertEqual(
+            dict(CurrentLocation.objects.values_list('asset_id', 'location_id')),
+            {self.crate.pk: self.hub.pk, self.truck.pk: self.hub.pk},
+        )
+        totals, rollups = self.assertNoDrift()
+        self.assertEqual((totals.total_locations, totals.total_movements), (1, 51))
+        self.assertEqual(rollups[self.hub.pk], (2, Decimal('510.00')))
+
+    def test_reconcile_command_repairs_drift(self):
+        DashboardRollup.objects.filter(pk=1).update(total_assets=99)
+        LocationRollup.objects.filter(location=self.depot).update(asset_count=7)
+        call_command('reconcile_rollups', stdout=open('/dev/null', 'w'))
+        self.assertEqual(DashboardRollup.objects.totals().total_assets, 2)
+        self.assertEqual(LocationRollup.objects.get(location=self.depot).asset_count, 0)
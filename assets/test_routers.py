@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from .models import Asset, AssetLocation, Location
+from .routers import PIN_COOKIE, PrimaryReplicaRouter, RequestRouting, _routing, primary
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class ReplicaRoutingTest(TestCase):
+    """``replica`` is a separate SQLite database that never receives the
+    primary's writes, i.e. a replica with unbounded lag."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='m', password='p')
+        user.save(using='replica')
+        self.client.force_login(user)
+        self.client.cookies.pop(PIN_COOKIE, None)
+
+    def test_request_reads_go_to_the_replica(self):
+        on_replica = Asset(pk=1000, name='Replicated', value=1)
+        on_replica.save(using='replica')
+        self.assertEqual(self.client.get(reverse('asset_detail', args=[on_replica.pk])).status_code, 200)
+        only_primary = Asset.objects.create(name='Not yet replicated', value=1)
+        self.assertEqual(self.client.get(reverse('asset_detail', args=[only_primary.pk])).status_code, 404)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        from django.contrib.auth.models import Group
+        Group.objects.create(name='manager').user_set.add(get_user_model().objects.get(username='m'))
+        response = self.client.post(reverse('asset_create'), {'name': 'Fresh', 'description': '', 'value': '2.00'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        asset = Asset.objects.get(name='Fresh')
+        self.assertEqual(self.client.get(reverse('asset_detail', args=[asset.pk])).status_code, 200)
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.client.get(reverse('asset_detail', args=[asset.pk])).status_code, 404)
+
+    def test_export_streams_from_the_replica(self):
+        # bulk_create: no signal handlers writing rollups to the primary.
+        asset = Asset.objects.using('replica').bulk_create([Asset(pk=1000, name='Replicated', value=1)])[0]
+        dock = Location.objects.using('replica').bulk_create([Location(pk=1000, name='Dock', address='Road')])[0]
+        AssetLocation.objects.using('replica').bulk_create([AssetLocation(pk=1000, asset=asset, location=dock)])
+        yard = Location.objects.create(name='Yard', address='Road')
+        AssetLocation.objects.create(asset=Asset.objects.create(name='Primary only', value=1), location=yard)
+        response = self.client.get(reverse('assetlocation_export'), {'archived': '1'})
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Replicated', body)
+        self.assertNotIn('Primary only', body)
+
+    def test_router_uses_primary_outside_requests_and_in_transactions(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Asset), 'default')
+        token = _routing.set(RequestRouting('replica', pinned=False))
+        try:
+            self.assertEqual(router.db_for_read(Asset), 'replica')
+            with primary():
+                self.assertEqual(router.db_for_read(Asset), 'default')
+            self.assertEqual(router.db_for_read(Asset), 'replica')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Asset), 'default')
+            self.assertEqual(router.db_for_write(Asset), 'default')
+            self.assertEqual(router.db_for_read(Asset), 'default')
+        finally:
+            _routing.reset(token)
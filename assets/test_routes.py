@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from .analytics import process_new_movements
+from .models import Asset, AssetLocation, Location
+
+
+class RouteGraphTest(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.t0 = timezone.now() - timedelta(days=10)
+        self.dock, self.yard, self.shop = (
+            Location.objects.create(name=name, address='Road') for name in ('Dock', 'Yard', 'Shop')
+        )
+        # Two crates go dock -> yard (1h), one goes dock -> shop (3h); both yard stays last 10h.
+        for i, (via, hours) in enumerate([(self.yard, 1), (self.yard, 1), (self.shop, 3)]):
+            asset = Asset.objects.create(name=f'Crate {i}', value=1)
+            self.move(asset, self.dock, 0)
+            self.move(asset, via, hours)
+            if via == self.yard:
+                self.move(asset, self.shop, hours + 10)
+        process_new_movements()
+
+    def move(self, asset, location, hours):
+        AssetLocation.objects.create(asset=asset, location=location, timestamp=self.t0 + timedelta(hours=hours))
+
+    def test_next_destinations(self):
+        results = self.client.get(reverse('route_next', args=[self.dock.pk])).json()['results']
+        self.assertEqual([(r['location'], r['trips']) for r in results], [('Yard', 2), ('Shop', 1)])
+        self.assertAlmostEqual(results[0]['share'], 2 / 3)
+        self.assertEqual(results[1]['average_seconds'], 3 * 3600)
+
+    def test_common_routes_and_bottlenecks(self):
+        routes = self.client.get(reverse('route_common'), {'limit': 1}).json()['results']
+        self.assertEqual([(r['from_location'], r['to_location'], r['trips']) for r in routes], [('Dock', 'Yard', 2)])
+        bottlenecks = self.client.get(reverse('route_bottlenecks')).json()['results']
+        self.assertEqual(bottlenecks[0]['location'], 'Yard')
+        self.assertEqual(bottlenecks[0]['average_dwell_seconds'], 10 * 3600)
+        self.assertEqual(bottlenecks[1]['backlog'], -3)
+
+    def test_graph_follows_analytics_updates(self):
+        self.client.get(reverse('route_common'))
+        asset = Asset.objects.get(name='Crate 2')
+        self.move(asset, self.yard, 5)
+        process_new_movements()
+        routes = self.client.get(reverse('route_common')).json()['results']
+        self.assertIn(('Shop', 'Yard', 1), [(r['from_location'], r['to_location'], r['trips']) for r in routes])
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from .models import Asset
+from .search import autocomplete, clear_autocomplete_cache, search_assets
+
+
+class AssetSearchTest(TestCase):
+    def setUp(self):
+        clear_autocomplete_cache()
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        self.pallet = Asset.objects.create(name='Pallet Jack', description='Hydraulic lifter', value=1)
+        self.palette = Asset.objects.create(name='Paint palette', description='Workshop', value=1)
+        self.drill = Asset.objects.create(name='Drill', description='Cordless, pallet repairs', value=1)
+
+    def names(self, queryset):
+        return sorted(queryset.values_list('name', flat=True))
+
+    def test_substring_matches_name_and_description(self):
+        self.assertEqual(self.names(search_assets('pallet')), ['Drill', 'Pallet Jack'])
+        self.assertEqual(self.names(search_assets('DRAULIC')), ['Pallet Jack'])
+        self.assertEqual(self.names(search_assets('')), ['Drill', 'Paint palette', 'Pallet Jack'])
+
+    def test_short_term_is_a_name_prefix(self):
+        self.assertEqual(self.names(search_assets('pa')), ['Paint palette', 'Pallet Jack'])
+        self.assertEqual(self.names(search_assets('ll')), [])
+
+    def test_autocomplete_is_cached_until_an_asset_changes(self):
+        self.assertEqual([r['name'] for r in autocomplete('Pal')], ['Pallet Jack'])
+        with self.assertNumQueries(0):
+            autocomplete('pal')
+        Asset.objects.create(name='Pallet wrap', value=1)
+        self.assertEqual([r['name'] for r in autocomplete('pal')], ['Pallet Jack', 'Pallet wrap'])
+
+    def test_list_filter_and_autocomplete_endpoint(self):
+        response = self.client.get(reverse('asset_list'), {'q': 'palette'})
+        self.assertEqual([a.name for a in response.context['assets']], ['Paint palette'])
+        self.assertContains(response, 'value="palette"')
+        results = self.client.get(reverse('asset_autocomplete'), {'q': 'p'}).json()['results']
+        self.assertEqual(results, [{'id': self.palette.pk, 'name': 'Paint palette'}, {'id': self.pallet.pk, 'name': 'Pallet Jack'}])
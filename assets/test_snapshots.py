@@ -0,0 +1,97 @@
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from .models import Asset, AssetLocation, InventoryCheckpoint, Location
+from .partitions import archive_month
+from .snapshots import create_checkpoint, snapshot_at
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        self.t0 = timezone.now() - timedelta(days=10)
+        self.dock = Location.objects.create(name='Dock', address='1 Road')
+        self.yard = Location.objects.create(name='Yard', address='2 Road')
+        self.crate = Asset.objects.create(name='Crate', value=1)
+        self.van = Asset.objects.create(name='Van', value=2)
+        self.move(self.crate, self.dock, 0)
+        self.move(self.van, self.dock, 1)
+        self.move(self.crate, self.yard, 3)
+
+    def move(self, asset, location, days):
+        return AssetLocation.objects.create(asset=asset, location=location, timestamp=self.t0 + timedelta(days=days))
+
+    def positions(self, snapshot):
+        return {asset_id: location_id for asset_id, (location_id, _) in snapshot.positions.items()}
+
+    def test_replays_only_movements_since_checkpoint(self):
+        create_checkpoint(self.t0 + timedelta(days=2))
+        self.move(self.van, self.yard, 4)
+        snapshot = snapshot_at(self.t0 + timedelta(days=5))
+        self.assertEqual(snapshot.replayed, 2)
+        self.assertEqual(self.positions(snapshot), {self.crate.pk: self.yard.pk, self.van.pk: self.yard.pk})
+        earlier = snapshot_at(self.t0 + timedelta(days=2, hours=1))
+        self.assertEqual(self.positions(earlier), {self.crate.pk: self.dock.pk, self.van.pk: self.dock.pk})
+        self.assertEqual(earlier.replayed, 0)
+
+    def test_location_snapshot_drops_assets_that_left(self):
+        create_checkpoint(self.t0 + timedelta(days=2))
+        snapshot = snapshot_at(self.t0 + timedelta(days=5), location=self.dock.pk)
+        self.assertEqual(self.positions(snapshot), {self.van.pk: self.dock.pk})
+
+    def test_backdated_movement_invalidates_later_checkpoints(self):
+        before = create_checkpoint(self.t0 + timedelta(days=1, hours=12))
+        after = create_checkpoint(self.t0 + timedelta(days=3, hours=12))
+        movement = self.move(self.van, self.yard, 5)
+        self.assertEqual(InventoryCheckpoint.objects.valid().count(), 2)
+        movement.timestamp = self.t0 + timedelta(days=2)
+        movement.save()
+        self.assertEqual(list(InventoryCheckpoint.objects.valid()), [before])
+        self.assertEqual(self.positions(snapshot_at(after.taken_at))[self.van.pk], self.yard.pk)
+        call_command('create_checkpoint', stdout=open('/dev/null', 'w'))
+        rebuilt = InventoryCheckpoint.objects.get(taken_at=after.taken_at)
+        self.assertIsNone(rebuilt.invalidated_at)
+        self.assertEqual(rebuilt.entries.get(asset=self.van).location, self.yard)
+
+    def test_replays_archived_months(self):
+        truck = Asset.objects.create(name='Truck', value=3)
+        old = self.move(truck, self.yard, -90)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with override_settings(MOVEMENT_ARCHIVE_DIR=tmp.name):
+            archive_month(old.timestamp)
+        self.assertFalse(AssetLocation.objects.filter(asset=truck).exists())
+
+        before = snapshot_at(self.t0 - timedelta(days=30))
+        self.assertEqual((self.positions(before), before.replayed), ({truck.pk: self.yard.pk}, 1))
+        after = snapshot_at(self.t0 + timedelta(days=5), assets=[truck.pk, self.van.pk])
+        self.assertEqual(self.positions(after), {truck.pk: self.yard.pk, self.van.pk: self.dock.pk})
+
+    @override_settings(SNAPSHOT_PAGE_SIZE=1)
+    def test_json_pages_through_assets(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        seen, cursor = [], None
+        while True:
+            params = {'at': (self.t0 + timedelta(days=5)).isoformat(), **({'cursor': cursor} if cursor else {})}
+            data = self.client.get(reverse('inventory_snapshot'), params).json()
+            seen.append([(a['asset_id'], a['location_id']) for a in data['assets']])
+            cursor = data['next']
+            if not cursor:
+                break
+        self.assertEqual(seen, [[(self.crate.pk, self.yard.pk)], [(self.van.pk, self.dock.pk)]])
+        self.assertEqual(self.client.get(reverse('inventory_snapshot'), {'cursor': 'garbage'}).status_code, 404)
+
+    def test_json_and_location_views(self):
+        get_user_model().objects.create_user(username='u', password='p')
+        self.client.login(username='u', password='p')
+        at = (self.t0 + timedelta(days=2)).isoformat()
+        data = self.client.get(reverse('inventory_snapshot'), {'at': at}).json()
+        self.assertEqual([(a['asset_id'], a['location_id']) for a in data['assets']], [(self.crate.pk, self.dock.pk), (self.van.pk, self.dock.pk)])
+        resp = self.client.get(reverse('location_snapshot', args=[self.yard.pk]))
+        self.assertContains(resp, 'Crate')
+        self.assertNotContains(resp, 'Van')
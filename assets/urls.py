@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from .metrics import metrics_view
 
+# Under ASGI, ASYNC_VIEWS serves the read-only pages with async views.
+if getattr(settings, 'ASYNC_VIEWS', False):
+    dashboard_view = views.dashboard_async
+    asset_list_view = views.asset_list_async
+    asset_detail_view = views.asset_detail_async
+    assetlocation_list_view = views.assetlocation_list_async
+else:
+    dashboard_view = views.dashboard
+    asset_list_view = views.AssetListView.as_view()
+    asset_detail_view = views.AssetDetailView.as_view()
+    assetlocation_list_view = views.AssetLocationListView.as_view()
+
 urlpatterns = [
     # Monitoring
     path('metrics/', metrics_view, name='metrics'),
     # Dashboard
-    path('', views.dashboard, name='dashboard'),
+    path('', dashboard_view, name='dashboard'),
 
     # Asset URLs
-    path('assets/', views.AssetListView.as_view(), name='asset_list'),
-    path('assets/<int:pk>/', views.AssetDetailView.as_view(), name='asset_detail'),
+    path('assets/', asset_list_view, name='asset_list'),
+    path('assets/<int:pk>/', asset_detail_view, name='asset_detail'),
+    path('assets/<int:pk>/history/', views.asset_history, name='asset_history'),
+    path('assets/autocomplete/', views.asset_autocomplete, name='asset_autocomplete'),
+    path('assets/lookup/', views.AssetLookupView.as_view(), name='asset_lookup'),
     path('assets/create/', views.AssetCreateView.as_view(), name='asset_create'),
     path('assets/<int:pk>/update/', views.AssetUpdateView.as_view(), name='asset_update'),
     path('assets/<int:pk>/delete/', views.AssetDeleteView.as_view(), name='asset_delete'),
@@ -19,12 +35,26 @@ urlpatterns = [
     path('locations/', views.LocationListView.as_view(), name='location_list'),
     path('locations/<int:pk>/', views.LocationDetailView.as_view(), name='location_detail'),
     path('locations/create/', views.LocationCreateView.as_view(), name='location_create'),
+    path('locations/lookup/', views.LocationLookupView.as_view(), name='location_lookup'),
     path('locations/<int:pk>/update/', views.LocationUpdateView.as_view(), name='location_update'),
     path('locations/<int:pk>/delete/', views.LocationDeleteView.as_view(), name='location_delete'),
+    path('locations/<int:pk>/history/', views.LocationHistoryView.as_view(), name='location_history'),
+    path('locations/<int:pk>/snapshot/', views.LocationSnapshotView.as_view(), name='location_snapshot'),
+
+    # Analytics
+    path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('routes/next/<int:pk>/', views.route_next_destinations, name='route_next'),
+    path('routes/common/', views.route_common, name='route_common'),
+    path('routes/bottlenecks/', views.route_bottlenecks, name='route_bottlenecks'),
+
+    # Point-in-time inventory
+    path('snapshot/', views.InventorySnapshotView.as_view(), name='inventory_snapshot'),
 
     # AssetLocation URLs
-    path('movements/', views.AssetLocationListView.as_view(), name='assetlocation_list'),
+    path('movements/', assetlocation_list_view, name='assetlocation_list'),
     path('movements/create/', views.AssetLocationCreateView.as_view(), name='assetlocation_create'),
+    path('movements/export/', views.AssetLocationExportView.as_view(), name='assetlocation_export'),
+    path('movements/bulk/', views.AssetLocationBulkCreateView.as_view(), name='assetlocation_bulk'),
     path('movements/<int:pk>/update/', views.AssetLocationUpdateView.as_view(), name='assetlocation_update'),
     path('movements/<int:pk>/delete/', views.AssetLocationDeleteView.as_view(), name='assetlocation_delete'),
 ]
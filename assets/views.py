@@ -1,35 +1,162 @@
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.db.models import Count, Sum, Prefetch
-from django.views.decorators.cache import cache_page
-from .models import Asset, Location, AssetLocation
-from .forms import AssetForm, LocationForm, AssetLocationForm
+from django.utils import timezone
+from django.views import View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from django.db import router
+from django.db.models import Count, F, Prefetch, Sum
+from .models import Asset, Location, AssetLocation, DashboardRollup, LocationRollup, AnalyticsWatermark, DwellRecord, TransitStat
+from .forms import AssetForm, LocationForm, AssetLocationForm, MovementExportForm, SnapshotForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .permissions import RoleRequiredMixin
+from .permissions import ApiRoleRequiredMixin, RoleRequiredMixin
+from .pagination import InvalidCursor, KeysetPaginationMixin, KeysetPaginator
+from .caching import get_generation, get_or_rebuild
+from .conditional import ConditionalGetMixin, not_modified, page_etag, set_validators
+from .fragments import row_keys
+from .signals import DASHBOARD_CACHE_NAMESPACE
+from .ingest import PayloadError, parse_payload, validate_movements, write_movements
+from .export import export_movements
+from .snapshots import snapshot_at
+from .routes import route_graph
+from .async_queries import gather_queries
+from .search import autocomplete, search_assets
+from .history import collapsed_stays, movement_history
 
 # Asset CRUD Views
-class AssetListView(LoginRequiredMixin, ListView):
+class AssetListView(LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView):
     model = Asset
     template_name = 'assets/asset_list.html'
     context_object_name = 'assets'
     paginate_by = 10
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         # Assets have no FK fields; ordering only. Keep queryset lean for large datasets.
-        return Asset.objects.only('id', 'name', 'value', 'created_at').order_by('-created_at')
+        # ?q= narrows to assets whose name or description contains the term.
+        # updated_at versions the cached rows (assets/fragments.py).
+        return search_assets(
+            self.request.GET.get('q', ''), Asset.objects.only('id', 'name', 'value', 'created_at', 'updated_at')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '')
+        return context
+
+    def get_etag_parts(self, context):
+        page = context['page_obj']
+        return row_keys('asset', page.object_list), page.previous_cursor, page.next_cursor
+
+    def serialize_object(self, asset):
+        return {'id': asset.pk, 'name': asset.name, 'value': str(asset.value), 'created_at': asset.created_at.isoformat()}
+
+@login_required
+def asset_autocomplete(request):
+    """``?q=<prefix>``: up to AUTOCOMPLETE_LIMIT assets whose name starts with it."""
+    return JsonResponse({'results': autocomplete(request.GET.get('q', ''))})
+
+class LookupView(LoginRequiredMixin, View):
+    """Options for ``LookupSelect`` widgets: ``?q=<term>&cursor=<token>``.
+
+    Returns ``{"results": [{"id", "text"}], "next_cursor"}``, ordered by name
+    and keyset-paginated so every page costs one indexed query.
+    """
+    model = None
+    per_page = 20
+
+    def filter_queryset(self, queryset, term):
+        return queryset.filter(name__icontains=term) if term else queryset
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.model.objects.only('id', 'name'), request.GET.get('q', '').strip())
+        paginator = KeysetPaginator(queryset, ('name', 'id'), self.per_page)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return JsonResponse({
+            'results': [{'id': obj.pk, 'text': str(obj)} for obj in page],
+            'next_cursor': page.next_cursor,
+        })
+
+class AssetLookupView(LookupView):
+    model = Asset
+
+    def filter_queryset(self, queryset, term):
+        return search_assets(term, queryset)
+
+class LocationLookupView(LookupView):
+    model = Location
+
+def _asset_history(request, asset_id):
+    """First (or ``?cursor=``) page of an asset's history; ``?view=stays`` collapses repeated scans."""
+    view = 'stays' if request.GET.get('view') == 'stays' else 'scans'
+    fetch = collapsed_stays if view == 'stays' else movement_history
+    try:
+        page = fetch(asset_id, request.GET.get('cursor'), getattr(settings, 'ASSET_HISTORY_PAGE_SIZE', 25))
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+    return {'history_view': view, 'history': page}
+
+def _serialize_scan(m):
+    return {'id': m.pk, 'location': {'id': m.location_id, 'name': m.location.name}, 'timestamp': m.timestamp.isoformat()}
+
+def _serialize_stay(stay):
+    return {
+        'location': {'id': stay.location_id, 'name': stay.location},
+        'started_at': stay.started_at.isoformat(),
+        'last_seen_at': stay.last_seen_at.isoformat(),
+        'ended_at': stay.ended_at.isoformat() if stay.ended_at else None,
+        'scans': stay.scans,
+    }
+
+@login_required
+def asset_history(request, pk):
+    """JSON pages of an asset's history for infinite scroll: ``?cursor=&view=stays``."""
+    context = _asset_history(request, pk)
+    serialize = _serialize_stay if context['history_view'] == 'stays' else _serialize_scan
+    return JsonResponse({
+        'results': [serialize(item) for item in context['history']],
+        'next_cursor': context['history'].next_cursor,
+    })
 
-class AssetDetailView(LoginRequiredMixin, DetailView):
+def _asset_detail_etag_parts(context):
+    asset, history = context['asset'], context['history']
+    current = getattr(asset, 'current_location', None)
+    if context['history_view'] == 'stays':
+        items = list(history)
+    else:
+        items = [(m.pk, m.location_id, m.location.name, m.timestamp) for m in history]
+    return (
+        asset.pk, asset.updated_at,
+        current and (current.location_id, current.location.name, current.timestamp),
+        context['history_view'], items, history.next_cursor,
+    )
+
+class AssetDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     model = Asset
     template_name = 'assets/asset_detail.html'
     context_object_name = 'asset'
 
     def get_queryset(self):
-        # Prefetch recent location history and related location in a single query.
-        return Asset.objects.prefetch_related(
-            Prefetch('locations', queryset=AssetLocation.objects.select_related('location').only('id', 'asset_id', 'location_id', 'timestamp'))
-        ).all()
+        # Current position comes from the maintained CurrentLocation row (one join);
+        # history is paged separately (see _asset_history).
+        return Asset.objects.select_related('current_location__location').all()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(_asset_history(self.request, self.object.pk))
+        return context
+
+    def get_etag_parts(self, context):
+        return _asset_detail_etag_parts(context)
 
 class AssetCreateView(RoleRequiredMixin, LoginRequiredMixin, CreateView):
     model = Asset
@@ -52,29 +179,88 @@ class AssetDeleteView(RoleRequiredMixin, LoginRequiredMixin, DeleteView):
     required_groups = ['admin']
 
 # Location CRUD Views
-class LocationListView(LoginRequiredMixin, ListView):
+class LocationListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
     model = Location
     template_name = 'assets/location_list.html'
     context_object_name = 'locations'
     paginate_by = 10
 
     def get_queryset(self):
-        # Count distinct assets at each location and prefetch a small set of related rows.
+        # Count assets currently at each location and prefetch each one's latest movements.
         return Location.objects.prefetch_related(
-            Prefetch('assets', queryset=AssetLocation.objects.select_related('asset').only('id', 'asset_id', 'location_id', 'timestamp'))
+            _recent_movements_prefetch(getattr(settings, 'LOCATION_LIST_RECENT_MOVEMENTS', 3))
         ).annotate(
-            asset_count=Count('assets__asset', distinct=True)
+            asset_count=Count('current_assets')
         ).order_by('name')
 
-class LocationDetailView(LoginRequiredMixin, DetailView):
+    def get_etag_parts(self, context):
+        return (row_keys('location', context['locations']),)
+
+LOCATION_HISTORY_ORDERING = ('-timestamp', '-id')
+
+def _location_movements():
+    return AssetLocation.objects.select_related('asset').only(
+        'id', 'asset_id', 'location_id', 'timestamp', 'updated_at', 'asset__name', 'asset__updated_at'
+    )
+
+def _recent_movements_prefetch(limit):
+    """``location.recent_movements``: the latest ``limit`` movements per location.
+
+    The sliced queryset makes Django filter on ``ROW_NUMBER() OVER (PARTITION BY
+    location_id ...)``, so one query fetches at most ``limit`` rows per location
+    however busy it is.
+    """
+    return Prefetch(
+        'assets',
+        queryset=_location_movements().order_by(*LOCATION_HISTORY_ORDERING)[:limit],
+        to_attr='recent_movements',
+    )
+
+class LocationDetailView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
+    """Shows the latest LOCATION_RECENT_MOVEMENTS movements; older ones come from LocationHistoryView."""
     model = Location
     template_name = 'assets/location_detail.html'
     context_object_name = 'location'
 
     def get_queryset(self):
+        # One extra row tells whether there is older history to page into.
         return Location.objects.prefetch_related(
-            Prefetch('assets', queryset=AssetLocation.objects.select_related('asset').only('id', 'asset_id', 'location_id', 'timestamp'))
-        ).all()
+            _recent_movements_prefetch(getattr(settings, 'LOCATION_RECENT_MOVEMENTS', 20) + 1)
+        ).annotate(asset_count=Count('current_assets'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        limit = getattr(settings, 'LOCATION_RECENT_MOVEMENTS', 20)
+        movements = self.object.recent_movements
+        context['movements'] = movements[:limit]
+        context['next_cursor'] = None
+        if len(movements) > limit:
+            paginator = KeysetPaginator(_location_movements(), LOCATION_HISTORY_ORDERING, limit)
+            context['next_cursor'] = paginator.encode_cursor('n', movements[limit - 1])
+        return context
+
+    def get_etag_parts(self, context):
+        location = context['location']
+        return (
+            location.pk, location.updated_at, location.asset_count,
+            [(m.pk, m.asset_id, m.asset.name, m.timestamp) for m in context['movements']], context['next_cursor'],
+        )
+
+class LocationHistoryView(LoginRequiredMixin, View):
+    """HTML fragment with the next page of a location's movements (``?cursor=``)."""
+    per_page = 50
+
+    def get(self, request, pk):
+        paginator = KeysetPaginator(_location_movements().filter(location_id=pk), LOCATION_HISTORY_ORDERING, self.per_page)
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+        return render(request, 'assets/_location_history.html', {
+            'location_id': pk,
+            'movements': page.object_list,
+            'next_cursor': page.next_cursor,
+        })
 
 class LocationCreateView(RoleRequiredMixin, LoginRequiredMixin, CreateView):
     model = Location
@@ -97,15 +283,32 @@ class LocationDeleteView(RoleRequiredMixin, LoginRequiredMixin, DeleteView):
     required_groups = ['admin']
 
 # AssetLocation CRUD Views
-class AssetLocationListView(LoginRequiredMixin, ListView):
+class AssetLocationListView(LoginRequiredMixin, ConditionalGetMixin, KeysetPaginationMixin, ListView):
     model = AssetLocation
     template_name = 'assets/assetlocation_list.html'
     context_object_name = 'assetlocations'
     paginate_by = 10
+    keyset_ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
         # Use select_related to avoid extra queries when showing asset/location per movement
-        return AssetLocation.objects.select_related('asset', 'location').only('id', 'asset_id', 'location_id', 'timestamp').order_by('-timestamp')
+        # updated_at of the row and both related objects versions the cached rows.
+        return AssetLocation.objects.select_related('asset', 'location').only(
+            'id', 'asset_id', 'location_id', 'timestamp', 'updated_at',
+            'asset__name', 'asset__updated_at', 'location__name', 'location__updated_at',
+        )
+
+    def get_etag_parts(self, context):
+        page = context['page_obj']
+        return row_keys('movement', page.object_list), page.previous_cursor, page.next_cursor
+
+    def serialize_object(self, m):
+        return {
+            'id': m.pk,
+            'asset': {'id': m.asset_id, 'name': m.asset.name},
+            'location': {'id': m.location_id, 'name': m.location.name},
+            'timestamp': m.timestamp.isoformat(),
+        }
 
 class AssetLocationCreateView(RoleRequiredMixin, LoginRequiredMixin, CreateView):
     model = AssetLocation
@@ -127,28 +330,317 @@ class AssetLocationDeleteView(RoleRequiredMixin, LoginRequiredMixin, DeleteView)
     success_url = reverse_lazy('assetlocation_list')
     required_groups = ['admin']
 
-# Dashboard View
+class AssetLocationBulkCreateView(ApiRoleRequiredMixin, View):
+    """Record a batch of movements from a JSON array or NDJSON body.
+
+    Called by scanner gateways with an API token. Valid rows are written with
+    batched inserts in one transaction and the dashboard is invalidated once
+    per batch; invalid rows (including malformed NDJSON lines) are reported by index.
+    """
+    http_method_names = ['post']
+    required_groups = ['manager', 'admin']
+
+    def post(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            rows = parse_payload(request.body, request.content_type)
+        except PayloadError as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+
+        max_batch = getattr(settings, 'BULK_MOVEMENT_MAX_BATCH', 5000)
+        if len(rows) > max_batch:
+            return JsonResponse({'error': f'Batch too large: {len(rows)} rows (max {max_batch}).'}, status=413)
+
+        movements, errors = validate_movements(rows)
+        accepted = write_movements(movements)
+        elapsed = time.perf_counter() - started
+        return JsonResponse({
+            'received': len(rows),
+            'accepted': accepted,
+            'rejected': len(errors),
+            'errors': errors,
+            'elapsed_ms': round(elapsed * 1000, 3),
+            'rows_per_second': round(accepted / elapsed, 1) if elapsed > 0 else 0,
+        })
+
+class AssetLocationExportView(LoginRequiredMixin, View):
+    """Stream movements as NDJSON or CSV, filtered by time range, location and asset.
+
+    ``?start=&end=&location=1&location=2&asset=3&format=csv&compress=1``;
+    ``archived=1`` also streams months moved out by ``archive_movements``.
+    """
+    content_types = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+    def get(self, request, *args, **kwargs):
+        form = MovementExportForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        options = form.cleaned_data
+        fmt, compress = options['format'], options['compress']
+        response = StreamingHttpResponse(
+            export_movements(
+                fmt,
+                compress=compress,
+                start=options['start'],
+                end=options['end'],
+                locations=options['location'],
+                assets=options['asset'],
+                include_archived=options['archived'],
+                # Route now: the rows are read after the middleware has finished.
+                using=router.db_for_read(AssetLocation),
+            ),
+            content_type='application/gzip' if compress else self.content_types[fmt],
+        )
+        filename = f'movements.{fmt}' + ('.gz' if compress else '')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+# Point-in-time snapshot Views
+class InventorySnapshotView(LoginRequiredMixin, View):
+    """Where assets were at ``?at=`` (default now), optionally only at ``?location=``, as JSON.
+
+    Pages through the assets by id (``?cursor=``); each page replays only the
+    movements of its assets, so a page can list fewer assets than the page
+    size (those not placed yet, or elsewhere when filtering by location).
+    """
+
+    def get(self, request, *args, **kwargs):
+        form = SnapshotForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        paginator = KeysetPaginator(
+            Asset.objects.only('id'), ('id',), getattr(settings, 'SNAPSHOT_PAGE_SIZE', 500)
+        )
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        snapshot = snapshot_at(
+            form.cleaned_data['at'], location=form.cleaned_data['location'], assets=[a.pk for a in page]
+        )
+        return JsonResponse({
+            'at': snapshot.at.isoformat(),
+            'checkpoint': snapshot.checkpoint.taken_at.isoformat() if snapshot.checkpoint else None,
+            'replayed': snapshot.replayed,
+            'assets': [
+                {'asset_id': asset_id, 'location_id': location_id, 'since': arrived_at.isoformat()}
+                for asset_id, (location_id, arrived_at) in sorted(snapshot.positions.items())
+            ],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+class LocationSnapshotView(LoginRequiredMixin, DetailView):
+    """The assets that were at a location at ``?at=``."""
+    model = Location
+    template_name = 'assets/location_snapshot.html'
+    context_object_name = 'location'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = SnapshotForm(self.request.GET)
+        at = form.cleaned_data['at'] if form.is_valid() else timezone.now()
+        snapshot = snapshot_at(at, location=self.object.pk)
+        assets = Asset.objects.only('id', 'name').in_bulk(list(snapshot.positions))
+        context.update({
+            'form': form,
+            'snapshot': snapshot,
+            'entries': sorted(
+                ((assets[asset_id], arrived_at) for asset_id, (_, arrived_at) in snapshot.positions.items() if asset_id in assets),
+                key=lambda entry: entry[1],
+            ),
+        })
+        return context
+
+# Analytics View
+class AnalyticsView(LoginRequiredMixin, TemplateView):
+    """Average dwell per location and the busiest transit routes, from the
+    materialized analytics (``refresh_analytics``). ``?asset=`` adds that
+    asset's recent stays; ``?format=json`` returns the same data as JSON."""
+    template_name = 'assets/analytics.html'
+    limit = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        dwell = [
+            dict(row, average=timedelta(seconds=round(row['seconds'] / row['stays'])))
+            for row in TransitStat.objects.values('from_location_id', 'from_location__name').annotate(
+                stays=Sum('trips'), seconds=Sum('total_seconds'),
+            ).filter(stays__gt=0).order_by('-stays')[:self.limit]
+        ]
+        transit = TransitStat.objects.exclude(from_location=F('to_location')).filter(trips__gt=0).select_related(
+            'from_location', 'to_location'
+        ).order_by('-trips')[:self.limit]
+        context.update({
+            'dwell_by_location': dwell,
+            'transit': list(transit),
+            'watermark': AnalyticsWatermark.objects.filter(pk=1).first(),
+        })
+        asset_id = self.request.GET.get('asset')
+        if asset_id and asset_id.isdigit():
+            stays = list(DwellRecord.objects.filter(asset_id=asset_id).order_by('-arrived_at')[:50])
+            names = dict(Location.objects.filter(pk__in={s.location_id for s in stays}).values_list('pk', 'name'))
+            context['stays'] = [(names.get(s.location_id), s) for s in stays]
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') != 'json':
+            return super().render_to_response(context, **response_kwargs)
+        data = {
+            'dwell_by_location': [
+                {'location_id': row['from_location_id'], 'location': row['from_location__name'], 'stays': row['stays'],
+                 'average_seconds': row['average'].total_seconds()}
+                for row in context['dwell_by_location']
+            ],
+            'transit': [
+                {'from_location_id': t.from_location_id, 'to_location_id': t.to_location_id, 'trips': t.trips,
+                 'average_seconds': t.average.total_seconds()}
+                for t in context['transit']
+            ],
+        }
+        if 'stays' in context:
+            data['stays'] = [
+                {'movement_id': s.movement_id, 'location_id': s.location_id, 'arrived_at': s.arrived_at.isoformat(),
+                 'departed_at': s.departed_at.isoformat() if s.departed_at else None, 'seconds': s.seconds}
+                for _, s in context['stays']
+            ]
+        return JsonResponse(data)
+
+# Route graph Views
+def _route_limit(request, default=10, maximum=100):
+    limit = request.GET.get('limit', '')
+    return min(int(limit), maximum) if limit.isdigit() and int(limit) > 0 else default
+
 @login_required
-@cache_page(60)  # cache dashboard for 60 seconds (can be tuned or disabled via cache backend)
-def dashboard(request):
-    # Aggregations done in the database for efficiency.
-    total_assets = Asset.objects.count()
-    total_locations = Location.objects.count()
-    total_movements = AssetLocation.objects.count()
-    total_value = Asset.objects.aggregate(total=Sum('value'))['total'] or 0
+def route_next_destinations(request, pk):
+    """Where assets go after location ``pk``, most frequent first."""
+    return JsonResponse({'location_id': pk, 'results': route_graph().next_destinations(pk, _route_limit(request))})
+
+@login_required
+def route_common(request):
+    """The most travelled location pairs."""
+    return JsonResponse({'results': route_graph().common_routes(_route_limit(request))})
+
+@login_required
+def route_bottlenecks(request):
+    """Locations where assets accumulate the most dwell time."""
+    return JsonResponse({'results': route_graph().bottlenecks(_route_limit(request))})
+
+# Dashboard View
+# Totals and per-location counts come from incrementally maintained rollups,
+# so the cost of a cache miss does not grow with table size. The three
+# queries are independent; the async dashboard runs them concurrently.
+def _dashboard_totals():
+    return DashboardRollup.objects.totals()
 
+def _recent_movements():
     # Recent movements (only latest 10) with related asset and location loaded.
-    recent_movements = AssetLocation.objects.select_related('asset', 'location').only('id', 'asset_id', 'location_id', 'timestamp').order_by('-timestamp')[:10]
+    return list(AssetLocation.objects.select_related('asset', 'location').only('id', 'asset_id', 'location_id', 'timestamp').order_by('-timestamp')[:10])
 
-    # Assets per location (distinct asset count) - returns top 5 locations
-    assets_per_location = Location.objects.annotate(asset_count=Count('assets__asset', distinct=True)).order_by('-asset_count')[:5]
+def _top_locations():
+    # Assets currently at each location - returns top 5 locations
+    return list(LocationRollup.objects.select_related('location').only(
+        'location_id', 'asset_count', 'inventory_value', 'location__name'
+    ).order_by('-asset_count')[:5])
 
-    context = {
-        'total_assets': total_assets,
-        'total_locations': total_locations,
-        'total_movements': total_movements,
-        'total_value': total_value,
+def _dashboard_data(totals, recent_movements, assets_per_location):
+    return {
+        'total_assets': totals.total_assets,
+        'total_locations': totals.total_locations,
+        'total_movements': totals.total_movements,
+        'total_value': totals.total_value,
         'recent_movements': recent_movements,
         'assets_per_location': assets_per_location,
     }
-    return render(request, 'assets/dashboard.html', context)
+
+def dashboard_context():
+    """Compute the dashboard data; cached per dashboard generation by ``dashboard``."""
+    return _dashboard_data(_dashboard_totals(), _recent_movements(), _top_locations())
+
+async def adashboard_context():
+    """``dashboard_context`` with the queries issued concurrently."""
+    return _dashboard_data(*await gather_queries(_dashboard_totals, _recent_movements, _top_locations))
+
+def _cached_dashboard(compute):
+    # One shared entry per generation: writes bump the generation (see
+    # signals.invalidate_dashboard), so no per-user/per-header variants go
+    # stale. Only one worker rebuilds at a time; others get the previous data.
+    def versioned():
+        # The entry remembers its generation for the ETag. Read before
+        # computing: a write during the build leaves the older number, so
+        # clients fetch the page again rather than keep a stale one.
+        generation = get_generation(DASHBOARD_CACHE_NAMESPACE)
+        return dict(compute(), generation=generation)
+
+    return get_or_rebuild(
+        DASHBOARD_CACHE_NAMESPACE,
+        'context',
+        versioned,
+        timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60),
+        grace=getattr(settings, 'DASHBOARD_CACHE_GRACE', 30),
+        beta=getattr(settings, 'DASHBOARD_CACHE_BETA', 1.0),
+    )
+
+
+def _render_conditional(request, template_name, context, etag_parts):
+    # render() for function views, answering conditional GETs like ConditionalGetMixin.
+    etag = page_etag(request, *etag_parts)
+    return not_modified(request, etag) or set_validators(render(request, template_name, context), etag)
+
+@login_required
+def dashboard(request):
+    context = _cached_dashboard(dashboard_context)
+    return _render_conditional(request, 'assets/dashboard.html', context, [context['generation']])
+
+# Async (ASGI) Views
+# Read-only variants routed instead of the sync views when ASYNC_VIEWS is on
+# (see urls.py). Rendering stays in a worker thread: templates may touch
+# lazy objects such as request.user.
+@login_required
+async def dashboard_async(request):
+    # The cache lookup blocks, so it runs in the request's sync thread; on a
+    # miss that thread hands adashboard_context back to the event loop.
+    context = await sync_to_async(_cached_dashboard)(async_to_sync(adashboard_context))
+    return await sync_to_async(_render_conditional)(request, 'assets/dashboard.html', context, [context['generation']])
+
+async def _keyset_list_async(request, view_class):
+    view = view_class(request=request, args=(), kwargs={})
+    paginator = KeysetPaginator(view.get_queryset(), view.keyset_ordering, view.paginate_by)
+    try:
+        page = await paginator.apage(request.GET.get(view.cursor_kwarg))
+    except InvalidCursor:
+        raise Http404('Invalid cursor.')
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [view.serialize_object(obj) for obj in page.object_list],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+    context = {
+        'q': request.GET.get('q', ''),
+        view.context_object_name: page.object_list,
+        'object_list': page.object_list,
+        'page_obj': page,
+        'paginator': paginator,
+        'is_paginated': page.has_other_pages(),
+    }
+    return await sync_to_async(_render_conditional)(request, view.template_name, context, view.get_etag_parts(context))
+
+@login_required
+async def asset_list_async(request):
+    return await _keyset_list_async(request, AssetListView)
+
+@login_required
+async def assetlocation_list_async(request):
+    return await _keyset_list_async(request, AssetLocationListView)
+
+@login_required
+async def asset_detail_async(request, pk):
+    view = AssetDetailView(request=request, args=(), kwargs={'pk': pk})
+    try:
+        asset = await view.get_queryset().aget(pk=pk)
+    except Asset.DoesNotExist:
+        raise Http404('No asset found matching the query')
+    context = {'object': asset, view.context_object_name: asset}
+    context.update(await sync_to_async(_asset_history)(request, pk))
+    return await sync_to_async(_render_conditional)(request, view.template_name, context, view.get_etag_parts(context))